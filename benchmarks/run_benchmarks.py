@@ -0,0 +1,446 @@
+"""Benchmarks of the ingestion hot paths.
+
+Runs headless on Linux with the synthetic reader, nothing is read from the backup server and the real
+database, TEMP and Logs folders are not touched (everything happens in a temporary working directory).
+The results are written as json, so runs of different releases can be compared.
+
+    python benchmarks/run_benchmarks.py --output benchmark_results.json
+    python benchmarks/run_benchmarks.py --only extraction,write_entries --files 200
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from queue import Queue
+from typing import Any, Callable, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+Benchmarks = ["extraction", "missing_files", "write_entries", "pending_temp_files", "observer_end_to_end", "observer_daemon"]
+
+
+def _percentile(Values: List[float], Percent: float) -> float:
+    """Percentile of the values (nearest rank).
+    :param Values: Measured values.
+    :type Values: List[float]
+    :param Percent: Percentile between 0 and 100.
+    :type Percent: float
+    :return: The percentile.
+    :rtype: float
+    """
+    Ordered = sorted(Values)
+    return Ordered[min(len(Ordered) - 1, max(0, round(Percent / 100 * len(Ordered)) - 1))]
+
+
+def _timed(Function: Callable[[], Any]) -> float:
+    """Runs the function once.
+    :param Function: Function without arguments.
+    :type Function: Callable[[], Any]
+    :return: Wall time in seconds.
+    :rtype: float
+    """
+    Start = time.perf_counter()
+    Function()
+    return time.perf_counter() - Start
+
+
+def _new_database(WorkDir: Path, Name: str) -> str:
+    """Creates an empty metadata database.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param Name: File name of the database.
+    :type Name: str
+    :return: Path to the database.
+    :rtype: str
+    """
+    from raw2meta.db.CreateDatabase import Database_CreateTables
+
+    Metadata_DB = (WorkDir / Name).as_posix()
+    Database_CreateTables(Metadata_DB)
+    return Metadata_DB
+
+
+def _sample(Name: str, ProjectID: str) -> Any:
+    """Sample entry with plausible values, without reading a file.
+    :param Name: Name of the raw file.
+    :type Name: str
+    :param ProjectID: Project of the sample.
+    :type ProjectID: str
+    :return: The sample entry.
+    :rtype: SampleEntry
+    """
+    from raw2meta.entity.entities import SampleEntry
+
+    return SampleEntry(Name, ProjectID, "2025-01-15 12:00:00.000", "S1:A1", 1.0, 300.0, 290.0, 380.0, 12.0, 26.4, 0.2, 253, 127)
+
+
+def BenchExtraction(WorkDir: Path, Files: int) -> Dict[str, Any]:
+    """MetadataLists extraction with the synthetic reader.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param Files: Number of files to extract.
+    :type Files: int
+    :return: Results.
+    :rtype: Dict[str, Any]
+    """
+    from raw2meta.components.GetMetadata import MetadataLists
+    from raw2meta.config.configuration import MachinesDict
+    from raw2meta.helper.Exceptions import HandlingCorruptFileError, HandlingEmptyFileError
+
+    Machines = list(MachinesDict.values()) or ["HFX"]
+    Durations, Errors, ScansUsed = [], 0, []
+    for i in range(Files):
+        RawfilePath = WorkDir / f"{Machines[i % len(Machines)]}_202501{1 + i % 28:02d}_BM_{i:06d}.raw"
+        Start = time.perf_counter()
+        try:
+            SQLValues_Samples, _ = MetadataLists(RawfilePath).GetArray_SampleMetadata()
+            ScansUsed.append(SQLValues_Samples.AnalyzerTemp_ScansUsed)
+        except (HandlingCorruptFileError, HandlingEmptyFileError):
+            Errors += 1
+        Durations.append(time.perf_counter() - Start)
+
+    Total = sum(Durations)
+    return {"files": Files, "seconds": Total, "files_per_second": Files / Total if Total else None,
+            "mean_ms": 1000 * statistics.mean(Durations), "p95_ms": 1000 * _percentile(Durations, 95),
+            "errors": Errors, "mean_trailer_scans_used": statistics.mean(ScansUsed) if ScansUsed else None}
+
+
+def BenchMissingFiles(WorkDir: Path, Sizes: List[int], Repeats: int) -> Dict[str, Any]:
+    """MissingFilesFromDatabase on directories of different sizes, half of the files are already in the database.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param Sizes: Numbers of files in the directory.
+    :type Sizes: List[int]
+    :param Repeats: Runs per size, the fastest is reported.
+    :type Repeats: int
+    :return: Results per size.
+    :rtype: Dict[str, Any]
+    """
+    from raw2meta.db.database_helper import MissingFilesFromDatabase
+
+    Results = {}
+    for Size in Sizes:
+        Directory = WorkDir / f"missing_{Size}"
+        Directory.mkdir()
+        Names = [f"HFX_20250115_BM_{i:07d}.raw" for i in range(Size)]
+        for Name in Names:
+            (Directory / Name).touch()
+
+        Metadata_DB = _new_database(WorkDir, f"missing_{Size}.sqlite")
+        with sqlite3.connect(Metadata_DB) as con:
+            con.executemany("INSERT INTO Metadata_Sample (SampleName_ID, ProjectID) VALUES (?, ?)",
+                            [(Name, "HFX_20250115_BM") for Name in Names[::2]])
+
+        Durations = []
+        for _ in range(Repeats):
+            Missing = []
+            Durations.append(_timed(lambda: Missing.extend(MissingFilesFromDatabase(Metadata_DB, Directory.as_posix()))))
+
+        Results[str(Size)] = {"files": Size, "missing": len(Missing), "seconds": min(Durations),
+                              "files_per_second": Size / min(Durations) if min(Durations) else None}
+        shutil.rmtree(Directory)
+    return Results
+
+
+def BenchWriteEntries(WorkDir: Path, Rows: int) -> Dict[str, Any]:
+    """Insert throughput of WriteEntries.write_sample_entries and upsert_entries, one project and Rows samples.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param Rows: Number of samples to insert.
+    :type Rows: int
+    :return: Results.
+    :rtype: Dict[str, Any]
+    """
+    from raw2meta.db.database_helper import WriteEntries
+    from raw2meta.entity.entities import ProjectEntry
+
+    Metadata_DB = _new_database(WorkDir, "write_entries.sqlite")
+    Writer = WriteEntries(Metadata_DB)
+    Project = ProjectEntry("HFX_20250115_BM", "20250115", "HFX", "4.0.30.1", "method.meth", "Neo", "0.0-60.0", "notRecorded")
+    Writer.write_sample_entries(_sample(f"HFX_20250115_BM_{0:07d}.raw", Project.ProjectID), Project)
+
+    Samples = [_sample(f"HFX_20250115_BM_{i:07d}.raw", Project.ProjectID) for i in range(1, Rows + 1)]
+    Seconds = _timed(lambda: [Writer.write_sample_entries(Sample) for Sample in Samples])
+
+    with sqlite3.connect(Metadata_DB) as con:
+        Count, = con.execute("SELECT COUNT(*) FROM Metadata_Sample").fetchone()
+
+    # the same inserts through the write-behind writer, the time includes the final commit
+    from raw2meta.db.writer import BatchWriter
+
+    Batched_DB = _new_database(WorkDir, "write_entries_batched.sqlite")
+    Batched = WriteEntries(Batched_DB)
+
+    def WriteBatched() -> None:
+        with BatchWriter(Batched_DB):
+            Batched.write_sample_entries(_sample(f"HFX_20250115_BM_{0:07d}.raw", Project.ProjectID), Project)
+            for Sample in Samples:
+                Batched.write_sample_entries(Sample)
+
+    Seconds_batched = _timed(WriteBatched)
+    with sqlite3.connect(Batched_DB) as con:
+        Count_batched, = con.execute("SELECT COUNT(*) FROM Metadata_Sample").fetchone()
+
+    # all rows in one upsert, and the same rows again (ingesting a month again: every row is already in the database)
+    Bulk_DB = _new_database(WorkDir, "write_entries_bulk.sqlite")
+    Bulk = WriteEntries(Bulk_DB)
+    Seconds_bulk = _timed(lambda: Bulk.upsert_entries(Samples, [Project]))
+    Outcomes = []
+    Seconds_reingest = _timed(lambda: Outcomes.append(Bulk.upsert_entries(Samples, [Project])))
+    return {"rows": Rows, "seconds": Seconds, "rows_per_second": Rows / Seconds if Seconds else None, "rows_in_db": Count,
+            "seconds_batched": Seconds_batched, "rows_per_second_batched": Rows / Seconds_batched if Seconds_batched else None,
+            "rows_in_db_batched": Count_batched,
+            "seconds_bulk": Seconds_bulk, "rows_per_second_bulk": Rows / Seconds_bulk if Seconds_bulk else None,
+            "seconds_reingest": Seconds_reingest, "duplicates_reingest": Outcomes[0].Samples.count("duplicate")}
+
+
+def BenchPendingTempFiles(WorkDir: Path, TempFiles: int) -> Dict[str, Any]:
+    """_process_pending_temp_files with many temp jsons, half of them belong to the project that is processed.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param TempFiles: Number of temp files.
+    :type TempFiles: int
+    :return: Results.
+    :rtype: Dict[str, Any]
+    """
+    from raw2meta.config.paths import TempFolder
+    from raw2meta.db.database_helper import SaveToJson, WriteEntries
+    from raw2meta.db.FillDatabase_Fun import Execute_CreateSQLdbCode
+    from raw2meta.entity.entities import ProjectEntry
+    from raw2meta.helper.common import SplitProjectName
+
+    os.makedirs(TempFolder, exist_ok=True)
+    Metadata_DB = _new_database(WorkDir, "pending_temp_files.sqlite")
+    Project = ProjectEntry("HFX_20250115_BM", "20250115", "HFX", "4.0.30.1", "method.meth", "Neo", "0.0-60.0", "notRecorded")
+    WriteEntries(Metadata_DB).write_sample_entries(_sample("HFX_20250115_BM_first.raw", Project.ProjectID), Project)
+
+    for i in range(TempFiles):
+        ProjectID = "HFX_20250112_BM" if i % 2 == 0 else "Astral_20250112_XY"
+        StandardProject = ProjectEntry(ProjectID, "20250112", ProjectID.split("_")[0], "4.0.30.1", "method.meth", "Neo", "0.0-60.0", "notRecorded")
+        SaveToJson(StandardProject, _sample(f"{ProjectID}_HSstd_{i:06d}.raw", ProjectID))
+
+    _, ProjectID_regex, _, _ = SplitProjectName(Project.ProjectID)
+    Seconds = _timed(lambda: Execute_CreateSQLdbCode(Metadata_DB)._process_pending_temp_files(ProjectID_regex))
+
+    Remaining = len(os.listdir(TempFolder))
+    for Tempfile in os.listdir(TempFolder):
+        os.remove(os.path.join(TempFolder, Tempfile))
+    return {"temp_files": TempFiles, "matching": TempFiles - Remaining, "seconds": Seconds,
+            "files_per_second": TempFiles / Seconds if Seconds else None}
+
+
+def BenchObserverEndToEnd(WorkDir: Path, Files: int, Window: float, PollInterval: float, Timeout: float) -> Dict[str, Any]:
+    """Files per minute through the observer path: watchdog event, queue, readiness scheduler (stability check), extraction and database write.
+    The stable window is set with Window (0 measures the processing alone), the files are created at once,
+    like a burst of the backup, so with a window the result shows how much the waiting times overlap.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param Files: Number of files that are created in the observed folder.
+    :type Files: int
+    :param Window: Seconds a file must not change (stability_window_seconds).
+    :type Window: float
+    :param PollInterval: Seconds between two stability checks of a file (stability_poll_seconds).
+    :type PollInterval: float
+    :param Timeout: Seconds until the benchmark gives up.
+    :type Timeout: float
+    :return: Results.
+    :rtype: Dict[str, Any]
+    """
+    from raw2meta.components.Observer import start_watch
+    from raw2meta.components.Scheduler import ReadinessScheduler
+    from raw2meta.config.paths import TempFolder
+    from raw2meta.helper.FileStability import StabilityMonitor
+    from raw2meta.pipeline.pipeline_Observer import ObservedFileProcessor, ConsumeObservedFiles
+
+    MassSpecDirectory = WorkDir / "backup"
+    MonthDirectory = MassSpecDirectory / "202501"
+    MonthDirectory.mkdir(parents=True)
+    os.makedirs(TempFolder, exist_ok=True)
+    Metadata_DB = _new_database(WorkDir, "observer.sqlite")
+
+    Jobs = Queue()
+    stop_event = threading.Event()
+    Processed, Failed = [], []
+    Processor = ObservedFileProcessor(Metadata_DB, MassSpecDirectory.as_posix(), stop_event)
+
+    def Process(file: str) -> None:
+        try:
+            Processor(file)
+        except Exception as e:
+            Failed.append(f"{file}: {e!r}")
+        Processed.append(time.perf_counter())
+
+    Scheduler = ReadinessScheduler(Process, stop_event=stop_event, Ready=StabilityMonitor(Window).Ready, PollInterval=PollInterval).start()
+
+    Stats = []
+
+    def Consume() -> None:
+        Stats.append(ConsumeObservedFiles(Jobs, Scheduler, stop_event))
+
+    observer = start_watch(MonthDirectory.as_posix(), Jobs)
+    Consumer = threading.Thread(target=Consume, daemon=True)
+    Consumer.start()
+
+    Start = time.perf_counter()
+    for i in range(Files):
+        with open(MonthDirectory / f"HFX_20250115_BM_{i:06d}.raw", "wb") as RawFile:
+            RawFile.write(b"\0" * 1024)
+
+    while len(Processed) < Files and time.perf_counter() - Start < Timeout:
+        time.sleep(0.05)
+    Seconds = (Processed[-1] if Processed else time.perf_counter()) - Start
+
+    stop_event.set()
+    observer.stop()
+    observer.join()
+    Consumer.join()
+    Scheduler.stop()
+    Processor.stop()
+
+    return {"files": Files, "processed": len(Processed), "failed": Failed, "seconds": Seconds,
+            "files_per_minute": 60 * len(Processed) / Seconds if Seconds else None,
+            "stability_window_seconds": Window, "stability_poll_seconds": PollInterval,
+            "consumer_idle_seconds": Stats[0].IdleSeconds if Stats else None, "consumer_busy_seconds": Stats[0].BusySeconds if Stats else None}
+
+
+def BenchObserverDaemon(WorkDir: Path, Files: int, Window: float, PollInterval: float, Timeout: float) -> Dict[str, Any]:
+    """Files per minute through the asyncio daemon: watchdog event, asyncio queue, stability check, extraction and database write.
+    Same burst of files as BenchObserverEndToEnd, so the two observers can be compared.
+    :param WorkDir: Working directory of the benchmark run.
+    :type WorkDir: Path
+    :param Files: Number of files that are created in the observed folder.
+    :type Files: int
+    :param Window: Seconds a file must not change (stability_window_seconds).
+    :type Window: float
+    :param PollInterval: Seconds between two stability checks of a file (stability_poll_seconds).
+    :type PollInterval: float
+    :param Timeout: Seconds until the benchmark gives up.
+    :type Timeout: float
+    :return: Results.
+    :rtype: Dict[str, Any]
+    """
+    import asyncio
+    from raw2meta.components.IngestionDaemon import IngestionDaemon
+    from raw2meta.config.paths import TempFolder
+
+    MassSpecDirectory = WorkDir / "backup_daemon"
+    MonthDirectory = MassSpecDirectory / "202501"
+    MonthDirectory.mkdir(parents=True)
+    os.makedirs(TempFolder, exist_ok=True)
+    Metadata_DB = _new_database(WorkDir, "daemon.sqlite")
+
+    Daemon = IngestionDaemon(Metadata_DB, MassSpecDirectory.as_posix(), Window=Window, PollInterval=PollInterval)
+    Runner = threading.Thread(target=asyncio.run, args=(Daemon.run([MonthDirectory.as_posix()]),), daemon=True)
+    Runner.start()
+    # the watchdog observer is started in the event loop
+    time.sleep(0.5)
+
+    Start = time.perf_counter()
+    for i in range(Files):
+        with open(MonthDirectory / f"HFX_20250115_BM_{i:06d}.raw", "wb") as RawFile:
+            RawFile.write(b"\0" * 1024)
+
+    while Daemon.Processed + Daemon.Failed < Files and time.perf_counter() - Start < Timeout:
+        time.sleep(0.01)
+    Seconds = time.perf_counter() - Start
+
+    Daemon.stop_event.set()
+    Runner.join()
+
+    return {"files": Files, "processed": Daemon.Processed, "failed": Daemon.Failed, "seconds": Seconds,
+            "files_per_minute": 60 * Daemon.Processed / Seconds if Seconds else None,
+            "stability_window_seconds": Window, "stability_poll_seconds": PollInterval}
+
+
+def _git_commit() -> Any:
+    """Commit of the repository, None if git is not available.
+    :return: The commit hash.
+    :rtype: Any
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    Parser = argparse.ArgumentParser(description="Benchmarks of the raw2meta ingestion hot paths (synthetic reader).")
+    Parser.add_argument("--output", default="benchmark_results.json", help="json file for the results")
+    Parser.add_argument("--only", default=",".join(Benchmarks), help=f"comma separated subset of {Benchmarks}")
+    Parser.add_argument("--files", type=int, default=500, help="files for the extraction benchmark")
+    Parser.add_argument("--sizes", default="1000,10000,100000", help="directory sizes for the missing files benchmark")
+    Parser.add_argument("--repeats", type=int, default=3, help="runs per directory size, the fastest is reported")
+    Parser.add_argument("--rows", type=int, default=5000, help="samples for the insert benchmark")
+    Parser.add_argument("--temp-files", type=int, default=2000, help="temp jsons for the pending temp files benchmark")
+    Parser.add_argument("--observer-files", type=int, default=100, help="files for the observer end-to-end and daemon benchmarks")
+    Parser.add_argument("--stability-window", type=float, default=0.0, help="seconds a file must not change in the observer benchmark")
+    Parser.add_argument("--poll-interval", type=float, default=0.1, help="seconds between the stability checks in the observer benchmark")
+    Parser.add_argument("--timeout", type=float, default=600.0, help="seconds until the observer benchmark gives up")
+    Parser.add_argument("--verbose", action="store_true", help="keep the INFO logging of raw2meta")
+    Args = Parser.parse_args()
+
+    WorkDir = Path(tempfile.mkdtemp(prefix="raw2meta_bench_"))
+
+    # has to be set before raw2meta is imported, the settings are read on import
+    os.environ["RAW2META_READER"] = "synthetic"
+    os.environ["RAW2META_RUNTIME_DIR"] = WorkDir.as_posix()
+    sys.path.insert(0, (REPO_ROOT / "src").as_posix())
+
+    from raw2meta.config import configuration
+
+    if not Args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    Selected = [Name for Name in Args.only.split(",") if Name]
+    Results = {}
+    try:
+        for Name in Selected:
+            Start = time.perf_counter()
+            if Name == "extraction":
+                Results[Name] = BenchExtraction(WorkDir, Args.files)
+            elif Name == "missing_files":
+                Results[Name] = BenchMissingFiles(WorkDir, [int(Size) for Size in Args.sizes.split(",")], Args.repeats)
+            elif Name == "write_entries":
+                Results[Name] = BenchWriteEntries(WorkDir, Args.rows)
+            elif Name == "pending_temp_files":
+                Results[Name] = BenchPendingTempFiles(WorkDir, Args.temp_files)
+            elif Name == "observer_end_to_end":
+                Results[Name] = BenchObserverEndToEnd(WorkDir, Args.observer_files, Args.stability_window, Args.poll_interval, Args.timeout)
+            elif Name == "observer_daemon":
+                Results[Name] = BenchObserverDaemon(WorkDir, Args.observer_files, Args.stability_window, Args.poll_interval, Args.timeout)
+            else:
+                raise ValueError(f"Unknown benchmark {Name}, choose from {Benchmarks}")
+            print(f"{Name}: done in {time.perf_counter() - Start:.1f} s", file=sys.stderr)
+    finally:
+        from raw2meta.db.connection import CloseConnections
+        CloseConnections()
+        shutil.rmtree(WorkDir, ignore_errors=True)
+
+    Report = {"created": datetime.now().isoformat(timespec="seconds"),
+              "git_commit": _git_commit(),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "settings": {"reader": configuration.ReaderBackend,
+                           "synthetic_reader": configuration.SyntheticReaderParams,
+                           "sampling_mode": configuration.SamplingMode,
+                           "pump_pressure_read_mode": configuration.PumpPressureReadMode},
+              "results": Results}
+
+    with open(Args.output, "w") as outfile:
+        json.dump(Report, outfile, indent=2)
+    print(json.dumps(Results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
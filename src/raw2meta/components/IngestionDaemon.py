@@ -0,0 +1,214 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Union
+from raw2meta.components.Observer import ObservingFolders, StopSignal, WakeOnStop, start_watch
+from raw2meta.config.configuration import ObserverWorkers, StabilityPoll, StabilityWindow, StabilityTimeout
+from raw2meta.db.FillDatabase_logic import ExtractMetadata, ExtractionResult, WriteExtractionResult, SampleReadyToProcess
+from raw2meta.db.FillDatabase_Fun import Execute_CreateSQLdbCode
+from raw2meta.db.snapshot import SnapshotExporter
+from raw2meta.helper.FileStability import FileStability
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+
+class LoopQueue:
+
+    '''Puts the items of other threads (the watchdog observers, WakeOnStop) into an asyncio.Queue of the event loop.'''
+
+    def __init__(self, Loop: asyncio.AbstractEventLoop, Queue: asyncio.Queue) -> None:
+        '''Initialize the bridge.
+        :param Loop: Event loop of the queue.
+        :type Loop: asyncio.AbstractEventLoop
+        :param Queue: The queue.
+        :type Queue: asyncio.Queue
+        :return: None
+        :rtype: None
+        '''
+        self.Loop = Loop
+        self.Queue = Queue
+
+    def put(self, Item: Any) -> None:
+        '''Put the item into the queue, can be called from any thread.
+        :param Item: The item, e.g. the path of a new file.
+        :type Item: Any
+        :return: None
+        :rtype: None
+        '''
+        try:
+            self.Loop.call_soon_threadsafe(self.Queue.put_nowait, Item)
+        except RuntimeError:
+            # the event loop is closed, the daemon has stopped
+            pass
+
+
+class IngestionDaemon:
+
+    '''Observer on one event loop: every new file is a task that waits for the stable copy with asyncio.sleep,
+    so hundreds of pending files cost no threads. At most Workers files are read at the same time (semaphore and thread pool),
+    the finished files are written one after the other by a single writer task on its own database thread.
+    '''
+
+    def __init__(self, Metadata_DB: Union[str, Path], MassSpecDirectory_ToObserve: Union[str, Path], Workers: int = ObserverWorkers,
+                 Window: float = StabilityWindow, PollInterval: float = StabilityPoll, Timeout: float = StabilityTimeout,
+                 Exporter: Optional[SnapshotExporter] = None, stop_event: Optional[threading.Event] = None) -> None:
+        '''Initialize the daemon, it runs with asyncio.run(Daemon.run()).
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :param MassSpecDirectory_ToObserve: The observed directory.
+        :type MassSpecDirectory_ToObserve: Union[str, Path]
+        :param Workers: Files that are read at the same time, defaults to ObserverWorkers (processing: observer_workers)
+        :type Workers: int, optional
+        :param Window: Seconds a file must not change, defaults to StabilityWindow (processing: stability_window_seconds)
+        :type Window: float, optional
+        :param PollInterval: Seconds between two stability checks, defaults to StabilityPoll (processing: stability_poll_seconds)
+        :type PollInterval: float, optional
+        :param Timeout: Seconds until a changing file is given up, defaults to StabilityTimeout (processing: stability_timeout_minutes)
+        :type Timeout: float, optional
+        :param Exporter: Optional exporter of the snapshots, called after a file is written.
+        :type Exporter: Optional[SnapshotExporter], optional
+        :param stop_event: Optional event that stops the daemon, also set when the daemon stops.
+        :type stop_event: Optional[threading.Event], optional
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+        self.MassSpecDirectory_ToObserve = MassSpecDirectory_ToObserve
+        self.Workers = max(Workers, 1)
+        self.Window = Window
+        self.PollInterval = PollInterval
+        self.Timeout = Timeout
+        self.Exporter = Exporter
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.Processed = 0
+        self.Failed = 0
+        # one task per file that is not written yet, a path is only scheduled once
+        self.Pending: Dict[str, asyncio.Task] = {}
+        # files of the pending tasks that are read or wait for the writer, they are not cancelled when the daemon stops
+        self.Reading: Set[str] = set()
+
+    async def run(self, WatchDirectories: Optional[List[Union[str, Path]]] = None) -> None:
+        '''Observe the folders until the stop_event is set or the task is cancelled (Ctrl+C in asyncio.run).
+        No new files are dispatched then. Files that are still waiting for their copy (or for a free reader) are dropped
+        (RerunningTwoMonths finds them later), files that are read or wait for the writer are written before the daemon stops.
+        :param WatchDirectories: Directories to watch, defaults to the monthly folders of ObservingFolders (with RerunningTwoMonths).
+        :type WatchDirectories: Optional[List[Union[str, Path]]], optional
+        :return: None
+        :rtype: None
+        '''
+        Loop = asyncio.get_running_loop()
+        self._files: asyncio.Queue = asyncio.Queue()
+        # a full queue holds back the readers until the writer catches up
+        self._results: asyncio.Queue = asyncio.Queue(maxsize=self.Workers)
+        self._semaphore = asyncio.BoundedSemaphore(self.Workers)
+        self._extraction = ThreadPoolExecutor(max_workers=self.Workers, thread_name_prefix="DaemonExtraction")
+        # sqlite connections belong to their thread, all database work runs on this one
+        self._database = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DaemonDatabase")
+
+        FileQueue = LoopQueue(Loop, self._files)
+        WakeOnStop(self.stop_event, FileQueue)
+        Observing: Optional[ObservingFolders] = None
+        Watchers: List[Any] = []
+        Thread: Optional[threading.Thread] = None
+        if WatchDirectories is None:
+            # the files that RerunningTwoMonths finds come through the queue, its other database work runs on the database thread
+            Observing = ObservingFolders(self.MassSpecDirectory_ToObserve, self.Metadata_DB, FileQueue, Database=self._database)
+            Thread = threading.Thread(target=Observing.Redefine_Directory, args=(self.stop_event,), name="ObservingFolders")
+            Thread.start()
+        else:
+            Watchers = [start_watch(Directory, FileQueue) for Directory in WatchDirectories]
+        logger.info("Started Observing Folders")
+
+        Writer = asyncio.create_task(self._write_results())
+        try:
+            await self._dispatch()
+        finally:
+            logger.info(f"Stopping, {len(self.Pending) - len(self.Reading)} files are not processed, {len(self.Reading)} are read and written")
+            self.stop_event.set()
+            # joining the threads must not block the event loop, the tasks and the writer keep running meanwhile
+            for Watcher in Watchers:
+                Watcher.stop()
+                await asyncio.to_thread(Watcher.join)
+            if Observing is not None:
+                await asyncio.to_thread(Observing.ClosingObservations)
+                await asyncio.to_thread(Thread.join)
+
+            for File, Task in list(self.Pending.items()):
+                if File not in self.Reading:
+                    Task.cancel()
+            # the writer task keeps taking the results, so the files that are read get into the queue
+            await asyncio.gather(*self.Pending.values(), return_exceptions=True)
+            await self._results.put(StopSignal)
+            await Writer
+            self._extraction.shutdown(wait=True, cancel_futures=True)
+            self._database.shutdown(wait=True)
+            logger.info(f"Daemon stopped: {self.Processed} files processed, {self.Failed} failed")
+
+    async def _dispatch(self) -> None:
+        while True:
+            File = await self._files.get()
+            if File is StopSignal:
+                return
+            File = Path(File).as_posix()
+            if Path(File).suffix != ".raw" or File in self.Pending:
+                continue
+            logger.info(f"New file {File} detected by Observer, reading it when it did not change for {self.Window} s.")
+            Task = asyncio.create_task(self._ingest(File))
+            self.Pending[File] = Task
+            Task.add_done_callback(lambda _, File=File: self._done(File))
+
+    def _done(self, File: str) -> None:
+        self.Pending.pop(File, None)
+        self.Reading.discard(File)
+
+    async def _ingest(self, File: str) -> None:
+        Loop = asyncio.get_running_loop()
+        try:
+            if not await Loop.run_in_executor(self._database, partial(SampleReadyToProcess, File, self.MassSpecDirectory_ToObserve,
+                                                                      self.Metadata_DB, WaitForCopy=False)):
+                return
+
+            Check = FileStability(File, self.Window)
+            while not await asyncio.to_thread(Check.Poll):
+                if Check.WaitedSeconds >= self.Timeout:
+                    logger.error(f"{File} did not get stable within {self.Timeout / 60:.0f} minutes")
+                    self.Failed += 1
+                    return
+                await asyncio.sleep(self.PollInterval)
+            logger.info(f"Copy of {File} finished, it changed for {Check.CopySeconds:.1f} s after it was detected")
+
+            # the reader slot is kept until the writer took the result, at most Workers files are read and not written
+            async with self._semaphore:
+                self.Reading.add(File)
+                Result = await Loop.run_in_executor(self._extraction, ExtractMetadata, File)
+                await self._results.put(Result)
+        except FileNotFoundError:
+            logger.error(f"File not found: {File}")
+            self.Failed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Error processing {File}")
+            self.Failed += 1
+
+    async def _write_results(self) -> None:
+        Loop = asyncio.get_running_loop()
+        while True:
+            Result = await self._results.get()
+            if Result is StopSignal:
+                return
+            try:
+                await Loop.run_in_executor(self._database, self._write, Result)
+                self.Processed += 1
+            except Exception:
+                logger.exception(f"Error writing {Result.File}")
+                self.Failed += 1
+
+    def _write(self, Result: ExtractionResult) -> None:
+        WriteExtractionResult(Result, Execute_CreateSQLdbCode(self.Metadata_DB))
+        logger.info(f"File {Result.File} processed and database updated, continue observing.")
+        if self.Exporter is not None:
+            self.Exporter.AfterBatch()
@@ -0,0 +1,308 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from raw2meta.config.configuration import PumpPressureScans, PumpPressureReadMode, TrailerScans
+from raw2meta.components.TrailerLayout import TrailerLayouts, FieldPosition
+from raw2meta.helper.ScanSampling import SampleScans, ScanSample
+from raw2meta.helper.Exceptions import HandlingEmptyFileError, TraceNotAvailableError
+from raw2meta.reader.RawReader import RawReader, RunHeader
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+# (DeviceIndex, Channel) of an analog trace, e.g. (2, 1) = A/D card 2, A2DChannel1 = pump pressure
+AnalogTraceKey = Tuple[int, int]
+
+
+@dataclass
+class MetricNeeds:
+    '''Data of the raw file a metric needs.
+
+    Traces: analog traces, sampled over the run.
+    TrailerFields: numeric trailer extra fields (regex patterns), sampled over the run.
+    TrailerFirstScanFields: trailer extra fields (regex patterns) that are only read in the first scan.
+    '''
+    Traces: List[AnalogTraceKey] = field(default_factory=list)
+    TrailerFields: List[str] = field(default_factory=list)
+    TrailerFirstScanFields: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ExtractionContext:
+    '''What is known about the raw file before the metrics are read.'''
+    MachineCombination: List[str]
+    Header: RunHeader
+
+
+@dataclass
+class ExtractionData:
+    '''Everything that was read in the pass over the raw file.
+
+    Fields: position and label of every trailer field pattern.
+    Trailer: sampled values of the numeric trailer fields, all fields are read at the same scans.
+    TrailerFirstScan: values of the trailer fields read in the first scan.
+    Traces: sampled analog traces, None if the file does not contain the trace.
+    '''
+    Context: ExtractionContext
+    Fields: Dict[str, FieldPosition] = field(default_factory=dict)
+    Trailer: Dict[str, np.ndarray] = field(default_factory=dict)
+    TrailerScansUsed: Optional[int] = None
+    TrailerFirstScan: Dict[str, Any] = field(default_factory=dict)
+    Traces: Dict[AnalogTraceKey, Optional[ScanSample]] = field(default_factory=dict)
+
+
+class MetricExtractor:
+    '''A metric of the raw file, e.g. the pump pressure.
+
+    Needs declares what has to be read from the raw file, Compute calculates the values from the data of the pass.
+    The keys returned by Compute are the names of the fields in SampleEntry or ProjectEntry.
+    New metrics are added by subclassing and registering with @RegisterMetric,
+    they are read in the same pass as the other metrics, so they do not open or iterate the file again.
+    '''
+
+    Name = ""
+
+    def Needs(self, Context: ExtractionContext) -> MetricNeeds:
+        """Data this metric needs from the raw file, can depend on the instruments.
+        :param Context: Instruments and run header of the raw file.
+        :type Context: ExtractionContext
+        :return: The needed data.
+        :rtype: MetricNeeds
+        """
+        return MetricNeeds()
+
+    def Compute(self, Data: ExtractionData) -> Dict[str, Any]:
+        """Calculates the values of the metric.
+        :param Data: Data read in the pass over the raw file.
+        :type Data: ExtractionData
+        :return: Values by the name of the field in SampleEntry or ProjectEntry.
+        :rtype: Dict[str, Any]
+        """
+        return {}
+
+
+MetricRegistry: Dict[str, MetricExtractor] = {}
+
+def RegisterMetric(Extractor: type) -> type:
+    """Class decorator that adds an extractor to the registry, the metrics are read in the order they are registered.
+    :param Extractor: Subclass of MetricExtractor.
+    :type Extractor: type
+    :return: The unchanged class.
+    :rtype: type
+    """
+    MetricRegistry[Extractor.Name] = Extractor()
+    return Extractor
+
+
+class ExtractionPlanner:
+    '''Merges the needs of all metrics and reads them in one pass over the raw file.
+
+    Every trailer field pattern is looked up once, all numeric trailer fields are read at the same scans
+    (one read per scan for all fields) and all channels of an analog device are read with the same calls.
+    '''
+
+    def __init__(self, Extractors: Optional[List[MetricExtractor]] = None) -> None:
+        """Initialize with the metrics to read.
+        :param Extractors: The metrics, defaults to all registered metrics.
+        :type Extractors: Optional[List[MetricExtractor]]
+        :return: None
+        :rtype: None
+        """
+        self.Extractors = list(MetricRegistry.values()) if Extractors is None else Extractors
+
+    def Plan(self, Context: ExtractionContext) -> MetricNeeds:
+        """Combines the needs of all metrics without duplicates.
+        :param Context: Instruments and run header of the raw file.
+        :type Context: ExtractionContext
+        :return: The combined needs.
+        :rtype: MetricNeeds
+        """
+        Combined = MetricNeeds()
+        for Extractor in self.Extractors:
+            Needs = Extractor.Needs(Context)
+            Combined.Traces += [Trace for Trace in Needs.Traces if Trace not in Combined.Traces]
+            Combined.TrailerFields += [Pattern for Pattern in Needs.TrailerFields if Pattern not in Combined.TrailerFields]
+            Combined.TrailerFirstScanFields += [Pattern for Pattern in Needs.TrailerFirstScanFields if Pattern not in Combined.TrailerFirstScanFields]
+        return Combined
+
+    def Run(self, rawFile: RawReader, Context: ExtractionContext) -> Dict[str, Any]:
+        """Reads the combined needs and computes all metrics.
+        :param rawFile: The opened raw file (from RawFileReaderManager).
+        :type rawFile: RawReader
+        :param Context: Instruments and run header of the raw file.
+        :type Context: ExtractionContext
+        :return: Values of all metrics by the name of the field in SampleEntry or ProjectEntry.
+        :rtype: Dict[str, Any]
+        :raises HandlingEmptyFileError: If the raw file is empty (last scan number is 0).
+        """
+        if Context.Header.LastScan == 0:
+            raise HandlingEmptyFileError
+
+        Needs = self.Plan(Context)
+        Data = ExtractionData(Context)
+        self._read_trailer(rawFile, Needs, Data)
+        self._read_traces(rawFile, Needs, Data)
+
+        Values = {}
+        for Extractor in self.Extractors:
+            Values.update(Extractor.Compute(Data))
+        return Values
+
+    def _read_trailer(self, rawFile: RawReader, Needs: MetricNeeds, Data: ExtractionData) -> None:
+        """Reads the trailer fields, the numeric fields are sampled at the same scans.
+        :param rawFile: The opened raw file.
+        :type rawFile: RawReader
+        :param Needs: The combined needs.
+        :type Needs: MetricNeeds
+        :param Data: Data of the pass, filled by this method.
+        :type Data: ExtractionData
+        :return: None
+        :rtype: None
+        """
+        Patterns = Needs.TrailerFields + [Pattern for Pattern in Needs.TrailerFirstScanFields if Pattern not in Needs.TrailerFields]
+        if not Patterns:
+            return
+
+        # the positions of the fields are cached per instrument and software version, the labels are only searched when the layout is new
+        Data.Fields = TrailerLayouts.GetFields(rawFile, Patterns)
+
+        for Pattern in Needs.TrailerFirstScanFields:
+            FieldNum = Data.Fields[Pattern][0]
+            if FieldNum is not None:
+                Data.TrailerFirstScan[Pattern] = rawFile.TrailerValue(1, FieldNum)
+
+        Numeric = [Pattern for Pattern in Needs.TrailerFields if Data.Fields[Pattern][0] is not None]
+        if Numeric:
+            FieldNums = [Data.Fields[Pattern][0] for Pattern in Numeric]
+            Header = Data.Context.Header
+            Sample = SampleScans(lambda Scans: rawFile.TrailerTable(FieldNums, Scans), Header.FirstScan, Header.LastScan, TrailerScans)
+            Data.Trailer = {Pattern: Sample.Values[:, i] for i, Pattern in enumerate(Numeric)}
+            Data.TrailerScansUsed = Sample.ScansUsed
+
+    def _read_traces(self, rawFile: RawReader, Needs: MetricNeeds, Data: ExtractionData, NumberOfScansUsed: int = PumpPressureScans,
+                     ReadMode: str = PumpPressureReadMode) -> None:
+        """Reads the analog traces, all channels of a device together.
+
+        There are two read modes (set in params.yaml):
+        "range" reads the traces of the whole run in one call (or in chunks of PumpPressureChunkScans scans) and uses every scan,
+        "scans" reads every sampled scan with its own call (at most NumberOfScansUsed). Every call goes through pythonnet, so "range" is much faster.
+
+        :param rawFile: The opened raw file.
+        :type rawFile: RawReader
+        :param Needs: The combined needs.
+        :type Needs: MetricNeeds
+        :param Data: Data of the pass, filled by this method.
+        :type Data: ExtractionData
+        :param NumberOfScansUsed: Maximum number of scans to sample from every trace in "scans" mode, defaults to PumpPressureScans
+        :type NumberOfScansUsed: int, optional
+        :param ReadMode: "range" or "scans", defaults to PumpPressureReadMode
+        :type ReadMode: str, optional
+        :return: None
+        :rtype: None
+        :raises ValueError: If the read mode is unknown.
+        """
+        Devices = {}
+        for DeviceIndex, Channel in Needs.Traces:
+            Devices.setdefault(DeviceIndex, []).append(Channel)
+
+        for DeviceIndex, Channels in Devices.items():
+            try:
+                firstScanNumber, lastScanNumber = rawFile.AnalogScanRange(DeviceIndex)
+
+                if ReadMode == "range":
+                    Traces = rawFile.AnalogTraces(DeviceIndex, Channels, firstScanNumber, lastScanNumber)
+                    for Channel, Trace in zip(Channels, Traces):
+                        if len(Trace) == 0:
+                            Data.Traces[(DeviceIndex, Channel)] = None
+                            continue
+                        # the whole trace is in memory already, sampling it would only lose spikes for min and max
+                        if len(Trace) == lastScanNumber - firstScanNumber + 1:
+                            ScanNumbers = np.arange(firstScanNumber, lastScanNumber + 1)
+                        else:
+                            ScanNumbers = np.arange(len(Trace))
+                        Data.Traces[(DeviceIndex, Channel)] = ScanSample(ScanNumbers, np.asarray(Trace, dtype=np.float64))
+                elif ReadMode == "scans":
+                    for Channel in Channels:
+                        Data.Traces[(DeviceIndex, Channel)] = SampleScans(lambda Scans: rawFile.AnalogValues(DeviceIndex, Channel, Scans),
+                                                                          firstScanNumber, lastScanNumber, NumberOfScansUsed)
+                else:
+                    raise ValueError(f"Unknown read mode for analog traces: {ReadMode}")
+
+            except TraceNotAvailableError:
+                logger.info(f"Analog device {DeviceIndex} not available in {getattr(rawFile, 'RawfilePath', 'raw file')}")
+                for Channel in Channels:
+                    Data.Traces[(DeviceIndex, Channel)] = None
+
+
+@RegisterMetric
+class AnalyzerTemperature(MetricExtractor):
+    '''Mean and std of the analyzer temperature over the run.'''
+
+    Name = "AnalyzerTemperature"
+    Pattern = "Analyzer Temperature"
+
+    def Needs(self, Context: ExtractionContext) -> MetricNeeds:
+        return MetricNeeds(TrailerFields=[self.Pattern])
+
+    def Compute(self, Data: ExtractionData) -> Dict[str, Any]:
+        # because this might be different with different machines, I want an error to be raised in case I read wrong data
+        Label = Data.Fields[self.Pattern][1]
+        if Label != "Analyzer Temperature:":
+            raise ValueError("Extracted Values in ListTrailerFields Function not as expected. Check the tailer field numbers. Values in Namesfield: " + f'{Label}') from None
+
+        trailerValues_Temp = Data.Trailer[self.Pattern]
+        return {"AnalyzerTemp_mean": trailerValues_Temp.mean().item(),
+                "AnalyzerTemp_std": trailerValues_Temp.std().item(),
+                "AnalyzerTemp_ScansUsed": Data.TrailerScansUsed}
+
+
+@RegisterMetric
+class FAIMSAttached(MetricExtractor):
+    '''Whether a FAIMS is attached, the field is not recorded by every instrument.'''
+
+    Name = "FAIMSAttached"
+    Pattern = "FAIMS Attached"
+
+    def Needs(self, Context: ExtractionContext) -> MetricNeeds:
+        return MetricNeeds(TrailerFirstScanFields=[self.Pattern])
+
+    def Compute(self, Data: ExtractionData) -> Dict[str, Any]:
+        Label = Data.Fields[self.Pattern][1]
+        if Label is None:
+            return {"FAIMSattached": "notRecorded"}
+        if Label != "FAIMS Attached:":
+            raise ValueError("Extracted Values in ListTrailerFields Function not as expected. Check the tailer field numbers. Values in Namesfield: " + f'{Label}') from None
+        return {"FAIMSattached": str(Data.TrailerFirstScan[self.Pattern])}
+
+
+@RegisterMetric
+class PumpPressure(MetricExtractor):
+    '''Initial, min, max and std of the pump pressure, only recorded by the Neo.
+
+    Analog device 2 (in the RawFileReader SelectInstrument(Device.Analog, 2))
+    this is the A/D Card 2 = Pump Pressure
+    Tracetype to look at is A2DChannel1 for pump pressure
+
+    for Sampler Pressure set (Device.Analog, 1)
+    '''
+
+    Name = "PumpPressure"
+    Trace = (2, 1)
+
+    def Needs(self, Context: ExtractionContext) -> MetricNeeds:
+        if "Neo" in Context.MachineCombination:
+            return MetricNeeds(Traces=[self.Trace])
+        return MetricNeeds()
+
+    def Compute(self, Data: ExtractionData) -> Dict[str, Any]:
+        # in the beginning some Neos we not configured yet to record/safe the pump pressure, so there were some errors with older files
+        Sample = Data.Traces.get(self.Trace)
+        if Sample is None:
+            return {}
+
+        values = Sample.Values
+        return {"InitialPressure_Pump": values[0].item(),
+                "MinPressure_Pump": values.min().item(),
+                "MaxPressure_Pump": values.max().item(),
+                "Std_Pressure_Pump": values.std().item(),
+                "PumpPressure_ScansUsed": Sample.ScansUsed}
@@ -1,14 +1,19 @@
 import sys, os
+import threading
+import time
 from watchdog.observers import Observer
 from watchdog.events import LoggingEventHandler
 from queue import Queue
 from raw2meta.config.paths import TempFolder
+from raw2meta.config.configuration import SUPPORTED_FILE_EXTENSIONS, EventDebounce
 from raw2meta.helper.common import GetDirectoriesToObserve, MakePathNice
 from raw2meta.db.FillDatabase_logic import FillDatabase_Fun, FillDatabase_old, SampleReadyToProcess
 
 from raw2meta.config.logger import  get_configured_logger
 from raw2meta.db.database_helper import MissingFilesFromDatabase
-from typing import Any, Union, List
+from typing import Any, Callable, Dict, Union, List, Optional
+from concurrent.futures import Executor
+from functools import partial
 from pathlib import Path
 
 
@@ -16,18 +21,67 @@ logger = get_configured_logger(__name__)
 
 q = Queue()
 
+# put into the queue when the stop_event is set, it wakes up the consumer that waits for new files
+StopSignal = object()
+
+
+def WakeOnStop(stop_event: threading.Event, q: Queue) -> threading.Thread:
+    """Starts a thread that puts StopSignal into the queue once the stop_event is set.
+    :param stop_event: Event to signal stopping.
+    :type stop_event: threading.Event
+    :param q: Queue the consumer waits on.
+    :type q: Queue
+    :return: The thread.
+    :rtype: threading.Thread
+    """
+    def Wake() -> None:
+        stop_event.wait()
+        q.put(StopSignal)
+
+    thread = threading.Thread(target=Wake, name="WakeOnStop", daemon=True)
+    thread.start()
+    return thread
+
+
 class MyHandler(LoggingEventHandler):
-    def __init__(self, q: Queue) -> None:
+    def __init__(self, q: Queue, Debounce: float = EventDebounce) -> None:
         """Custom event handler for monitoring file system events.
+        Raw files that are created, modified or renamed to .raw (copy tools that write to a temporary name) are put into the queue.
+        The events of a path within Debounce seconds are put only once, the copy of a large file sends many modified events.
 
         :param q: Queue to put the paths of created files.
         :type q: Queue
+        :param Debounce: Seconds in which further events of the same path are dropped, defaults to EventDebounce (processing: event_debounce_seconds)
+        :type Debounce: float, optional
         :return: None
         :rtype: None
 
         """
         super().__init__()
         self.q = q
+        self.Debounce = Debounce
+        self._lock = threading.Lock()
+        # path -> time its last event was put into the queue
+        self._recent: Dict[str, float] = {}
+
+    def _put(self, path: str) -> None:
+        """Puts the path of a raw file into the queue, unless it was put within the debounce window.
+        :param path: Path of the file.
+        :type path: str
+        :return: None
+        :rtype: None
+        """
+        if os.path.splitext(path)[1] not in SUPPORTED_FILE_EXTENSIONS:
+            return
+        Now = time.monotonic()
+        with self._lock:
+            Last = self._recent.get(path)
+            if Last is not None and Now - Last < self.Debounce:
+                return
+            self._recent[path] = Now
+            if len(self._recent) > 1000:
+                self._recent = {Recent: Time for Recent, Time in self._recent.items() if Now - Time < self.Debounce}
+        self.q.put(path)
 
     def on_created(self, event: Any) -> None:
         """Called when a file is created.
@@ -39,18 +93,19 @@ class MyHandler(LoggingEventHandler):
         :rtype: None
         """
         if event.event_type == "created" and not event.is_directory:
-            self.q.put(event.src_path)
+            self._put(event.src_path)
 
     def on_modified(self, event: Any) -> None:
         """Called when a file is modified.
-        Nothing happens on modification.
+        Edits the q with the path of the modified file, e.g. a file that was created before the observer started.
         :param event: The file system event.
         :type event: Any
         :return: None
         :rtype: None
         """
-        # Override to prevent logging every modification
-        pass
+        # no logging, every write of a copy is a modification
+        if not event.is_directory:
+            self._put(event.src_path)
 
     def on_deleted(self, event: Any) -> None:
         """Called when a file is deleted.
@@ -65,14 +120,14 @@ class MyHandler(LoggingEventHandler):
 
     def on_moved(self, event: Any) -> None:
         """Called when a file is moved.
-        Nothing happens on move.
+        Edits the q with the new path, copy tools that write to a temporary name rename the file to .raw at the end.
         :param event: The file system event.
         :type event: Any
         :return: None
         :rtype: None
         """
-        # Override to prevent logging every move
-        pass        
+        if not event.is_directory:
+            self._put(event.dest_path)
 
 def start_watch(path_to_watch: Union[str, Path], q: Queue) -> Any:
     """Starts watching a directory for file system events.
@@ -109,18 +164,27 @@ class ObservingFolders():
 
     """
 
-    def __init__(self, MassSpecDirectory_ToObserve: Union[str, Path], Metadata_DB: Union[str, Path]) -> None:
+    def __init__(self, MassSpecDirectory_ToObserve: Union[str, Path], Metadata_DB: Union[str, Path], FileQueue: Any = q,
+                 Database: Optional[Executor] = None) -> None:
         '''Initializes the ObservingFolders class.
         :param MassSpecDirectory_ToObserve: The base directory to observe for mass spectrometry data.
         :type MassSpecDirectory_ToObserve: Union[str, Path]
         :param Metadata_DB: The path to the metadata database.
         :type Metadata_DB: Union[str, Path]
+        :param FileQueue: Queue for the paths of new files (anything with put()), defaults to the module queue q
+        :type FileQueue: Any, optional
+        :param Database: Optional executor that does all database work of the consumer, e.g. the database thread of the IngestionDaemon.
+            RerunningTwoMonths then puts the missing files into FileQueue like new files and runs its queries and the temp files on it,
+            without it RerunningTwoMonths writes the files itself.
+        :type Database: Optional[Executor], optional
         :return: None
         :rtype: None
         '''
 
         self.MassSpecDirectory_ToObserve = MassSpecDirectory_ToObserve
         self.Metadata_DB = Metadata_DB
+        self.FileQueue = FileQueue
+        self.Database = Database
         self.DirectoryObserver1 = ""
         self.DirectoryObserver2 = ""
         self.DirectoryObserver3 = ""
@@ -155,11 +219,11 @@ class ObservingFolders():
             for indxM, MonthDir in enumerate(Directories[1:]):
                 if os.path.isdir(MonthDir):
                     if indxM == 0:
-                        self.DirectoryObserver1 = start_watch(MonthDir, q)
+                        self.DirectoryObserver1 = start_watch(MonthDir, self.FileQueue)
                     elif indxM == 1:
-                        self.DirectoryObserver2 = start_watch(MonthDir, q)
+                        self.DirectoryObserver2 = start_watch(MonthDir, self.FileQueue)
                     elif indxM == 2:
-                        self.DirectoryObserver3 = start_watch(MonthDir, q)
+                        self.DirectoryObserver3 = start_watch(MonthDir, self.FileQueue)
 
 
             logger.info("Observer started")
@@ -180,6 +244,17 @@ class ObservingFolders():
 
   
        
+    def _database_call(self, Function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        '''Run the function on the Database executor if there is one, otherwise in this thread.
+        :param Function: Function that uses the database.
+        :type Function: Callable[..., Any]
+        :return: Return value of the function.
+        :rtype: Any
+        '''
+        if self.Database is None:
+            return Function(*args, **kwargs)
+        return self.Database.submit(partial(Function, *args, **kwargs)).result()
+
     def RerunningTwoMonths(self, stop_event: Any) -> None:
 
        '''
@@ -202,7 +277,7 @@ class ObservingFolders():
                         break    
                     Directory_joined = os.path.join(self.MassSpecDirectory_ToObserve, Directory)
                  
-                    ListMissingRawFiles = MissingFilesFromDatabase(self.Metadata_DB, Directory_joined)
+                    ListMissingRawFiles = self._database_call(MissingFilesFromDatabase, self.Metadata_DB, Directory_joined)
             
                     if not ListMissingRawFiles:
                         logger.info(f"Missing from Directory: {len(ListMissingRawFiles)} files")
@@ -214,6 +289,10 @@ class ObservingFolders():
                         rawFile = MakePathNice(rawFile)
                         if stop_event.is_set():
                             break                                 
+                        if self.Database is not None:
+                            # checked, read and written by the consumer like a new file
+                            self.FileQueue.put(os.path.join(Directory_joined, rawFile))
+                            continue
                         if SampleReadyToProcess(rawFile, Directory_joined, self.Metadata_DB, stop_event=stop_event):
                             rawFile_fullpath = os.path.join(Directory_joined, rawFile)
                             FillDatabase_Fun(rawFile_fullpath, self.Metadata_DB, stop_event=stop_event)
@@ -227,7 +306,7 @@ class ObservingFolders():
                         if stop_event.is_set():
                             break
 
-                        FillDatabase_old(file, self.Metadata_DB)
+                        self._database_call(FillDatabase_old, file, self.Metadata_DB)
 
                 loop_stop_event1 = True        
 
@@ -240,6 +319,6 @@ class ObservingFolders():
                 
        for Directory in DoubleCheck:
             Directory_joined = os.path.join(self.MassSpecDirectory_ToObserve, Directory)
-            ListMissingRawFiles = MissingFilesFromDatabase(self.Metadata_DB, Directory_joined)
+            ListMissingRawFiles = self._database_call(MissingFilesFromDatabase, self.Metadata_DB, Directory_joined)
             logger.info("Missing from directory %s after checking past two months: %d files", Directory, len(ListMissingRawFiles))
 
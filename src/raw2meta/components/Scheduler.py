@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Set, Tuple
+from raw2meta.config.configuration import ObserverWorkers, StabilityPoll
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+
+class ReadinessScheduler:
+
+    '''Delay scheduler for the observed files: every file waits in a heap until its ready time,
+    then a pool of worker threads processes it. The waiting times of the files overlap, so when the backup copies
+    many files at once, the last one is not processed after the waiting times of all the others.
+    With a Ready function a due file is polled first and goes back into the heap for PollInterval seconds while it is not ready.
+    A file is only scheduled once until it is processed or dropped, so repeated events of a file do not read it twice.
+    '''
+
+    def __init__(self, Process: Callable[[str], Any], Workers: int = ObserverWorkers,
+                 stop_event: Optional[threading.Event] = None, Ready: Optional[Callable[[str], bool]] = None,
+                 PollInterval: float = StabilityPoll) -> None:
+        '''Initialize the scheduler, the threads start with start().
+        :param Process: Function that processes a ready file, called in a worker thread.
+        :type Process: Callable[[str], Any]
+        :param Workers: Files that are processed at the same time, defaults to ObserverWorkers (processing: observer_workers)
+        :type Workers: int, optional
+        :param stop_event: Optional event, once it is set the files that are not ready yet are dropped.
+        :type stop_event: Optional[threading.Event], optional
+        :param Ready: Optional check whether a due file can be processed, e.g. StabilityMonitor.Ready. An exception drops the file.
+        :type Ready: Optional[Callable[[str], bool]], optional
+        :param PollInterval: Seconds until a file that is not ready is checked again, defaults to StabilityPoll (processing: stability_poll_seconds)
+        :type PollInterval: float, optional
+        :return: None
+        :rtype: None
+        '''
+        self.Process = Process
+        self.Workers = max(Workers, 1)
+        self.stop_event = stop_event
+        self.Ready = Ready
+        self.PollInterval = PollInterval
+        # (ready time, order of arrival, file)
+        self._heap: List[Tuple[float, int, str]] = []
+        # files in the heap or in the workers
+        self._pending: Set[str] = set()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ReadinessScheduler":
+        '''Start the dispatcher thread and the worker pool.
+        :return: The scheduler.
+        :rtype: ReadinessScheduler
+        '''
+        self._executor = ThreadPoolExecutor(max_workers=self.Workers, thread_name_prefix="ReadinessWorker")
+        self._thread = threading.Thread(target=self._run, name="ReadinessScheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def Schedule(self, File: str, Delay: float) -> bool:
+        '''Process the file once Delay seconds have passed, unless it is already scheduled.
+        :param File: Path of the file.
+        :type File: str
+        :param Delay: Seconds until the file is ready.
+        :type Delay: float
+        :return: True if the file was scheduled, False if it is already pending.
+        :rtype: bool
+        '''
+        with self._condition:
+            if File in self._pending:
+                return False
+            self._pending.add(File)
+            self._push(File, Delay)
+        return True
+
+    def _push(self, File: str, Delay: float) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + Delay, next(self._counter), File))
+            self._condition.notify()
+
+    def Pending(self) -> int:
+        '''Number of files that are not ready yet.
+        :return: Number of waiting files.
+        :rtype: int
+        '''
+        with self._condition:
+            return len(self._heap)
+
+    def stop(self) -> None:
+        '''Drop the files that are not ready yet, wait for the files that are processed and stop the threads.
+        The dropped files are found again by RerunningTwoMonths.
+        :return: None
+        :rtype: None
+        '''
+        with self._condition:
+            self._stopping = True
+            if self._heap:
+                logger.info(f"{len(self._heap)} files were not ready yet and are not processed")
+            self._heap.clear()
+            self._pending.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "ReadinessScheduler":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _process(self, File: str) -> None:
+        if self.Ready is not None:
+            try:
+                Ready = self.Ready(File)
+            except Exception as e:
+                logger.error(f"{File} is not processed: {e!r}")
+                self._done(File)
+                return
+            if not Ready:
+                with self._condition:
+                    if not self._stopping:
+                        # stays pending, checked again after PollInterval
+                        self._push(File, self.PollInterval)
+                return
+        try:
+            self.Process(File)
+        except Exception:
+            # one file must not stop the worker pool
+            logger.exception(f"Error processing {File}")
+        finally:
+            self._done(File)
+
+    def _done(self, File: str) -> None:
+        with self._condition:
+            self._pending.discard(File)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                Stopping = self._stopping or (self.stop_event is not None and self.stop_event.is_set())
+                if Stopping:
+                    return
+                Now = time.monotonic()
+                if not self._heap or self._heap[0][0] > Now:
+                    Timeout = self._heap[0][0] - Now if self._heap else None
+                    if self.stop_event is not None:
+                        # wake up regularly to see the stop_event
+                        Timeout = 0.5 if Timeout is None else min(Timeout, 0.5)
+                    self._condition.wait(timeout=Timeout)
+                    continue
+                _, _, File = heapq.heappop(self._heap)
+            self._executor.submit(self._process, File)
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from raw2meta.config.paths import TrailerLayoutCacheFile
+from raw2meta.config.logger import get_configured_logger
+from raw2meta.reader.RawReader import RawReader
+
+logger = get_configured_logger(__name__)
+
+FieldPosition = Tuple[Optional[int], Optional[str]]
+
+
+def FindTrailerFields(trailerLabels: List[str], Patterns: List[str]) -> Dict[str, FieldPosition]:
+    """Searches the trailer labels for the patterns, the last matching label is used.
+    :param trailerLabels: Labels of the trailer extra fields.
+    :type trailerLabels: List[str]
+    :param Patterns: Regex patterns of the fields, e.g. "Analyzer Temperature".
+    :type Patterns: List[str]
+    :return: Index and label of every pattern, (None, None) if it is not in the file.
+    :rtype: Dict[str, FieldPosition]
+    """
+    Fields = {Pattern: (None, None) for Pattern in Patterns}
+    for i, Label in enumerate(trailerLabels):
+        for Pattern in Patterns:
+            if re.search(Pattern, Label) is not None:
+                Fields[Pattern] = (i, Label)
+    return Fields
+
+
+class TrailerLayoutCache:
+    '''Positions of the trailer extra fields, stored per instrument model, software version and number of fields.
+
+    The trailer layout is the same for all files from the same instrument and software version,
+    so the labels only need to be searched once. The cache is saved as json, so it is kept between runs.
+    The labels at the cached positions are checked for every file, if they do not match
+    (e.g. after a software update that did not change the version) the layout is searched again and the cache is updated.
+    '''
+
+    def __init__(self, CacheFile: Union[str, Path] = TrailerLayoutCacheFile) -> None:
+        """Initialize with the location of the json file, the file is only read when the cache is used.
+        :param CacheFile: Path to the json file.
+        :type CacheFile: Union[str, Path]
+        :return: None
+        :rtype: None
+        """
+        self.CacheFile = Path(CacheFile)
+        self._layouts = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, List]]:
+        """Reads the json file once.
+        :return: Cached layouts.
+        :rtype: Dict[str, Dict[str, List]]
+        """
+        if self._layouts is None:
+            try:
+                with open(self.CacheFile, "r") as openfile:
+                    self._layouts = json.load(openfile)
+            except FileNotFoundError:
+                self._layouts = {}
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(f"Trailer layout cache {self.CacheFile} not readable, rebuilding it: {e}")
+                self._layouts = {}
+        return self._layouts
+
+    def _save(self) -> None:
+        """Writes the cache to a temporary file and replaces the json file, so other processes never read half a file.
+        :return: None
+        :rtype: None
+        """
+        try:
+            os.makedirs(self.CacheFile.parent, exist_ok=True)
+            TempFile = self.CacheFile.with_name(f"{self.CacheFile.name}.{os.getpid()}.tmp")
+            with open(TempFile, "w") as outfile:
+                json.dump(self._layouts, outfile, indent=2)
+            os.replace(TempFile, self.CacheFile)
+        except OSError as e:
+            logger.warning(f"Could not save trailer layout cache {self.CacheFile}: {e}")
+
+    def GetFields(self, rawFile: RawReader, Patterns: List[str]) -> Dict[str, FieldPosition]:
+        """Positions of the trailer fields, from the cache if the cached labels still match.
+        :param rawFile: The opened raw file.
+        :type rawFile: RawReader
+        :param Patterns: Regex patterns of the fields, e.g. "Analyzer Temperature".
+        :type Patterns: List[str]
+        :return: Index and label of every pattern, (None, None) if it is not in the file.
+        :rtype: Dict[str, FieldPosition]
+        """
+        # the number of fields is part of the key: a field that is not in the file (None) can not be checked at a position,
+        # e.g. "FAIMS Attached:" is only written when FAIMS is attached, the files without it have one field less.
+        # The trailer header is read for every file anyway, TrailerLabel reads it for the label check.
+        Instrument = rawFile.InstrumentData()
+        FieldCount = rawFile.TrailerFieldCount()
+        Key = f"{Instrument.Model}|{Instrument.SoftwareVersion}|{FieldCount}"
+
+        with self._lock:
+            Cached = self._load().get(Key, {})
+
+        if all(Pattern in Cached for Pattern in Patterns):
+            Fields = {Pattern: tuple(Cached[Pattern]) for Pattern in Patterns}
+            try:
+                Matches = all(Label is None or rawFile.TrailerLabel(FieldNum) == Label for FieldNum, Label in Fields.values())
+            except Exception:
+                # the file has fewer fields than the cached layout (IndexError, IndexOutOfRangeException of .NET)
+                Matches = False
+            if Matches:
+                return Fields
+            logger.info(f"Trailer layout of {Key} changed, searching the trailer fields again")
+
+        Fields = FindTrailerFields(rawFile.TrailerLabels(), Patterns)
+
+        with self._lock:
+            self._load().setdefault(Key, {}).update({Pattern: list(Position) for Pattern, Position in Fields.items()})
+            self._save()
+
+        return Fields
+
+
+TrailerLayouts = TrailerLayoutCache()
@@ -4,6 +4,7 @@ from typing import Tuple
 from raw2meta.config.configuration import  TablesMetaData
 from raw2meta.db.database_helper import GetTableNames
 from raw2meta.db.CreateDatabase import Database_CreateTables
+from raw2meta.db.migrations import MigrateDatabase
 from raw2meta.config.paths import DEFAULT_METADATA_DB, DEFAULT_MASS_SPEC_DIR
 from raw2meta.helper.common import MakePathNice
 from raw2meta.config.logger import get_configured_logger
@@ -14,7 +15,7 @@ logger = get_configured_logger(__name__)
 
 
 def _validate_database_tables(db_path: Union[str, Path]) -> bool:
-    '''Check if database has required tables.
+    '''Check if database has required tables, other tables are allowed.
     :param db_path: Path to the database file.
     :type db_path: Union[str, Path]
     :return: True if all required tables are present, False otherwise.
@@ -22,7 +23,11 @@ def _validate_database_tables(db_path: Union[str, Path]) -> bool:
     '''
     try:
         table_names = GetTableNames(db_path)
-        return set(table_names) == set(TablesMetaData)
+        if not set(TablesMetaData) <= set(table_names):
+            return False
+        # databases of older versions are upgraded (new columns, indexes), otherwise inserting samples fails
+        MigrateDatabase(db_path)
+        return True
     except Exception as e:
         logger.error(f"Error validating database tables: {e}")
         return False
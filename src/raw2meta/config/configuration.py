@@ -1,3 +1,4 @@
+import os
 from raw2meta.config.paths import PACKAGE_ROOT
 from raw2meta.config.logger import get_configured_logger
 from raw2meta.config.loadParams import PACKAGE_LOCATION, load_params
@@ -12,8 +13,43 @@ RETRY_DELAY_BASE = 5  # seconds
 PARAMS = load_params()
 
 DaysWaiting = PARAMS.get('processing', {}).get('days_waiting')
-FileWaitTime = PARAMS.get('processing', {}).get('file_wait_time_minutes')
 MinFileSize = PARAMS.get('processing', {}).get('min_file_size_kb')
+StabilityPoll = PARAMS.get('processing', {}).get('stability_poll_seconds', 2)
+StabilityWindow = PARAMS.get('processing', {}).get('stability_window_seconds', 30)
+StabilityCheckLock = PARAMS.get('processing', {}).get('stability_check_lock', True)
+StabilityTimeout = 60 * PARAMS.get('processing', {}).get('stability_timeout_minutes', 240)
+ObserverWorkers = PARAMS.get('processing', {}).get('observer_workers', 4)
+EventDebounce = PARAMS.get('processing', {}).get('event_debounce_seconds', 2)
+ConsumerWake = PARAMS.get('processing', {}).get('consumer_wake_seconds', 5)
+ConsumerReport = PARAMS.get('processing', {}).get('consumer_report_minutes', 60)
+
+PumpPressureScans = PARAMS.get('extraction', {}).get('pump_pressure_scans', 1000)
+PumpPressureReadMode = PARAMS.get('extraction', {}).get('pump_pressure_read_mode', "range")
+PumpPressureChunkScans = PARAMS.get('extraction', {}).get('pump_pressure_chunk_scans', 0)
+TrailerScans = PARAMS.get('extraction', {}).get('trailer_scans', 500)
+SamplingMode = PARAMS.get('extraction', {}).get('sampling_mode', "adaptive")
+SamplingInitialScans = PARAMS.get('extraction', {}).get('sampling_initial_scans', 64)
+SamplingTolerance = PARAMS.get('extraction', {}).get('sampling_tolerance', 0.01)
+
+BacklogWorkers = PARAMS.get('backlog', {}).get('workers', 1)
+
+CachedStatements = PARAMS.get('database', {}).get('cached_statements', 128)
+StorageProfile = PARAMS.get('storage', {})
+
+WriterEnabled = PARAMS.get('writer', {}).get('enabled', False)
+WriterBatchSize = PARAMS.get('writer', {}).get('batch_size', 200)
+WriterMaxDelay = PARAMS.get('writer', {}).get('max_delay_seconds', 2.0)
+
+ExportEnabled = PARAMS.get('export', {}).get('enabled', False)
+ExportInterval = PARAMS.get('export', {}).get('interval_minutes', 10)
+
+# the environment variable makes it possible to use the synthetic reader on build machines without changing params.yaml
+ReaderBackend = os.environ.get("RAW2META_READER") or PARAMS.get('reader', {}).get('backend', "thermo")
+SyntheticReaderParams = PARAMS.get('reader', {}).get('synthetic', {})
+
+ImportBudgets = PARAMS.get('import_budget', {}).get('seconds', {})
+ImportBudgetRepeats = PARAMS.get('import_budget', {}).get('repeats', 3)
+LazyModules = PARAMS.get('import_budget', {}).get('lazy_modules', [])
 
 TablesMetaData = PARAMS.get('data', {}).get('Tables_Metadata_db')
 
@@ -22,7 +58,7 @@ HPLCDict = PARAMS.get('HPLCDict', {})
 
 logger.info(f"Derived configuration:")
 logger.info(f"Waiting {DaysWaiting} days for old projects (DaysWaiting)")
-logger.info(f"Waiting {FileWaitTime} min for copying (FileWaitTime)")
+logger.info(f"Files are ready when unchanged for {StabilityWindow} s (StabilityWindow)")
 logger.info(f"Minimum file size for non corrupt files: {MinFileSize} KB (MinFileSize)")
 
         
@@ -16,11 +16,16 @@ config_path = BASE_DIR / "MachinesDict.json"
 
 
 Thermo_path = PACKAGE_ROOT / "RawFileReader" / "RawFileReader_dll" / "Net471"
-TempFolder = PACKAGE_LOCATION /  "TEMP"
+
+# TEMP, Cache and Logs are next to params.yaml, RAW2META_RUNTIME_DIR moves them (e.g. for benchmarks that should not touch the real TEMP folder)
+RUNTIME_LOCATION = Path(os.environ.get("RAW2META_RUNTIME_DIR") or PACKAGE_LOCATION)
+TempFolder = RUNTIME_LOCATION /  "TEMP"
+CacheFolder = RUNTIME_LOCATION / "Cache"
+TrailerLayoutCacheFile = CacheFolder / "TrailerLayout.json"
 
 # logfiles
 currentdate = datetime.now().strftime("%Y%m%d")
-LOGS_DIR = PACKAGE_LOCATION / "Logs"
+LOGS_DIR = RUNTIME_LOCATION / "Logs"
 Logfile_corrupt = LOGS_DIR / f"{currentdate}_FilesWithError.log"
 Logfile_empty = LOGS_DIR / f"{currentdate}_EmptyFiles.log"
 Logfile_Integrity = LOGS_DIR / f"{currentdate}_AlreadyinDB.log"
@@ -38,6 +43,9 @@ elif os.path.isfile(metadata_db_path):
 else:
     DEFAULT_METADATA_DB = Path(PACKAGE_LOCATION /metadata_db_path).as_posix()
 
+# Parquet snapshots for the dashboards, relative paths are next to TEMP
+SnapshotFolder = RUNTIME_LOCATION / PARAMS.get('export', {}).get('directory', "Snapshots")
+
 mass_spec_directory = PARAMS.get('data', {}).get('mass_spec_directory')
 DEFAULT_MASS_SPEC_DIR = mass_spec_directory
 
@@ -1,6 +1,7 @@
-import sqlite3
 from typing import Union
 from pathlib import Path
+from raw2meta.db.connection import GetConnection
+from raw2meta.db.migrations import MigrateDatabase
 
 
 def Database_CreateTables(Metadata_DB: Union[str, Path]) -> None:
@@ -36,21 +37,21 @@ def Database_CreateTables(Metadata_DB: Union[str, Path]) -> None:
     Std_Pressure_Pump real,
     AnalyzerTemp_mean real,  
     AnalyzerTemp_std real,  
+    PumpPressure_ScansUsed integer,
+    AnalyzerTemp_ScansUsed integer,
     Error text,
     FOREIGN KEY (ProjectID)
             REFERENCES Metadata_Project (ProjectID) 
     )'''
 
-    sql3 =  '''CREATE TABLE IF NOT EXISTS TEMP_forJoin(
-    RawfileNames text 
-    )'''
 
-    with sqlite3.connect(Metadata_DB) as con:
-        
+    # the connection applies the storage profile, the journal mode (WAL) is stored in the new database file
+    con = GetConnection(Metadata_DB)
+    with con:
         cur = con.cursor()    
         cur.execute(sql1)
-        con.commit()
         cur.execute(sql2)
-        con.commit()
-        cur.execute(sql3)
-        con.commit()
+
+    # creates the indexes and records the schema version, existing databases are upgraded in place
+    MigrateDatabase(Metadata_DB)
+
@@ -2,15 +2,14 @@ import os
 import re
 from typing import Optional, Union
 from raw2meta.helper.common import SplitProjectName, get_ProjectID_withClosestDate
-from raw2meta.helper.Exceptions import NoFittingProjectFound, HandlingEmptyFileError, HandlingCorruptFileError
+from raw2meta.helper.Exceptions import NoFittingProjectFound
 from raw2meta.components.GetMetadata import MetadataLists
 from raw2meta.config.paths import TempFolder
 from raw2meta.db.database_helper import ReadJson,  SaveToJson, WriteEntries
+from raw2meta.db.project_index import GetProjectIndex
 from raw2meta.config.logger import get_configured_logger
-from System import ArgumentOutOfRangeException, IndexOutOfRangeException
 from raw2meta.config.configuration import DaysWaiting
 from datetime import datetime
-import pandas as pd
 from pathlib import Path
 from raw2meta.entity.entities import SampleEntry, ProjectEntry
 
@@ -34,13 +33,9 @@ class Execute_CreateSQLdbCode():
         self.replace_ErrorFile = self.WriteEntries.replace_ErrorFile    
         self.write_sample_entries = self.WriteEntries.write_sample_entries
         self.write_CorruptFile = self.WriteEntries.write_CorruptFile
-        self.execute_query_pd = self.WriteEntries.execute_query_pd
         self.Metadata_DB = Metadata_DB
-        
-        # Query name constants
-        self.COUNT_PROJECT_QUERY = "Count_ProjectID_Query"
-        self.REGEX_PROJECT_QUERY = "RegExProjectID_Query"
-        self.REGEX_PROJECT_QUERY_SAMPLE_TABLE = "RegExProjectID_SampleTable_Query"
+        # projects and latest samples in memory, the lookups below do not query the database per file
+        self.ProjectIndex = GetProjectIndex(Metadata_DB)
 
     def _is_standard_sample(self, sample_name: str) -> bool:
         """Check if sample is a standard (Hela or other standard).
@@ -58,8 +53,7 @@ class Execute_CreateSQLdbCode():
         :return: Matching project ID or None.
         :rtype: Optional[str]
         '''
-        row_count = self.execute_query_pd(self.COUNT_PROJECT_QUERY, params=(project_id,))
-        if row_count > 0:
+        if self.ProjectIndex.HasProject(project_id):
             return project_id
         return None
 
@@ -83,7 +77,7 @@ class Execute_CreateSQLdbCode():
         because at that point the project ID is not known yet and I want the Project metadata to be from the actual samples and not from the Hela. 
         Therefore, when there is no fitting Project ID I am writing the Hela into a .json first so it can be matched later, when the project started.
         
-        Because the dates can vary in the last two digits between project and Hela, I am using the ProjectID_regex/ ProjectID_regex_sql
+        Because the dates can vary in the last two digits between project and Hela, I am using the ProjectID_regex/ the project index (same machine, month and initials)
         to check whether the project already exists.
         
         When a new project is created the function goes into the TEMP folder and checks whether there are files that match the project ID and can be 
@@ -96,15 +90,9 @@ class Execute_CreateSQLdbCode():
         
         '''
       
-        try:
-            MetadataOutput = MetadataLists(RawfilePath)
-            SQLValues_Samples , SQLValues_Project= MetadataOutput.GetArray_SampleMetadata()
-           
-        except ArgumentOutOfRangeException:
-            raise HandlingCorruptFileError
-            
-        except IndexOutOfRangeException: 
-            raise HandlingEmptyFileError
+        # raises HandlingCorruptFileError or HandlingEmptyFileError, the reader backend translates its own exceptions
+        MetadataOutput = MetadataLists(RawfilePath)
+        SQLValues_Samples , SQLValues_Project= MetadataOutput.GetArray_SampleMetadata()
 
         self._handle_hela_and_project_matching(SQLValues_Samples, SQLValues_Project)
         
@@ -128,9 +116,9 @@ class Execute_CreateSQLdbCode():
         :rtype: None
         '''
                
-        _, _, ProjectID_regex_sql, ProjectID_Date = SplitProjectName(Tempfile)
+        ProjectID, _, _, ProjectID_Date = SplitProjectName(Tempfile)
 
-        Regex_Proj = self.execute_query_pd(self.REGEX_PROJECT_QUERY, params=(ProjectID_regex_sql,))
+        Regex_Proj = self.ProjectIndex.MatchingProjects(ProjectID)
 
         if len(Regex_Proj)==0:
             logger.info(f"No fitting Project found for file {Tempfile}.")
@@ -203,15 +191,9 @@ class Execute_CreateSQLdbCode():
         '''
          
        
-        try:
-            MetadataOutput = MetadataLists(RawfilePath)
-            SQLValues_Samples , SQLValues_Project= MetadataOutput.GetArray_SampleMetadata()
-            
-        except ArgumentOutOfRangeException:
-            raise HandlingCorruptFileError
-            
-        except IndexOutOfRangeException: 
-            raise HandlingEmptyFileError
+        # raises HandlingCorruptFileError or HandlingEmptyFileError, the reader backend translates its own exceptions
+        MetadataOutput = MetadataLists(RawfilePath)
+        SQLValues_Samples , SQLValues_Project= MetadataOutput.GetArray_SampleMetadata()
         
        
         self._handle_hela_and_project_matching_ReplaceError(SQLValues_Samples, SQLValues_Project)
@@ -227,7 +209,7 @@ class Execute_CreateSQLdbCode():
         :rtype: None
         """
 
-        _, ProjectID_regex, ProjectID_regex_sql, ProjectID_Date = SplitProjectName(SQLValues_Project.ProjectID)
+        _, ProjectID_regex, _, ProjectID_Date = SplitProjectName(SQLValues_Project.ProjectID)
         matching_project = self._find_matching_project(SQLValues_Project.ProjectID)
         if matching_project:
             # Exact match: add sample to existing project
@@ -235,16 +217,16 @@ class Execute_CreateSQLdbCode():
         else:
             if self._is_standard_sample(SQLValues_Samples.SampleName_ID):
                 # Standard sample: try to find close project by regex/date
-                regex_matches = self.execute_query_pd(self.REGEX_PROJECT_QUERY, params=(ProjectID_regex_sql,))
+                regex_matches = self.ProjectIndex.MatchingProjects(SQLValues_Project.ProjectID)
                 if len(regex_matches) == 0: # no matching project found even with regex, so I keep it as json for x days (specified in params) or until project samples are measured
                     SaveToJson(SQLValues_Project, SQLValues_Samples)
                     logger.info("Data stored in temp file")
                 else:
                     # returns the Project ID and Date of the last measured sample that matches the Regex
-                    regex_matches_Sample = self.execute_query_pd(self.REGEX_PROJECT_QUERY_SAMPLE_TABLE, params=(ProjectID_regex_sql,))
+                    regex_matches_Sample = self.ProjectIndex.LatestSample(SQLValues_Project.ProjectID)
                  
-                    if len(regex_matches_Sample) != 0:
-                        TimeDiff = pd.Timestamp(regex_matches_Sample["CreationDate"].iloc[0]).to_julian_date() - pd.Timestamp(SQLValues_Samples.CreationDate).to_julian_date()
+                    if regex_matches_Sample is not None:
+                        TimeDiff = (datetime.fromisoformat(regex_matches_Sample.CreationDate) - datetime.fromisoformat(SQLValues_Samples.CreationDate)).total_seconds() / 86400
                       
                          # if TimeDiff.days > DaysWaiting: # either not belonging to a project, and just a maintenance standard, or new project coming
                         if TimeDiff > DaysWaiting:
@@ -285,7 +267,7 @@ class Execute_CreateSQLdbCode():
         :rtype: None
         """
 
-        _, _, ProjectID_regex_sql, ProjectID_Date = SplitProjectName(SQLValues_Project.ProjectID)
+        _, _, _, ProjectID_Date = SplitProjectName(SQLValues_Project.ProjectID)
         
         matching_project = self._find_matching_project(SQLValues_Project.ProjectID)
         
@@ -295,7 +277,7 @@ class Execute_CreateSQLdbCode():
 
         else:
             if self._is_standard_sample(SQLValues_Samples.SampleName_ID):
-                regex_matches = self.execute_query_pd(self.REGEX_PROJECT_QUERY, params=(ProjectID_regex_sql,))
+                regex_matches = self.ProjectIndex.MatchingProjects(SQLValues_Project.ProjectID)
                 
                 if len(regex_matches) == 0:
                     self.replace_ErrorFile(SQLValues_Samples, SQLValues_Project)                          
@@ -1,15 +1,21 @@
 import os
-from typing import Union, Optional
+from typing import Union, Optional, List
 import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import timedelta, date
-import time
 import sqlite3
-from raw2meta.helper.Exceptions import HandlingEmptyFileError, HandlingCorruptFileError, NoFittingProjectFound
+from raw2meta.helper.Exceptions import HandlingEmptyFileError, HandlingCorruptFileError, NoFittingProjectFound, ExtractionFailedError
 from raw2meta.config.paths import Logfile_corrupt, Logfile_empty, TempFolder
 from raw2meta.db.FillDatabase_Fun import Execute_CreateSQLdbCode
+from raw2meta.db.known_samples import GetKnownSamples
+from raw2meta.components.GetMetadata import MetadataLists
+from raw2meta.entity.entities import SampleEntry, ProjectEntry
+from raw2meta.reader.RawReader import GetReaderBackend
 from raw2meta.helper.common import SplitProjectName, GetFilePath
-from raw2meta.config.configuration import DaysWaiting, MinFileSize
+from raw2meta.helper.FileStability import WaitUntilStable
+from raw2meta.config.configuration import DaysWaiting, MinFileSize, BacklogWorkers
 from raw2meta.config.logger import get_configured_logger
 
 
@@ -41,17 +47,30 @@ def FillDatabase_Fun(file: Union[str, Path], Metadata_DB: Union[str, Path], stop
     SQL_DB = Execute_CreateSQLdbCode(Metadata_DB) # gets the class for the functions 
 
     try:
-        time.sleep(30) # still wait an extra 30 seconds to be sure
         SQL_DB.FillDatabase(file) # gets metadata from file, raises HandlingCorruptFileError (ArgumentOutOfRangeException) or HandlingEmptyFileError (IndexOutOfRangeException)
         logger.info("DB Updated")
 
                                     
-    except HandlingCorruptFileError:
+    except (HandlingCorruptFileError, HandlingEmptyFileError) as Error:
+        _handle_file_error(file, Error, SQL_DB)
+
+def _handle_file_error(file: Union[str, Path], Error: Exception, SQL_DB: Execute_CreateSQLdbCode) -> None:
+    """Log corrupt and empty files, empty files below MinFileSize are written into the db as corrupt.
+    :param file: Path to the raw file.
+    :type file: Union[str, Path]
+    :param Error: HandlingCorruptFileError or HandlingEmptyFileError.
+    :type Error: Exception
+    :param SQL_DB: Class with the functions to write into the database.
+    :type SQL_DB: Execute_CreateSQLdbCode
+    :return: None
+    :rtype: None
+    """
+    if isinstance(Error, HandlingCorruptFileError):
         with open(Logfile_corrupt, "a") as logfile:
             logfile.write((file + "\n"))
         logger.info("Error while loading file, needs further inspection")
 
-    except HandlingEmptyFileError:
+    else:
         filesize = os.path.getsize(file)/1000 # filesize returned as byte -> convertion to kb
         
         if filesize < MinFileSize:
@@ -67,6 +86,103 @@ def FillDatabase_Fun(file: Union[str, Path], Metadata_DB: Union[str, Path], stop
                 logfile.write((file + "\n"))
             logger.info("No Scans found in file, but filesize above 15000 kb, needs further inspection.")
 
+
+@dataclass
+class ExtractionResult:
+    File: str
+    SQLValues_Samples: Optional[SampleEntry] = None
+    SQLValues_Project: Optional[ProjectEntry] = None
+    Error: Optional[Exception] = None
+
+
+def _init_extraction_worker() -> None:
+    """Runs once in every worker process, loads the reader backend (for the RawFileReader the .NET runtime) 
+    so it is not loaded again for every file.
+    :return: None
+    :rtype: None
+    """
+    GetReaderBackend()
+
+
+def ExtractMetadata(file: str) -> ExtractionResult:
+    """Reads the metadata of one file, runs in the worker processes of FillDatabase_Parallel.
+    Corrupt and empty files are returned with the error, so the writer can handle them.
+    Any other error is logged and returned as ExtractionFailedError, so one file does not stop the other files of the directory.
+    :param file: Path to the raw file.
+    :type file: str
+    :return: ExtractionResult with the entries or the error.
+    :rtype: ExtractionResult
+    """
+    try:
+        SQLValues_Samples, SQLValues_Project = MetadataLists(file).GetArray_SampleMetadata()
+        return ExtractionResult(file, SQLValues_Samples, SQLValues_Project)
+    except (HandlingCorruptFileError, HandlingEmptyFileError) as Error:
+        return ExtractionResult(file, Error=Error)
+    except Exception as Error:
+        logger.exception(f"Error reading {file}")
+        # only the message, errors of the reader (.NET) can not always be sent back from the worker process
+        return ExtractionResult(file, Error=ExtractionFailedError(f"{type(Error).__name__}: {Error}"))
+
+
+def FillDatabase_Parallel(files: List[str], Metadata_DB: Union[str, Path], Workers: int = BacklogWorkers,
+                          stop_event: Optional[threading.Event] = None) -> None:
+    """Extracts the metadata of many files in a pool of worker processes and writes them into the database from this process.
+    Every worker has its own reader (and .NET runtime), only this process writes into the database.
+    The entries are written in order of their creation date, like they would have been written by the observer,
+    because the matching of the Hela standards to the projects depends on the order.
+    There is no extra waiting time before reading, the files of the backlog are already copied.
+
+    :param files: Full paths to the raw files.
+    :type files: List[str]
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param Workers: Number of worker processes, defaults to BacklogWorkers
+    :type Workers: int, optional
+    :param stop_event: Optional threading event to stop before writing.
+    :type stop_event: Optional[threading.Event], optional
+    :return: None
+    :rtype: None
+    """
+    if not files:
+        return
+
+    SQL_DB = Execute_CreateSQLdbCode(Metadata_DB)
+
+    with ProcessPoolExecutor(max_workers=Workers, initializer=_init_extraction_worker) as executor:
+        try:
+            Results = list(executor.map(ExtractMetadata, files))
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    Extracted = sorted((Result for Result in Results if Result.Error is None), 
+                       key=lambda Result: (Result.SQLValues_Samples.CreationDate, Result.SQLValues_Samples.SampleName_ID))
+    Failed = sorted((Result for Result in Results if Result.Error is not None), key=lambda Result: Result.File)
+
+    for Result in Extracted + Failed:
+        if stop_event is not None and stop_event.is_set():
+            return
+        WriteExtractionResult(Result, SQL_DB)
+
+
+def WriteExtractionResult(Result: ExtractionResult, SQL_DB: Execute_CreateSQLdbCode) -> None:
+    """Writes the entries of an extracted file with the project matching, or handles its error.
+    :param Result: ExtractionResult of ExtractMetadata.
+    :type Result: ExtractionResult
+    :param SQL_DB: Class with the functions to write into the database.
+    :type SQL_DB: Execute_CreateSQLdbCode
+    :return: None
+    :rtype: None
+    """
+    if Result.Error is None:
+        SQL_DB._handle_hela_and_project_matching(Result.SQLValues_Samples, Result.SQLValues_Project)
+        logger.info(f"DB Updated with {Result.File}")
+    elif isinstance(Result.Error, ExtractionFailedError):
+        # not marked as corrupt, RerunningTwoMonths or the next backlog run read the file again
+        logger.error(f"{Result.File} is not written into the database: {Result.Error}")
+    else:
+        _handle_file_error(Result.File, Result.Error, SQL_DB)
+
 def FillDatabase_old(file: Union[str, Path], Metadata_DB: Union[str, Path]) -> None:
     """Process old temp files, inserting them if project now exists or after waiting period.
     :param file: Name of the temp file.
@@ -124,9 +240,10 @@ def FillDatabase_Corrupt(file: Union[str, Path], Metadata_DB: Union[str, Path])
 
 
 def SampleReadyToProcess(RawfilePath: Union[str, Path], Directory_joined: Union[str, Path],
-                          Metadata_DB: Union[str, Path], stop_event: Optional[threading.Event] = None) -> bool:
+                          Metadata_DB: Union[str, Path], stop_event: Optional[threading.Event] = None,
+                          WaitForCopy: bool = True) -> bool:
 
-    ''' Check if Sample is already in database and accessible 
+    ''' Check if Sample is already in database and fully copied
     :param RawfilePath: Full path to the raw file.
     :type RawfilePath: Union[str, Path]
     :param Directory_joined: Directory where the raw file is located.
@@ -135,46 +252,26 @@ def SampleReadyToProcess(RawfilePath: Union[str, Path], Directory_joined: Union[
     :type Metadata_DB: Union[str, Path]
     :param stop_event: Optional threading event to allow interrupting waits.
     :type stop_event: Optional[threading.Event], optional
+    :param WaitForCopy: Wait until the file is stable, False if the caller already did (e.g. the ReadinessScheduler of the observer)
+    :type WaitForCopy: bool, optional
     :return: True if the sample is ready to process, False otherwise.
     :rtype: bool
     '''
     RawfilePath, Name = GetFilePath(RawfilePath, Directory_joined)
 
     try:
-        with sqlite3.connect(Metadata_DB) as con:
-            cur = con.cursor()
-            RowCount = cur.execute('''SELECT EXISTS(SELECT 1 FROM Metadata_Sample 
-                                            WHERE SampleName_ID LIKE (?) LIMIT 1)''', (Name,)).fetchone()
-            ReturnValue, = RowCount
+        # ingested samples are found in memory, only unknown names are looked up in the database
+        InDatabase = GetKnownSamples(Metadata_DB).Contains(Name)
     except sqlite3.Error as e:
         logger.error(f"Database error checking sample {Name}: {e}")
         return False
 
-    if ReturnValue == 0:
+    if not InDatabase:
         logger.info(f"File from Q: {Name}")   
 
-        # Check if file is accessible (not being copied)
-        max_retries = 10
-        retry_count = 0
-        NotCopied = True
-        while NotCopied and retry_count < max_retries:
-            try:
-                with open(RawfilePath, "rb") as f:
-                    f.readline()
-                NotCopied = False
-            except PermissionError:
-                retry_count += 1
-                if retry_count >= max_retries:
-                    logger.error(f"File {RawfilePath} remained inaccessible after {max_retries} retries")
-                    return False
-                
-                if stop_event.wait(timeout=60):
-                        logger.info("Stop event set while waiting for file accessibility: %s", RawfilePath)
-                        return False
-                
-            except FileNotFoundError:
-                logger.error(f"File not found: {RawfilePath}")
-                return False
+        # size and modification time must not change for stability_window_seconds, files copied long ago are ready at the second poll
+        if WaitForCopy and WaitUntilStable(RawfilePath, stop_event) is None:
+            return False
 
         return True     
     else:
@@ -0,0 +1,168 @@
+import atexit
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Union
+from raw2meta.config.configuration import CachedStatements, StorageProfile
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+# one connection per process, thread and database, opening the database on the network share takes longer than most statements
+_local = threading.local()
+_lock = threading.Lock()
+_connections: List[sqlite3.Connection] = []
+
+
+def DatabaseKey(Metadata_DB: Union[str, Path]) -> str:
+    '''Same key for the different spellings of the same database path.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: Normalized absolute path.
+    :rtype: str
+    '''
+    return os.path.normcase(os.path.abspath(Metadata_DB))
+
+
+# pragmas that report numbers for some of their named values
+_PragmaNames = {"synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+                "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2}}
+
+
+def _normalize(Pragma: str, Value: Any) -> Any:
+    '''Bring configured and reported pragma values into the same form, e.g. "NORMAL" and 1 for synchronous.
+    :param Pragma: Pragma name.
+    :type Pragma: str
+    :param Value: Configured or reported value.
+    :type Value: Any
+    :return: Number or lower case string.
+    :rtype: Any
+    '''
+    if isinstance(Value, str):
+        Value = _PragmaNames.get(Pragma, {}).get(Value.upper(), Value)
+    return Value.lower() if isinstance(Value, str) else Value
+
+
+def _apply_pragmas(con: sqlite3.Connection, Pragmas: Dict[str, Any]) -> None:
+    '''Apply the pragmas once, when the connection is opened.
+    :param con: New connection.
+    :type con: sqlite3.Connection
+    :param Pragmas: Pragma name and value.
+    :type Pragmas: Dict[str, Any]
+    :return: None
+    :rtype: None
+    '''
+    for Pragma, Value in Pragmas.items():
+        Result = con.execute(f"PRAGMA {Pragma} = {Value}").fetchone()
+        # journal_mode reports the mode it ended up with, e.g. WAL is refused on some network file systems
+        if Pragma == "journal_mode" and Result is not None and _normalize(Pragma, Result[0]) != _normalize(Pragma, Value):
+            logger.warning(f"journal_mode {Value} could not be set, the database uses {Result[0]}")
+
+
+def GetStorageSettings(Metadata_DB: Union[str, Path], Pragmas: Iterable[str] = StorageProfile) -> Dict[str, Any]:
+    '''Read the effective value of the pragmas on the connection of the current thread.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param Pragmas: Names of the pragmas, defaults to the pragmas of StorageProfile (storage: in params.yaml)
+    :type Pragmas: Iterable[str], optional
+    :return: Pragma name and the value reported by SQLite.
+    :rtype: Dict[str, Any]
+    '''
+    con = GetConnection(Metadata_DB)
+    return {Pragma: con.execute(f"PRAGMA {Pragma}").fetchone()[0] for Pragma in Pragmas}
+
+
+def CheckStorageProfile(Metadata_DB: Union[str, Path], Profile: Dict[str, Any] = StorageProfile) -> bool:
+    '''Log the effective storage settings of the database and compare them with the profile.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param Profile: Expected pragma values, defaults to StorageProfile (storage: in params.yaml)
+    :type Profile: Dict[str, Any], optional
+    :return: True if every pragma has the configured value.
+    :rtype: bool
+    '''
+    Settings = GetStorageSettings(Metadata_DB, Profile)
+    Matches = True
+    for Pragma, Expected in Profile.items():
+        Ok = _normalize(Pragma, Settings[Pragma]) == _normalize(Pragma, Expected)
+        Matches = Matches and Ok
+        logger.info(f"{'OK  ' if Ok else 'DIFF'} {Pragma}: {Settings[Pragma]} (profile: {Expected})")
+    return Matches
+
+
+def GetConnection(Metadata_DB: Union[str, Path], Pragmas: Dict[str, Any] = StorageProfile) -> sqlite3.Connection:
+    '''Returns the connection of the current thread to the database, it is opened on the first call.
+    sqlite3 keeps the prepared statements of a connection (CachedStatements), so the statements
+    of the helpers are only compiled once per thread.
+    Use "with con:" around writes, it commits or rolls back, but does not close the connection.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param Pragmas: Pragmas applied to a new connection, defaults to StorageProfile (storage: in params.yaml)
+    :type Pragmas: Dict[str, Any], optional
+    :return: Open connection.
+    :rtype: sqlite3.Connection
+    '''
+    # a forked worker process must not use the connections of its parent
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+
+    Key = DatabaseKey(Metadata_DB)
+    con = _local.connections.get(Key)
+    if con is not None:
+        try:
+            con.total_changes
+        except sqlite3.ProgrammingError:
+            # closed by CloseConnections, open a new one
+            con = None
+    if con is None:
+        # check_same_thread=False only so that CloseConnections can close it at exit, it is never shared between threads
+        con = sqlite3.connect(Metadata_DB, cached_statements=CachedStatements, check_same_thread=False)
+        try:
+            _apply_pragmas(con, Pragmas)
+        except sqlite3.Error:
+            con.close()
+            raise
+        _local.connections[Key] = con
+        with _lock:
+            _connections.append(con)
+        logger.debug(f"Opened connection to {Metadata_DB} in {threading.current_thread().name}")
+    return con
+
+
+def CloseConnection(Metadata_DB: Union[str, Path]) -> None:
+    '''Close the connection of the current thread to the database, e.g. before the file is moved or deleted.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: None
+    :rtype: None
+    '''
+    if getattr(_local, "pid", None) != os.getpid():
+        return
+    con = _local.connections.pop(DatabaseKey(Metadata_DB), None)
+    if con is not None:
+        with _lock:
+            if con in _connections:
+                _connections.remove(con)
+        con.close()
+
+
+def CloseConnections() -> None:
+    '''Close all connections of this process. Registered with atexit, uncommitted changes are rolled back.
+    :return: None
+    :rtype: None
+    '''
+    with _lock:
+        Connections = [con for con in _connections]
+        _connections.clear()
+    for con in Connections:
+        try:
+            con.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error closing database connection: {e}")
+    if getattr(_local, "pid", None) == os.getpid():
+        _local.connections = {}
+
+
+atexit.register(CloseConnections)
@@ -1,14 +1,19 @@
 import sqlite3
-from typing import List, Tuple, Optional, Union, Any
+from typing import List, Tuple, Optional, Sequence, Union
 import re
 import json
-import pandas as pd
 import os
 import dataclasses 
+from dataclasses import dataclass
 from raw2meta.entity.entities import SampleEntry, ProjectEntry
 from raw2meta.config.paths import TempFolder
 from raw2meta.config.logger import get_configured_logger
 from raw2meta.helper.common import GetFilePath
+from raw2meta.db.connection import GetConnection
+from raw2meta.db.writer import GetWriter, INSERTED, DUPLICATE, REPLACED
+from raw2meta.db.known_samples import GetKnownSamples
+from raw2meta.db.project_index import GetProjectIndex
+from concurrent.futures import Future
 import time
 from pathlib import Path
 
@@ -23,11 +28,9 @@ def GetTableNames(Metadata_DB: Union[str, Path]) -> List[str]:
     :rtype: List[str]
     '''
     try:
-        with sqlite3.connect(Metadata_DB) as con:
-            cur = con.cursor()
-            names = cur.execute('''SELECT name FROM sqlite_master WHERE type='table';''')
-            names = cur.fetchall()
-            return [item for t in names for item in t]
+        con = GetConnection(Metadata_DB)
+        names = con.execute('''SELECT name FROM sqlite_master WHERE type='table';''').fetchall()
+        return [item for t in names for item in t]
     except sqlite3.Error as e:
         logger.error(f"Error getting table names: {e}")
         return []
@@ -110,6 +113,13 @@ def ReadJson(Tempfile: Union[str, Path]) -> Tuple[SampleEntry, ProjectEntry]:
         raise
 
 
+@dataclass
+class UpsertResult:
+    '''Outcome per row, in the order of the entries: INSERTED, REPLACED (error entry of the sample) or DUPLICATE.'''
+    Projects: List[str]
+    Samples: List[str]
+
+
 class WriteEntries:
 
     '''This class contains methods to write entries to the database.'''
@@ -124,68 +134,147 @@ class WriteEntries:
 
         self.Metadata_DB = Metadata_DB 
         
-        # SQL statements
-        self.InsertSQL1_Project = '''INSERT INTO Metadata_Project(ProjectID,ProjectID_Date, Instrument, SoftwareVersion, 
+        # SQL statements, a project that is already in the database is kept
+        self.UpsertSQL1_Project = '''INSERT INTO Metadata_Project(ProjectID,ProjectID_Date, Instrument, SoftwareVersion, 
                                                          Method, HPLC, TimeRange, FAIMSattached) 
-                            VALUES(?,?,?,?,?,?,?,?);'''
-         
-        self.InsertSQL2_Sample = '''INSERT INTO Metadata_Sample (SampleName_ID,ProjectID,CreationDate ,Vial,InjectionVolume,
-                            InitialPressure_Pump,MinPressure_Pump,MaxPressure_Pump,Std_Pressure_Pump ,AnalyzerTemp_mean,AnalyzerTemp_std) 
-                            VALUES( ?,?,?,?,?,?,?,?,?,?,?);'''
+                            VALUES(?,?,?,?,?,?,?,?)
+                            ON CONFLICT(ProjectID) DO NOTHING;'''
+
+        # an existing sample is only replaced if it is an error entry (corrupt file), Error then shows that it was replaced;
+        # RETURNING gives NULL for an insert, 'ErrorUpdated' for a replaced entry and no row for a duplicate
+        self.UpsertSQL2_Sample = '''INSERT INTO Metadata_Sample (SampleName_ID,ProjectID,CreationDate ,Vial,InjectionVolume,
+                            InitialPressure_Pump,MinPressure_Pump,MaxPressure_Pump,Std_Pressure_Pump ,AnalyzerTemp_mean,AnalyzerTemp_std,
+                            PumpPressure_ScansUsed,AnalyzerTemp_ScansUsed) 
+                            VALUES( ?,?,?,?,?,?,?,?,?,?,?,?,?)
+                            ON CONFLICT(SampleName_ID) DO UPDATE
+                                SET ProjectID = excluded.ProjectID,
+                                CreationDate = excluded.CreationDate,
+                                Vial = excluded.Vial,
+                                InjectionVolume = excluded.InjectionVolume,
+                                InitialPressure_Pump = excluded.InitialPressure_Pump,
+                                MinPressure_Pump = excluded.MinPressure_Pump,
+                                MaxPressure_Pump = excluded.MaxPressure_Pump,
+                                Std_Pressure_Pump = excluded.Std_Pressure_Pump,
+                                AnalyzerTemp_mean = excluded.AnalyzerTemp_mean,
+                                AnalyzerTemp_std = excluded.AnalyzerTemp_std,
+                                PumpPressure_ScansUsed = excluded.PumpPressure_ScansUsed,
+                                AnalyzerTemp_ScansUsed = excluded.AnalyzerTemp_ScansUsed,
+                                Error = 'ErrorUpdated'
+                                WHERE Metadata_Sample.Error IS NOT NULL AND Metadata_Sample.Error != 'ErrorUpdated'
+                            RETURNING Error;'''
  
         self.InsertCorruptSample = '''INSERT INTO Metadata_Sample (SampleName_ID,ProjectID,Error) 
                             VALUES( ?,?,?);'''
-                            
-        self.RegExProjectID_Query = '''SELECT ProjectID, ProjectID_Date FROM Metadata_Project 
-                                                        WHERE ProjectID LIKE ?;'''
-        
-        self.RegExProjectID_SampleTable_Query = '''SELECT ProjectID, CreationDate FROM Metadata_Sample 
-                                                        WHERE ProjectID LIKE ?
-                                                        ORDER BY CreationDate DESC LIMIT 1;'''                                                
 
-        self.Count_ProjectID_Query = '''SELECT COUNT(ProjectID) FROM Metadata_Project 
-                                        WHERE ProjectID = ?;'''
-        
-        self.UpdateSQL2_Sample_error = '''UPDATE Metadata_Sample 
-                                SET ProjectID = ?,
-                                CreationDate =?,
-                                Vial =?,
-                                InjectionVolume =?,
-                                InitialPressure_Pump =?,
-                                MinPressure_Pump =?,
-                                MaxPressure_Pump =?,
-                                Std_Pressure_Pump =?,
-                                AnalyzerTemp_mean =?,
-                                AnalyzerTemp_std =?,
-                                Error = "ErrorUpdated"
-                                WHERE SampleName_ID LIKE ?;'''
-
-    def execute_query_pd(self, query: str,params: Optional[Tuple[Any, ...]] = None) -> Union[int, pd.DataFrame]:
-        '''Execute predefined queries and return results.
-        :param query: Name of the predefined query to execute.
-        :type query: str
-        :param params: Parameters to bind to the query.
-        :type params: Optional[Tuple[Any, ...]]
-        :return: Query result as a DataFrame or a single integer value.
-        :rtype: Union[int, pd.DataFrame]
+
+    def _update_ProjectIndex(self, SQLValues_Samples: Sequence[SampleEntry], SQLValues_Project: Sequence[ProjectEntry] = ()) -> None:
+        '''Add the written projects and samples to the project index of this process.
+        :param SQLValues_Samples: SampleEntry dataclass instances.
+        :type SQLValues_Samples: Sequence[SampleEntry]
+        :param SQLValues_Project: ProjectEntry dataclass instances.
+        :type SQLValues_Project: Sequence[ProjectEntry]
+        :return: None
+        :rtype: None
+        '''
+        Index = GetProjectIndex(self.Metadata_DB)
+        for Project in SQLValues_Project:
+            Index.AddProject(Project.ProjectID, Project.ProjectID_Date)
+        for Sample in SQLValues_Samples:
+            Index.AddSample(Sample.ProjectID, Sample.CreationDate)
+
+    def _after_commit(self, Result: Future, Names: List[str]) -> None:
+        '''Done callback of entries queued in the BatchWriter: the names are known once the batch is committed.
+        If the entries were not written, the project index is loaded again and the names are looked up in the database again.
+        :param Result: Future of the entries.
+        :type Result: Future
+        :param Names: Sample names of the entries.
+        :type Names: List[str]
+        :return: None
+        :rtype: None
+        '''
+        if Result.exception() is None:
+            GetKnownSamples(self.Metadata_DB).Add(Names)
+        else:
+            GetProjectIndex(self.Metadata_DB).Invalidate()
+            GetKnownSamples(self.Metadata_DB).Discard(Names)
+
+    def _upsert(self, con: sqlite3.Connection, ProjectTuples: List[Tuple], SampleTuples: List[Tuple]) -> UpsertResult:
+        '''Upsert the rows in the transaction of the connection.
+        :param con: Connection, of this thread or of the BatchWriter.
+        :type con: sqlite3.Connection
+        :param ProjectTuples: Values of the projects.
+        :type ProjectTuples: List[Tuple]
+        :param SampleTuples: Values of the samples.
+        :type SampleTuples: List[Tuple]
+        :return: Outcome per row.
+        :rtype: UpsertResult
         '''
+        Projects = [INSERTED if con.execute(self.UpsertSQL1_Project, Values).rowcount == 1 else DUPLICATE
+                    for Values in ProjectTuples]
+        Samples = []
+        for Values in SampleTuples:
+            Returned = con.execute(self.UpsertSQL2_Sample, Values).fetchall()
+            Samples.append(DUPLICATE if not Returned else INSERTED if Returned[0][0] is None else REPLACED)
+        return UpsertResult(Projects, Samples)
+
+    def write_entries(self, SQLValues_Samples: Sequence[SampleEntry],
+                      SQLValues_Project: Sequence[ProjectEntry] = ()) -> Union[UpsertResult, Future]:
+        '''Write projects and samples in one transaction, like upsert_entries.
+        If a BatchWriter runs for the database, the rows are queued as one entry and committed with the next batch.
+        :param SQLValues_Samples: SampleEntry dataclass instances.
+        :type SQLValues_Samples: Sequence[SampleEntry]
+        :param SQLValues_Project: ProjectEntry dataclass instances, written before the samples.
+        :type SQLValues_Project: Sequence[ProjectEntry]
+        :return: Outcome per row if the rows were committed, the Future of the outcome if they were queued.
+        :rtype: Union[UpsertResult, Future]
+        '''
+        ProjectTuples = [dataclasses.astuple(Project) for Project in SQLValues_Project]
+        SampleTuples = [dataclasses.astuple(Sample) for Sample in SQLValues_Samples]
+
+        Names = [Sample.SampleName_ID for Sample in SQLValues_Samples]
+
+        Writer = GetWriter(self.Metadata_DB)
+        if Writer is not None:
+            def Job(con: sqlite3.Connection) -> UpsertResult:
+                Result = self._upsert(con, ProjectTuples, SampleTuples)
+                # on the writer thread once the rows are in the batch, so the next lookup (also a writer job) finds them
+                self._update_ProjectIndex(SQLValues_Samples, SQLValues_Project)
+                return Result
+
+            Result = Writer.call(Job)
+            Result.add_done_callback(_log_upsert_result)
+            Result.add_done_callback(lambda Result: self._after_commit(Result, Names))
+            return Result
+
         try:
-            with sqlite3.connect(self.Metadata_DB) as con:
-                if query == "Count_ProjectID_Query":
-                    Result = pd.read_sql_query(self.Count_ProjectID_Query, con, params=params)
-                    return Result.iloc[0]["COUNT(ProjectID)"]
-                elif query == "RegExProjectID_Query":
-                    Result = pd.read_sql_query(self.RegExProjectID_Query, con, params=params)
-                    return Result
-                elif query == "RegExProjectID_SampleTable_Query":
-                    Result = pd.read_sql_query(self.RegExProjectID_SampleTable_Query, con, params=params)
-                    return Result
-
-                else:
-                    raise ValueError(f"Unknown query: {query}")
-        except (sqlite3.Error, pd.errors.DatabaseError) as e:
-            logger.error(f"Database error executing {query}: {e}")
+            con = GetConnection(self.Metadata_DB)
+            with con:
+                Result = self._upsert(con, ProjectTuples, SampleTuples)
+        except sqlite3.Error as e:
+            logger.error(f"Database error writing entries: {e}")
             raise
+        _log_upsert_result(Result)
+        self._update_ProjectIndex(SQLValues_Samples, SQLValues_Project)
+        GetKnownSamples(self.Metadata_DB).Add(Names)
+        return Result
+
+    def upsert_entries(self, SQLValues_Samples: Sequence[SampleEntry], SQLValues_Project: Sequence[ProjectEntry] = ()) -> UpsertResult:
+        '''Write projects and samples in one transaction (INSERT ... ON CONFLICT), e.g. when a month or corrected files are ingested again.
+        New entries are inserted, error entries of the samples are replaced, all other existing entries are kept.
+        Existing entries do not raise, so a batch costs one transaction and no exception per row.
+        :param SQLValues_Samples: SampleEntry dataclass instances.
+        :type SQLValues_Samples: Sequence[SampleEntry]
+        :param SQLValues_Project: ProjectEntry dataclass instances, written before the samples.
+        :type SQLValues_Project: Sequence[ProjectEntry]
+        :return: Outcome per row, with a BatchWriter after its batch is committed.
+        :rtype: UpsertResult
+        '''
+        Result = self.write_entries(SQLValues_Samples, SQLValues_Project)
+        if isinstance(Result, Future):
+            # commit the batch now instead of waiting up to max_delay_seconds
+            GetWriter(self.Metadata_DB).flush()
+            return Result.result()
+        return Result
 
     def write_sample_entries(self, SQLValues_Samples: SampleEntry, SQLValues_Project: Optional[ProjectEntry] = None) -> None:
         '''Write sample and optionally project entries to database.
@@ -196,19 +285,8 @@ class WriteEntries:
         :return: None
         :rtype: None   
         '''
-        
-        try:
-            # Only write Project entry when it is not None
-            if SQLValues_Project is not None:
-                ProjectTuple = dataclasses.astuple(SQLValues_Project)
-                Database_writeNewEntry(self.Metadata_DB, self.InsertSQL1_Project, ProjectTuple)
-
-            # Write the sample entry - using Neo format as default
-            SamplesTuple = dataclasses.astuple(SQLValues_Samples)
-            Database_writeNewEntry(self.Metadata_DB, self.InsertSQL2_Sample, SamplesTuple)
-        except Exception as e:
-            logger.error(f"Error writing sample entries: {e}")
-            raise
+        # Only write Project entry when it is not None
+        self.write_entries([SQLValues_Samples], [SQLValues_Project] if SQLValues_Project is not None else [])
 
     def replace_ErrorFile(self, SQLValues_Samples_update: SampleEntry, SQLValues_Project: Optional[ProjectEntry] = None) -> None:
         '''Replace error file entry with proper metadata.
@@ -219,19 +297,8 @@ class WriteEntries:
         :return: None
         :rtype: None
         '''
-        try:
-            if SQLValues_Project is not None:
-                ProjectTuple = dataclasses.astuple(SQLValues_Project)
-                Database_writeNewEntry(self.Metadata_DB, self.InsertSQL1_Project, ProjectTuple)
-
-            # Reorder tuple for UPDATE statement (sample name goes last)
-            SamplesTuple = dataclasses.astuple(SQLValues_Samples_update)
-            SQLValues_Samples_update = SamplesTuple[1:] + (SamplesTuple[0],)
-
-            Database_writeNewEntry(self.Metadata_DB, self.UpdateSQL2_Sample_error, SQLValues_Samples_update)
-        except Exception as e:
-            logger.error(f"Error replacing error file: {e}")
-            raise
+        # the upsert replaces the error entry, the same statement as for new samples
+        self.write_entries([SQLValues_Samples_update], [SQLValues_Project] if SQLValues_Project is not None else [])
 
     def write_CorruptFile(self, SQLValues_Samples_update: Tuple[str, str, str]) -> None:
         '''Write corrupt file entry to database.
@@ -241,28 +308,75 @@ class WriteEntries:
         :rtype: None
         '''
         try:
-            Database_writeNewEntry(self.Metadata_DB, self.InsertCorruptSample, SQLValues_Samples_update)
+            Result = Database_writeNewEntry(self.Metadata_DB, self.InsertCorruptSample, SQLValues_Samples_update)
         except Exception as e:
             logger.error(f"Error writing corrupt file: {e}")
             raise
+        if Result is not None:
+            Result.add_done_callback(lambda Result: self._after_commit(Result, [SQLValues_Samples_update[0]]))
+        else:
+            GetKnownSamples(self.Metadata_DB).Add([SQLValues_Samples_update[0]])
 
 
-def Database_writeNewEntry(Metadata_DB: Union[str,Path], SQLStatement: str, SQLValues: Tuple) -> None:
+def _log_write_result(Result: Future) -> None:
+    '''Log the result of an entry written by the BatchWriter, like Database_writeNewEntry does for direct writes.
+    :param Result: Future of the entry.
+    :type Result: Future
+    :return: None
+    :rtype: None
+    '''
+    if Result.exception() is not None:
+        logger.error(f"Database error writing entry: {Result.exception()}")
+    elif Result.result() == DUPLICATE:
+        logger.info("File already in DB")
+
+
+def _log_upsert_result(Result: Union[UpsertResult, Future]) -> None:
+    '''Log the outcome of an upsert, directly or when the BatchWriter committed it.
+    :param Result: Outcome or Future of the outcome.
+    :type Result: Union[UpsertResult, Future]
+    :return: None
+    :rtype: None
+    '''
+    if isinstance(Result, Future):
+        if Result.exception() is not None:
+            logger.error(f"Database error writing entries: {Result.exception()}")
+            return
+        Result = Result.result()
+    if len(Result.Samples) == 1 and len(Result.Projects) <= 1:
+        # one file (observer, backlog processor), the messages of the single inserts
+        if Result.Samples[0] == DUPLICATE:
+            logger.info("File already in DB")
+        elif Result.Samples[0] == REPLACED:
+            logger.info("Error entry replaced")
+        return
+    logger.info(f"Upserted {len(Result.Projects)} projects ({Result.Projects.count(INSERTED)} new) and {len(Result.Samples)} samples "
+                f"({Result.Samples.count(INSERTED)} new, {Result.Samples.count(REPLACED)} error entries replaced, "
+                f"{Result.Samples.count(DUPLICATE)} already in DB)")
+
+
+def Database_writeNewEntry(Metadata_DB: Union[str,Path], SQLStatement: str, SQLValues: Tuple) -> Optional[Future]:
     '''Write new entry to database with proper error handling.
+    If a BatchWriter runs for the database, the entry is queued and committed with the next batch.
     :param Metadata_DB: Path to the metadata database.
     :type Metadata_DB: Union[str, Path]
     :param SQLStatement: SQL insert or update statement.
     :type SQLStatement: str
     :param SQLValues: Tuple of values to bind to the SQL statement.
     :type SQLValues: Tuple
-    :return: None
-    :rtype: None
+    :return: None if the entry was committed, the Future of the entry (INSERTED or DUPLICATE) if it was queued.
+    :rtype: Optional[Future]
     '''
+    Writer = GetWriter(Metadata_DB)
+    if Writer is not None:
+        Result = Writer.submit(SQLStatement, SQLValues)
+        Result.add_done_callback(_log_write_result)
+        return Result
+
     try:
-        with sqlite3.connect(Metadata_DB) as con:
-            cur = con.cursor()
-            cur.execute(SQLStatement, SQLValues)
-            con.commit()
+        con = GetConnection(Metadata_DB)
+        with con:
+            con.execute(SQLStatement, SQLValues)
     except sqlite3.IntegrityError:
         logger.info("File already in DB")
     except sqlite3.Error as e:
@@ -279,18 +393,6 @@ def MissingFilesFromDatabase(Metadata_DB: Union[str, Path], Directory_joined: Un
     :rtype: List[str]
     '''
 
-    createTable = '''CREATE TABLE IF NOT EXISTS TEMP_forJoin(
-    RawfileNames text 
-    )'''
-
-    InsertStatement = '''INSERT INTO TEMP_forJoin (RawfileNames) VALUES(?)'''
-    
-    LeftOuterJoin = ''' SELECT TEMP_forJoin.RawfileNames
-    FROM TEMP_forJoin
-    LEFT JOIN Metadata_Sample
-    ON TEMP_forJoin.RawfileNames =Metadata_Sample.SampleName_ID
-    WHERE Metadata_Sample.SampleName_ID IS NULL; '''
-
     logger.info(Directory_joined)
 
     try:
@@ -299,35 +401,15 @@ def MissingFilesFromDatabase(Metadata_DB: Union[str, Path], Directory_joined: Un
         logger.error(f"Error accessing directory {Directory_joined}: {e}")
         return []
 
-    ListMissingRawFiles = []    
-    RawfileList = [file for file in RawfileList if re.search(".raw", file)]
-    RawfileListTuple = [(x,) for x in RawfileList]
-    
+    RawfileList = [file for file in RawfileList if re.search(".raw", file) and os.path.splitext(file)[1] == ".raw"]
+
+    # only reads: names that are not in the known samples are looked up in chunks with the primary key of Metadata_Sample,
+    # nothing is written into the database, so several scripts can check the same directory at the same time
     try:
-        with sqlite3.connect(Metadata_DB) as con:
-            cur = con.cursor()
-            cur.execute(createTable)
-            cur.execute("DELETE FROM TEMP_forJoin")
-            con.commit()
-            cur.executemany(InsertStatement, RawfileListTuple)
-            con.commit()
-            MissingRawFiles = con.execute(LeftOuterJoin).fetchall()
-            cur.execute("DELETE FROM TEMP_forJoin")
-
-        for rawFileTup in MissingRawFiles:
-            if isinstance(rawFileTup, tuple):
-                rawFile, = rawFileTup
-            else:
-                rawFile = rawFileTup
-
-            if os.path.splitext(rawFile)[1] == ".raw":
-               ListMissingRawFiles.append(rawFile)
-               
+        return GetKnownSamples(Metadata_DB).Missing(RawfileList)
     except sqlite3.Error as e:
         logger.error(f"Database error finding missing files: {e}")
         return []
-       
-    return ListMissingRawFiles
 
 def GetMonthsInDB(Metadata_DB: Union[str, Path]) -> List[str]:
     '''Get unique months from project dates in database.
@@ -337,10 +419,8 @@ def GetMonthsInDB(Metadata_DB: Union[str, Path]) -> List[str]:
     :rtype: List[str]
     '''
     try:
-        with sqlite3.connect(Metadata_DB) as con:
-            cur = con.cursor()
-            Proj_Dates_Tup = cur.execute('''SELECT ProjectID_Date FROM Metadata_Project ''').fetchall()
-            con.commit()
+        con = GetConnection(Metadata_DB)
+        Proj_Dates_Tup = con.execute('''SELECT ProjectID_Date FROM Metadata_Project ''').fetchall()
 
         Proj_Dates = [Date_Tup[0] for Date_Tup in Proj_Dates_Tup]
         ProjMonths_unique = sorted({re.sub(r"[0-9]{2}$", "", x) for x in Proj_Dates})
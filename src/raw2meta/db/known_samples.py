@@ -0,0 +1,113 @@
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+from raw2meta.db.connection import DatabaseKey
+from raw2meta.db.writer import FetchAll
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+# names per lookup, below the 999 variables of older SQLite versions
+LookupChunkSize = 500
+
+
+class KnownSamples:
+
+    '''Names of the samples in the database, held in memory for the already-ingested checks.
+    A name in the set is known: it was read from the database or committed by this process.
+    A name that is not in the set is confirmed with the database, another script may have inserted it.
+    '''
+
+    def __init__(self, Metadata_DB: Union[str, Path]) -> None:
+        '''Initialize the empty cache, it is filled by Warm() or on the first check.
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+        self._lock = threading.Lock()
+        self._names: Set[str] = set()
+        self._warm = False
+
+    def Warm(self) -> None:
+        '''Read all sample names from the database, once per process.
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            if self._warm:
+                return
+        # read without the lock: with a BatchWriter the query runs on the writer thread, which adds the names it committed
+        Names = FetchAll(self.Metadata_DB, "SELECT SampleName_ID FROM Metadata_Sample")
+        with self._lock:
+            if self._warm:
+                return
+            self._names.update(Name for Name, in Names)
+            self._warm = True
+        logger.info(f"Loaded {len(self._names)} sample names")
+
+    def Add(self, Names: Iterable[str]) -> None:
+        '''Add the names of samples written by this process.
+        :param Names: Sample names.
+        :type Names: Iterable[str]
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            self._names.update(Names)
+
+    def Discard(self, Names: Iterable[str]) -> None:
+        '''Forget names, e.g. of samples whose batch could not be committed, they are looked up in the database again.
+        :param Names: Sample names.
+        :type Names: Iterable[str]
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            self._names.difference_update(Names)
+
+    def Missing(self, Names: List[str]) -> List[str]:
+        '''Names that are not in the database, in the given order.
+        Only the names that are not in the cache are looked up, in chunks with the primary key of Metadata_Sample.
+        :param Names: Sample names.
+        :type Names: List[str]
+        :return: Names that are not in the database.
+        :rtype: List[str]
+        '''
+        self.Warm()
+        with self._lock:
+            Unknown = [Name for Name in Names if Name not in self._names]
+
+        Found = set()
+        for Start in range(0, len(Unknown), LookupChunkSize):
+            Chunk = Unknown[Start:Start + LookupChunkSize]
+            Rows = FetchAll(self.Metadata_DB, f'''SELECT SampleName_ID FROM Metadata_Sample
+                                        WHERE SampleName_ID IN ({",".join("?" * len(Chunk))})''', tuple(Chunk))
+            Found.update(Name for Name, in Rows)
+        self.Add(Found)
+        return [Name for Name in Unknown if Name not in Found]
+
+    def Contains(self, Name: str) -> bool:
+        '''Check whether the sample is in the database.
+        :param Name: Sample name.
+        :type Name: str
+        :return: True if the sample is in the database.
+        :rtype: bool
+        '''
+        return not self.Missing([Name])
+
+
+_caches: Dict[str, KnownSamples] = {}
+_caches_lock = threading.Lock()
+
+
+def GetKnownSamples(Metadata_DB: Union[str, Path]) -> KnownSamples:
+    '''Known samples of the database, one cache per process.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: The cache.
+    :rtype: KnownSamples
+    '''
+    with _caches_lock:
+        return _caches.setdefault(DatabaseKey(Metadata_DB), KnownSamples(Metadata_DB))
@@ -0,0 +1,110 @@
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Union
+from raw2meta.db.connection import GetConnection
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    Version: int
+    Description: str
+    Apply: Callable[[sqlite3.Cursor], None]
+
+
+def _add_scans_used_columns(cur: sqlite3.Cursor) -> None:
+    '''Columns with the number of sampled scans, databases created before adaptive sampling do not have them.
+    Existing rows keep NULL in the new columns.
+    :param cur: Cursor inside the migration transaction.
+    :type cur: sqlite3.Cursor
+    :return: None
+    :rtype: None
+    '''
+    ExistingColumns = [Row[1] for Row in cur.execute("PRAGMA table_info(Metadata_Sample)")]
+    for Column in ["PumpPressure_ScansUsed", "AnalyzerTemp_ScansUsed"]:
+        if Column not in ExistingColumns:
+            cur.execute(f"ALTER TABLE Metadata_Sample ADD COLUMN {Column} integer")
+
+
+def _index_sample_project_date(cur: sqlite3.Cursor) -> None:
+    '''Index for the project matching of standards, which filters the samples by ProjectID and sorts them by CreationDate.
+    :param cur: Cursor inside the migration transaction.
+    :type cur: sqlite3.Cursor
+    :return: None
+    :rtype: None
+    '''
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Metadata_Sample_ProjectID_CreationDate ON Metadata_Sample(ProjectID, CreationDate)")
+
+
+def _index_project_date(cur: sqlite3.Cursor) -> None:
+    '''Index for the queries on the project dates, e.g. the months in the database.
+    :param cur: Cursor inside the migration transaction.
+    :type cur: sqlite3.Cursor
+    :return: None
+    :rtype: None
+    '''
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Metadata_Project_ProjectID_Date ON Metadata_Project(ProjectID_Date)")
+
+
+def _drop_join_table(cur: sqlite3.Cursor) -> None:
+    '''MissingFilesFromDatabase does not use the scratch table TEMP_forJoin anymore.
+    :param cur: Cursor inside the migration transaction.
+    :type cur: sqlite3.Cursor
+    :return: None
+    :rtype: None
+    '''
+    cur.execute("DROP TABLE IF EXISTS TEMP_forJoin")
+
+
+# append new migrations at the end, the version of a released migration must never change
+Migrations: List[Migration] = [
+    Migration(1, "Add PumpPressure_ScansUsed and AnalyzerTemp_ScansUsed", _add_scans_used_columns),
+    Migration(2, "Index Metadata_Sample(ProjectID, CreationDate)", _index_sample_project_date),
+    Migration(3, "Index Metadata_Project(ProjectID_Date)", _index_project_date),
+    Migration(4, "Drop TEMP_forJoin", _drop_join_table),
+]
+
+SchemaVersion = Migrations[-1].Version
+
+
+def GetSchemaVersion(Metadata_DB: Union[str, Path]) -> int:
+    '''Schema version of the database, stored in PRAGMA user_version (0 for databases without migrations).
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: Schema version.
+    :rtype: int
+    '''
+    return GetConnection(Metadata_DB).execute("PRAGMA user_version").fetchone()[0]
+
+
+def MigrateDatabase(Metadata_DB: Union[str, Path]) -> int:
+    '''Upgrade the database in place to the current schema version.
+    Every migration runs in its own transaction together with the new version number,
+    so an interrupted upgrade continues with the failed migration the next time.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: Schema version after the upgrade.
+    :rtype: int
+    '''
+    con = GetConnection(Metadata_DB)
+    Version = GetSchemaVersion(Metadata_DB)
+    if Version > SchemaVersion:
+        logger.warning(f"Database schema version {Version} is newer than this version of raw2meta ({SchemaVersion})")
+        return Version
+
+    for Step in Migrations:
+        if Step.Version <= Version:
+            continue
+        with con:
+            # IMMEDIATE takes the write lock, another process that migrates at the same time waits (busy_timeout)
+            con.execute("BEGIN IMMEDIATE")
+            if con.execute("PRAGMA user_version").fetchone()[0] >= Step.Version:
+                continue
+            Step.Apply(con.cursor())
+            con.execute(f"PRAGMA user_version = {Step.Version}")
+        logger.info(f"Migrated database to schema version {Step.Version}: {Step.Description}")
+        Version = Step.Version
+    return Version
@@ -0,0 +1,199 @@
+import bisect
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from raw2meta.db.connection import DatabaseKey
+from raw2meta.db.queries import ReadEntries, ProjectMatch, LatestSample
+from raw2meta.db.writer import FetchAll, GetWriter
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+# machine, month and initials, e.g. ("HFX", "202501", "BM") for HFX_20250103_BM
+GroupKey = Tuple[str, str, str]
+
+
+def ProjectGroup(ProjectID: str) -> Optional[GroupKey]:
+    '''Machine, month and initials of a ProjectID, the projects that SplitProjectName's LIKE pattern is meant to match.
+    :param ProjectID: ProjectID (Machine_Date_Initials) or file name starting with it.
+    :type ProjectID: str
+    :return: Key of the group, None if the ProjectID does not follow the naming scheme.
+    :rtype: Optional[GroupKey]
+    '''
+    Parts = Path(ProjectID).stem.split("_")
+    if len(Parts) < 3 or len(Parts[1]) < 2:
+        return None
+    return Parts[0], Parts[1][:-2], Parts[2]
+
+
+class ProjectIndex:
+
+    '''Projects and the latest sample per machine, month and initials, held in memory for the project matching.
+    It is loaded from the database on the first lookup and updated by write_entries after every successful write of this process.
+    When another connection (another script or thread) changed the database, PRAGMA data_version changes
+    and the index is loaded again before the next lookup.
+    The database is never read while the lock is held: with a BatchWriter the reads run on the writer thread,
+    which adds the entries of its jobs to the index.
+    '''
+
+    def __init__(self, Metadata_DB: Union[str, Path]) -> None:
+        '''Initialize the empty index, it is loaded on the first lookup.
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+        self._lock = threading.RLock()
+        self._loaded_version: Optional[Tuple[int, int]] = None
+        # one load at a time, entries added during a load are added again to the loaded index
+        self._load_lock = threading.Lock()
+        self._added: Optional[List[Tuple[Callable[..., None], Tuple]]] = None
+        self._generation = 0
+        self._projects: Dict[str, str] = {}
+        # projects per group sorted by ProjectID_Date
+        self._groups: Dict[GroupKey, List[ProjectMatch]] = {}
+        self._latest: Dict[GroupKey, LatestSample] = {}
+
+    def _data_version(self) -> Tuple[int, int]:
+        '''data_version is per connection, so the connection it was read on is part of the version.
+        :return: Connection (writer or thread) and its data_version.
+        :rtype: Tuple[int, int]
+        '''
+        Writer = GetWriter(self.Metadata_DB)
+        Source = id(Writer) if Writer is not None else threading.get_ident()
+        return Source, FetchAll(self.Metadata_DB, "PRAGMA data_version")[0][0]
+
+    def _refresh(self) -> None:
+        Version = self._data_version()
+        with self._lock:
+            if Version == self._loaded_version:
+                return
+        with self._load_lock:
+            with self._lock:
+                if Version == self._loaded_version:
+                    return
+                self._added = []
+                Generation = self._generation
+            Queries = ReadEntries(self.Metadata_DB)
+            Projects = Queries.execute_query("Projects_Query")
+            Samples = Queries.execute_query("LatestSamplePerProject_Query")
+            with self._lock:
+                self._projects, self._groups, self._latest = {}, {}, {}
+                for Project in Projects:
+                    self._add_project(Project.ProjectID, Project.ProjectID_Date)
+                for Sample in Samples:
+                    self._add_sample(Sample.ProjectID, Sample.CreationDate)
+                for Add, Args in self._added:
+                    Add(*Args)
+                self._added = None
+                # invalidated while loading: the rows may contain entries that were rolled back
+                self._loaded_version = Version if Generation == self._generation else None
+            logger.info(f"Loaded project index: {len(self._projects)} projects in {len(self._groups)} groups")
+
+    def _add_project(self, ProjectID: str, ProjectID_Date: str) -> None:
+        if ProjectID in self._projects:
+            return
+        self._projects[ProjectID] = ProjectID_Date
+        Key = ProjectGroup(ProjectID)
+        if Key is not None:
+            bisect.insort(self._groups.setdefault(Key, []), ProjectMatch(ProjectID, ProjectID_Date),
+                          key=lambda Project: (Project.ProjectID_Date, Project.ProjectID))
+
+    def _add_sample(self, ProjectID: Optional[str], CreationDate: Optional[str]) -> None:
+        Key = ProjectGroup(ProjectID) if ProjectID else None
+        if Key is None or CreationDate is None:
+            return
+        Latest = self._latest.get(Key)
+        # the dates are compared as text, like ORDER BY CreationDate in the database
+        if Latest is None or CreationDate > Latest.CreationDate:
+            self._latest[Key] = LatestSample(ProjectID, CreationDate)
+
+    def HasProject(self, ProjectID: str) -> bool:
+        '''Exact lookup, replaces Count_ProjectID_Query.
+        :param ProjectID: ProjectID to look for.
+        :type ProjectID: str
+        :return: True if the project is in the database.
+        :rtype: bool
+        '''
+        self._refresh()
+        with self._lock:
+            return ProjectID in self._projects
+
+    def MatchingProjects(self, ProjectID: str) -> List[ProjectMatch]:
+        '''Projects of the same machine, month and initials, replaces RegExProjectID_Query.
+        :param ProjectID: ProjectID or file name starting with it.
+        :type ProjectID: str
+        :return: Projects sorted by ProjectID_Date.
+        :rtype: List[ProjectMatch]
+        '''
+        self._refresh()
+        with self._lock:
+            return list(self._groups.get(ProjectGroup(ProjectID), []))
+
+    def LatestSample(self, ProjectID: str) -> Optional[LatestSample]:
+        '''Latest sample of the same machine, month and initials, replaces RegExProjectID_SampleTable_Query.
+        :param ProjectID: ProjectID or file name starting with it.
+        :type ProjectID: str
+        :return: ProjectID and CreationDate of the latest sample, None if there is none.
+        :rtype: Optional[LatestSample]
+        '''
+        self._refresh()
+        with self._lock:
+            return self._latest.get(ProjectGroup(ProjectID))
+
+    def AddProject(self, ProjectID: str, ProjectID_Date: str) -> None:
+        '''Add a project that was written by this process.
+        :param ProjectID: ProjectID of the new project.
+        :type ProjectID: str
+        :param ProjectID_Date: Date of the project.
+        :type ProjectID_Date: str
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            if self._added is not None:
+                self._added.append((self._add_project, (ProjectID, ProjectID_Date)))
+            # not loaded yet: the entry is read with the rest on the first lookup, changes of others are found by the next lookup
+            if self._loaded_version is not None:
+                self._add_project(ProjectID, ProjectID_Date)
+
+    def AddSample(self, ProjectID: Optional[str], CreationDate: Optional[str]) -> None:
+        '''Add a sample that was written by this process.
+        :param ProjectID: ProjectID of the sample.
+        :type ProjectID: Optional[str]
+        :param CreationDate: Creation date of the sample, samples without date (corrupt files) are ignored.
+        :type CreationDate: Optional[str]
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            # see AddProject
+            if self._added is not None:
+                self._added.append((self._add_sample, (ProjectID, CreationDate)))
+            if self._loaded_version is not None:
+                self._add_sample(ProjectID, CreationDate)
+
+    def Invalidate(self) -> None:
+        '''Load the index again before the next lookup, e.g. when a batch of the BatchWriter could not be committed.
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            self._loaded_version = None
+            self._generation += 1
+
+
+_indexes: Dict[str, ProjectIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def GetProjectIndex(Metadata_DB: Union[str, Path]) -> ProjectIndex:
+    '''Project index of the database, one per process.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: The index.
+    :rtype: ProjectIndex
+    '''
+    with _indexes_lock:
+        return _indexes.setdefault(DatabaseKey(Metadata_DB), ProjectIndex(Metadata_DB))
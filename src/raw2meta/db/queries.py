@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from pathlib import Path
+import sqlite3
+from typing import Any, Callable, Dict, List, Tuple, Union
+from raw2meta.db.writer import FetchAll
+from raw2meta.helper.common import PrefixRange
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ProjectMatch:
+    ProjectID: str
+    ProjectID_Date: str
+
+
+@dataclass(frozen=True)
+class LatestSample:
+    ProjectID: str
+    CreationDate: str
+
+
+# the prefix range (ProjectID >= ? AND ProjectID < ?) lets SQLite use the index, LIKE only checks the rows in the range
+Statements: Dict[str, str] = {
+    "Count_ProjectID_Query": '''SELECT COUNT(ProjectID) FROM Metadata_Project
+                                WHERE ProjectID = ?;''',
+    "RegExProjectID_Query": '''SELECT ProjectID, ProjectID_Date FROM Metadata_Project
+                                WHERE ProjectID >= ? AND ProjectID < ? AND ProjectID LIKE ?;''',
+    "RegExProjectID_SampleTable_Query": '''SELECT ProjectID, CreationDate FROM Metadata_Sample
+                                WHERE ProjectID >= ? AND ProjectID < ? AND ProjectID LIKE ?
+                                ORDER BY CreationDate DESC LIMIT 1;''',
+    "Projects_Query": '''SELECT ProjectID, ProjectID_Date FROM Metadata_Project;''',
+    "LatestSamplePerProject_Query": '''SELECT ProjectID, MAX(CreationDate) FROM Metadata_Sample
+                                WHERE ProjectID IS NOT NULL AND CreationDate IS NOT NULL
+                                GROUP BY ProjectID;''',
+}
+
+
+def _like_params(params: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    '''The regex queries take the LIKE pattern of SplitProjectName, the bounds of the prefix range are added in front.
+    :param params: Tuple with the LIKE pattern.
+    :type params: Tuple[Any, ...]
+    :return: Lower bound, upper bound and LIKE pattern.
+    :rtype: Tuple[Any, ...]
+    '''
+    return (*PrefixRange(params[0]), params[0])
+
+
+# how the parameters are bound and how the rows are returned, per statement
+Results: Dict[str, Tuple[Callable[[Tuple[Any, ...]], Tuple[Any, ...]], Callable[[List[Tuple]], Any]]] = {
+    "Count_ProjectID_Query": (tuple, lambda Rows: Rows[0][0]),
+    "RegExProjectID_Query": (_like_params, lambda Rows: [ProjectMatch(*Row) for Row in Rows]),
+    "RegExProjectID_SampleTable_Query": (_like_params, lambda Rows: [LatestSample(*Row) for Row in Rows]),
+    "Projects_Query": (tuple, lambda Rows: [ProjectMatch(*Row) for Row in Rows]),
+    "LatestSamplePerProject_Query": (tuple, lambda Rows: [LatestSample(*Row) for Row in Rows]),
+}
+
+
+class ReadEntries:
+
+    '''This class contains the named queries of the ingestion, they return plain values or small dataclasses.'''
+
+    def __init__(self, Metadata_DB: Union[str, Path]) -> None:
+        '''Initialize with path to metadata database.
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+
+    def execute_query(self, query: str, params: Tuple[Any, ...] = ()) -> Union[int, List[ProjectMatch], List[LatestSample]]:
+        '''Execute a named query, the statement stays prepared in the statement cache of the connection.
+        With a BatchWriter the query runs on its connection and sees the entries that are not committed yet.
+        :param query: Name of the query in Statements.
+        :type query: str
+        :param params: Parameters to bind to the query.
+        :type params: Tuple[Any, ...]
+        :return: Count for Count_ProjectID_Query, otherwise a list of ProjectMatch or LatestSample rows.
+        :rtype: Union[int, List[ProjectMatch], List[LatestSample]]
+        :raises ValueError: If the query name is unknown.
+        '''
+        if query not in Statements:
+            raise ValueError(f"Unknown query: {query}")
+        BindParams, ToResult = Results[query]
+        try:
+            Rows = FetchAll(self.Metadata_DB, Statements[query], BindParams(params))
+        except sqlite3.Error as e:
+            logger.error(f"Database error executing {query}: {e}")
+            raise
+        return ToResult(Rows)
@@ -0,0 +1,184 @@
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from raw2meta.db.connection import GetConnection
+from raw2meta.db.writer import GetWriter
+from raw2meta.config.configuration import ExportEnabled, ExportInterval
+from raw2meta.config.paths import SnapshotFolder
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+ManifestFile = "manifest.json"
+
+# instrument and month of the project, samples without project (e.g. corrupt files of an unknown project) use the month of their creation date
+PartitionQueries: Dict[str, str] = {
+    "Metadata_Project": '''SELECT COALESCE(Instrument, 'unknown'), COALESCE(substr(ProjectID_Date, 1, 6), 'unknown'), *
+                           FROM Metadata_Project
+                           ORDER BY 1, 2, ProjectID;''',
+    "Metadata_Sample": '''SELECT COALESCE(p.Instrument, 'unknown'),
+                                 COALESCE(substr(p.ProjectID_Date, 1, 6), substr(replace(s.CreationDate, '-', ''), 1, 6), 'unknown'), s.*
+                          FROM Metadata_Sample s LEFT JOIN Metadata_Project p ON p.ProjectID = s.ProjectID
+                          ORDER BY 1, 2, s.SampleName_ID;''',
+}
+
+
+def _arrow_type(DeclaredType: str) -> Any:
+    '''Arrow type of a column, from the declared type in the table definition (SQLite type affinity).
+    :param DeclaredType: Declared type of the column, e.g. "text" or "real".
+    :type DeclaredType: str
+    :return: pyarrow data type.
+    :rtype: pyarrow.DataType
+    '''
+    import pyarrow as pa
+
+    DeclaredType = DeclaredType.lower()
+    if "int" in DeclaredType:
+        return pa.int64()
+    if any(Name in DeclaredType for Name in ("real", "floa", "doub")):
+        return pa.float64()
+    return pa.string()
+
+
+def _partition_name(Table: str, Instrument: str, Month: str) -> str:
+    '''Relative directory of a partition, in the key=value layout that pyarrow.dataset, DuckDB and pandas read as columns.
+    :param Table: Table name.
+    :type Table: str
+    :param Instrument: Instrument of the partition.
+    :type Instrument: str
+    :param Month: Month of the partition (YYYYMM).
+    :type Month: str
+    :return: Relative path of the partition directory.
+    :rtype: str
+    '''
+    Instrument = re.sub(r"[^\w.-]", "_", Instrument)
+    return f"{Table}/Instrument={Instrument}/Month={Month}"
+
+
+def _write_atomic(Target: Path, Write: Callable[[Path], None]) -> None:
+    '''Write to a temporary file and replace the target, dashboards never read a half written file.
+    :param Target: Target file.
+    :type Target: Path
+    :param Write: Function that writes the temporary file, called with its path.
+    :type Write: Callable[[Path], None]
+    :return: None
+    :rtype: None
+    '''
+    Target.parent.mkdir(parents=True, exist_ok=True)
+    # the _ prefix is skipped by the dataset readers (pyarrow.dataset, DuckDB, Spark) while the file is written
+    TempPath = Target.with_name(f"_{Target.name}.tmp")
+    Write(TempPath)
+    os.replace(TempPath, Target)
+
+
+def ExportSnapshots(Metadata_DB: Union[str, Path], Directory: Union[str, Path] = SnapshotFolder) -> Dict[str, int]:
+    '''Write Parquet snapshots of the metadata tables, one file per table, instrument and month.
+    The rows of every partition are hashed, partitions with the same hash as in the last export are not written again.
+    Partitions that have no rows anymore are removed. Only committed entries are exported (reads do not block the writer in WAL mode).
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param Directory: Directory of the snapshots, defaults to SnapshotFolder (export: directory in params.yaml)
+    :type Directory: Union[str, Path], optional
+    :return: Number of rows per written partition.
+    :rtype: Dict[str, int]
+    :raises ImportError: If pyarrow is not installed.
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    Directory = Path(Directory)
+    ManifestPath = Directory / ManifestFile
+    try:
+        Manifest: Dict[str, Dict[str, Any]] = json.loads(ManifestPath.read_text())
+    except (OSError, ValueError):
+        Manifest = {}
+
+    con = GetConnection(Metadata_DB)
+    Written: Dict[str, int] = {}
+    Current: Dict[str, Dict[str, Any]] = {}
+    for Table, Query in PartitionQueries.items():
+        Columns: List[Tuple[str, str]] = [(Row[1], Row[2]) for Row in con.execute(f"PRAGMA table_info({Table})")]
+        Schema = pa.schema([(Name, _arrow_type(DeclaredType)) for Name, DeclaredType in Columns])
+        Rows = con.execute(Query).fetchall()
+
+        for (Instrument, Month), Partition in itertools.groupby(Rows, key=lambda Row: (Row[0], Row[1])):
+            Values = [Row[2:] for Row in Partition]
+            Name = _partition_name(Table, Instrument, Month)
+            Fingerprint = hashlib.sha256(repr(Values).encode()).hexdigest()
+            Current[Name] = {"fingerprint": Fingerprint, "rows": len(Values)}
+            if Manifest.get(Name, {}).get("fingerprint") == Fingerprint and (Directory / Name).is_dir():
+                continue
+
+            Snapshot = pa.Table.from_pydict({Column: [Row[i] for Row in Values] for i, (Column, _) in enumerate(Columns)}, schema=Schema)
+            _write_atomic(Directory / Name / "part-0.parquet", lambda TempPath: pq.write_table(Snapshot, TempPath))
+            Written[Name] = len(Values)
+
+    for Name in Manifest.keys() - Current.keys():
+        (Directory / Name / "part-0.parquet").unlink(missing_ok=True)
+        # the month and, if it was the last month, the instrument directory
+        for Empty in (Directory / Name, (Directory / Name).parent):
+            try:
+                Empty.rmdir()
+            except OSError:
+                break
+
+    _write_atomic(ManifestPath, lambda TempPath: TempPath.write_text(json.dumps(Current, indent=1, sort_keys=True)))
+    logger.info(f"Exported snapshots to {Directory}: {len(Written)} of {len(Current)} partitions changed")
+    return Written
+
+
+class SnapshotExporter:
+
+    '''Exports the snapshots after an ingest batch, at most every IntervalMinutes.'''
+
+    def __init__(self, Metadata_DB: Union[str, Path], Directory: Union[str, Path] = SnapshotFolder,
+                 IntervalMinutes: float = ExportInterval, Enabled: bool = ExportEnabled) -> None:
+        '''Initialize the exporter.
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :param Directory: Directory of the snapshots, defaults to SnapshotFolder (export: directory in params.yaml)
+        :type Directory: Union[str, Path], optional
+        :param IntervalMinutes: Minimum minutes between two exports, defaults to ExportInterval (export: interval_minutes)
+        :type IntervalMinutes: float, optional
+        :param Enabled: Export at all, defaults to ExportEnabled (export: enabled)
+        :type Enabled: bool, optional
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+        self.Directory = Directory
+        self.IntervalMinutes = IntervalMinutes
+        self.Enabled = Enabled
+        self._last_export: Optional[float] = None
+
+    def AfterBatch(self, Force: bool = False) -> None:
+        '''Export the snapshots if the last export is older than the interval.
+        With a running BatchWriter the queued entries are committed first, so the snapshot contains the batch.
+        Errors are logged, the ingestion goes on.
+        :param Force: Export regardless of the interval, e.g. at the end of the backlog.
+        :type Force: bool, optional
+        :return: None
+        :rtype: None
+        '''
+        if not self.Enabled:
+            return
+        if not Force and self._last_export is not None and time.monotonic() - self._last_export < 60 * self.IntervalMinutes:
+            return
+
+        Writer = GetWriter(self.Metadata_DB)
+        if Writer is not None:
+            Writer.flush()
+        try:
+            ExportSnapshots(self.Metadata_DB, self.Directory)
+        except ImportError:
+            logger.error("The snapshot export needs pyarrow (pip install pyarrow), the export is turned off")
+            self.Enabled = False
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Error exporting snapshots: {e}")
+        self._last_export = time.monotonic()
@@ -0,0 +1,322 @@
+import atexit
+import contextlib
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple, Union
+from raw2meta.db.connection import GetConnection, DatabaseKey
+from raw2meta.config.configuration import WriterEnabled, WriterBatchSize, WriterMaxDelay
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+# result of a write
+INSERTED = "inserted"
+DUPLICATE = "duplicate"
+REPLACED = "replaced"
+
+# running writers per database, Database_writeNewEntry and the queries use them when there is one
+_writers: Dict[str, "BatchWriter"] = {}
+_writers_lock = threading.Lock()
+
+
+@dataclass
+class _Job:
+    Kind: str  # "write", "read", "call", "flush" or "stop"
+    SQLStatement: str = ""
+    SQLValues: Tuple = ()
+    Function: Optional[Callable[[sqlite3.Connection], Any]] = None
+    Result: Future = field(default_factory=Future)
+
+
+class BatchWriter:
+
+    '''Write-behind writer: one thread owns the connection, takes the statements from a queue and commits them in batches.
+    A batch is committed when it has BatchSize entries, MaxDelay seconds after its first entry, on flush, when the
+    stop_event is set and when the writer stops.
+    Reads go through the same queue and connection, so they see the entries that are not committed yet.
+    '''
+
+    def __init__(self, Metadata_DB: Union[str, Path], BatchSize: int = WriterBatchSize, MaxDelay: float = WriterMaxDelay,
+                 stop_event: Optional[threading.Event] = None) -> None:
+        '''Initialize the writer, the thread starts with start().
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :param BatchSize: Entries per commit, defaults to WriterBatchSize (writer: batch_size in params.yaml)
+        :type BatchSize: int, optional
+        :param MaxDelay: Seconds an entry waits at most for its commit, defaults to WriterMaxDelay (writer: max_delay_seconds)
+        :type MaxDelay: float, optional
+        :param stop_event: Optional event, once it is set every entry is committed right away.
+        :type stop_event: Optional[threading.Event], optional
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+        self.BatchSize = max(BatchSize, 1)
+        self.MaxDelay = MaxDelay
+        self.stop_event = stop_event
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # set when the writer stopped after an error, the entries queued after it get the error
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "BatchWriter":
+        '''Start the writer thread and use the writer for all writes to the database in this process.
+        :return: The writer.
+        :rtype: BatchWriter
+        '''
+        with _writers_lock:
+            if DatabaseKey(self.Metadata_DB) in _writers:
+                raise RuntimeError(f"A writer for {self.Metadata_DB} is already running")
+            _writers[DatabaseKey(self.Metadata_DB)] = self
+        self._thread = threading.Thread(target=self._run, name="BatchWriter", daemon=True)
+        self._thread.start()
+        # daemon threads still run during atexit, pending entries are committed when the script ends without stop()
+        atexit.register(self.stop)
+        return self
+
+    def submit(self, SQLStatement: str, SQLValues: Tuple) -> Future:
+        '''Queue an insert or update.
+        :param SQLStatement: SQL insert or update statement.
+        :type SQLStatement: str
+        :param SQLValues: Tuple of values to bind to the SQL statement.
+        :type SQLValues: Tuple
+        :return: Future with INSERTED or DUPLICATE after the commit, or the exception of the statement or commit.
+        :rtype: Future
+        '''
+        return self._put(_Job("write", SQLStatement, tuple(SQLValues)))
+
+    def call(self, Function: Callable[[sqlite3.Connection], Any]) -> Future:
+        '''Queue a function that writes several rows with the connection of the writer, e.g. a bulk upsert.
+        It runs in the open batch, if it raises, the rows it wrote are rolled back.
+        :param Function: Function that is called with the connection.
+        :type Function: Callable[[sqlite3.Connection], Any]
+        :return: Future with the return value of the function after the commit, or its exception.
+        :rtype: Future
+        '''
+        return self._put(_Job("call", Function=Function))
+
+    def fetchall(self, SQLStatement: str, SQLValues: Tuple = ()) -> List[Tuple]:
+        '''Run a query on the connection of the writer, after the entries queued before it.
+        :param SQLStatement: SQL query.
+        :type SQLStatement: str
+        :param SQLValues: Tuple of values to bind to the query.
+        :type SQLValues: Tuple
+        :return: Rows of the query.
+        :rtype: List[Tuple]
+        '''
+        return self._put(_Job("read", SQLStatement, tuple(SQLValues))).result()
+
+    def flush(self) -> None:
+        '''Commit all entries queued so far and wait for it.
+        :return: None
+        :rtype: None
+        '''
+        self._put(_Job("flush")).result()
+
+    def stop(self) -> None:
+        '''Commit the pending entries and stop the thread.
+        :return: None
+        :rtype: None
+        '''
+        with _writers_lock:
+            if _writers.get(DatabaseKey(self.Metadata_DB)) is self:
+                del _writers[DatabaseKey(self.Metadata_DB)]
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_Job("stop"))
+        self._thread.join()
+        atexit.unregister(self.stop)
+
+    def __enter__(self) -> "BatchWriter":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        # also on KeyboardInterrupt, the entries queued before are written
+        self.stop()
+
+    def _put(self, Job: _Job) -> Future:
+        with self._lock:
+            if self._error is not None:
+                # the writer stopped after an error, the entry is not written (GetWriter does not return it anymore)
+                Job.Result.set_exception(self._error)
+                return Job.Result
+            if self._thread is None or not self._thread.is_alive():
+                raise RuntimeError("The writer is not running")
+            self._queue.put(Job)
+        return Job.Result
+
+    def _commit(self, con: sqlite3.Connection, Pending: List[Tuple[Future, Any]]) -> None:
+        '''Commit the open batch and report the result of every entry.
+        :param con: Connection of the writer thread.
+        :type con: sqlite3.Connection
+        :param Pending: Futures and results of the entries in the batch.
+        :type Pending: List[Tuple[Future, Any]]
+        :return: None
+        :rtype: None
+        '''
+        try:
+            con.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Database error committing {len(Pending)} entries: {e}")
+            con.rollback()
+            for Result, _ in Pending:
+                Result.set_exception(e)
+        else:
+            for Result, Status in Pending:
+                Result.set_result(Status)
+        Pending.clear()
+
+    def _fail(self, con: sqlite3.Connection, Job: Optional[_Job], Pending: List[Tuple[Future, Any]], Error: Exception) -> None:
+        '''Stop the writer after an error of its own transaction handling (e.g. SQLite rolled back the transaction
+        after an I/O error or a full disk): the open batch is rolled back, the entries of the batch and the queued entries
+        get the error and the writes of the process go to direct connections again.
+        :param con: Connection of the writer thread.
+        :type con: sqlite3.Connection
+        :param Job: The job that was handled, None if there was none.
+        :type Job: Optional[_Job]
+        :param Pending: Futures and results of the entries in the batch.
+        :type Pending: List[Tuple[Future, Any]]
+        :param Error: The error.
+        :type Error: Exception
+        :return: None
+        :rtype: None
+        '''
+        logger.error(f"Writer of {self.Metadata_DB} stopped after a database error, {len(Pending)} entries are not written: {Error!r}")
+        try:
+            con.rollback()
+        except sqlite3.Error as e:
+            logger.error(f"Database error rolling back the batch: {e}")
+
+        with _writers_lock:
+            if _writers.get(DatabaseKey(self.Metadata_DB)) is self:
+                del _writers[DatabaseKey(self.Metadata_DB)]
+        with self._lock:
+            self._error = Error
+            Results = [Result for Result, _ in Pending]
+            Pending.clear()
+            if Job is not None:
+                Results.append(Job.Result)
+            while True:
+                try:
+                    Results.append(self._queue.get_nowait().Result)
+                except queue.Empty:
+                    break
+        for Result in Results:
+            if not Result.done():
+                Result.set_exception(Error)
+
+    def _run(self) -> None:
+        con = GetConnection(self.Metadata_DB)
+        Pending: List[Tuple[Future, Any]] = []
+        Deadline = None
+        while True:
+            Job = None
+            try:
+                Timeout = None if Deadline is None else max(Deadline - time.monotonic(), 0)
+                if self.stop_event is not None:
+                    # wake up regularly to see the stop_event
+                    Timeout = 0.5 if Timeout is None else min(Timeout, 0.5)
+                try:
+                    Job = self._queue.get(timeout=Timeout)
+                except queue.Empty:
+                    Job = None
+
+                if Job is not None and Job.Kind == "read":
+                    try:
+                        Job.Result.set_result(con.execute(Job.SQLStatement, Job.SQLValues).fetchall())
+                    except Exception as e:
+                        Job.Result.set_exception(e)
+                elif Job is not None and Job.Kind == "write":
+                    try:
+                        con.execute(Job.SQLStatement, Job.SQLValues)
+                        Pending.append((Job.Result, INSERTED))
+                    except sqlite3.IntegrityError:
+                        # only the statement is rolled back, the batch stays open
+                        Pending.append((Job.Result, DUPLICATE))
+                    except Exception as e:
+                        Job.Result.set_exception(e)
+                    if Deadline is None:
+                        Deadline = time.monotonic() + self.MaxDelay
+                elif Job is not None and Job.Kind == "call":
+                    if not con.in_transaction:
+                        con.execute("BEGIN")
+                    # like a failed statement, a failed function only rolls back its own rows, the batch stays open
+                    con.execute("SAVEPOINT writer_call")
+                    try:
+                        Result = Job.Function(con)
+                    except Exception as e:
+                        con.execute("ROLLBACK TO writer_call")
+                        Job.Result.set_exception(e)
+                    else:
+                        Pending.append((Job.Result, Result))
+                    con.execute("RELEASE writer_call")
+                    if Deadline is None:
+                        Deadline = time.monotonic() + self.MaxDelay
+
+                Stopping = self.stop_event is not None and self.stop_event.is_set()
+                if (Job is not None and Job.Kind in ("flush", "stop")) or len(Pending) >= self.BatchSize or Stopping \
+                        or (Deadline is not None and time.monotonic() >= Deadline):
+                    if Pending or con.in_transaction:
+                        self._commit(con, Pending)
+                    Deadline = None
+                if Job is not None and Job.Kind == "flush":
+                    Job.Result.set_result(None)
+                if Job is not None and Job.Kind == "stop":
+                    return
+            except Exception as e:
+                # e.g. "no such savepoint" when SQLite rolled back the transaction itself, the Futures must not wait forever
+                self._fail(con, Job, Pending, e)
+                return
+
+
+def GetWriter(Metadata_DB: Union[str, Path]) -> Optional[BatchWriter]:
+    '''Running writer of the database in this process.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :return: The writer, None if the statements are written directly.
+    :rtype: Optional[BatchWriter]
+    '''
+    if not _writers:
+        return None
+    with _writers_lock:
+        return _writers.get(DatabaseKey(Metadata_DB))
+
+
+def FetchAll(Metadata_DB: Union[str, Path], SQLStatement: str, SQLValues: Tuple = ()) -> List[Tuple]:
+    '''Run a query, through the writer if there is one, so it sees the entries that are not committed yet.
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param SQLStatement: SQL query.
+    :type SQLStatement: str
+    :param SQLValues: Tuple of values to bind to the query.
+    :type SQLValues: Tuple
+    :return: Rows of the query.
+    :rtype: List[Tuple]
+    '''
+    Writer = GetWriter(Metadata_DB)
+    if Writer is not None:
+        return Writer.fetchall(SQLStatement, SQLValues)
+    return GetConnection(Metadata_DB).execute(SQLStatement, SQLValues).fetchall()
+
+
+def StartWriter(Metadata_DB: Union[str, Path], stop_event: Optional[threading.Event] = None,
+                Enabled: bool = WriterEnabled) -> ContextManager[Optional[BatchWriter]]:
+    '''Context manager for the scripts, runs a BatchWriter if it is enabled in params.yaml (writer: enabled).
+    :param Metadata_DB: Path to the metadata database.
+    :type Metadata_DB: Union[str, Path]
+    :param stop_event: Optional event, once it is set every entry is committed right away.
+    :type stop_event: Optional[threading.Event], optional
+    :param Enabled: Use the writer, defaults to WriterEnabled
+    :type Enabled: bool, optional
+    :return: Context manager with the writer, or None if every entry is committed directly.
+    :rtype: ContextManager[Optional[BatchWriter]]
+    '''
+    if not Enabled:
+        return contextlib.nullcontext()
+    return BatchWriter(Metadata_DB, stop_event=stop_event)
@@ -14,6 +14,8 @@ class SampleEntry:
     Std_Pressure_Pump: Optional[float] = None
     AnalyzerTemp_mean: float = None
     AnalyzerTemp_std: float = None
+    PumpPressure_ScansUsed: Optional[int] = None
+    AnalyzerTemp_ScansUsed: Optional[int] = None
 
 @dataclass
 class ProjectEntry:
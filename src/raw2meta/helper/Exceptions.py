@@ -15,3 +15,11 @@ class NoFittingProjectFound(Exception):
 class SafedAsJsonTempFile(Exception):
     "not an error, but message to avoid that it looks like the file has been written into db when it is only stored as Json"
     pass
+
+class TraceNotAvailableError(Exception):
+    "raised when a trace (e.g. the pump pressure) was not recorded in the file"
+    pass
+
+class ExtractionFailedError(Exception):
+    "raised when reading the metadata failed for another reason, the file is not written into the db and read again later"
+    pass
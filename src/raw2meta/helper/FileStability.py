@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from raw2meta.config.configuration import StabilityPoll, StabilityWindow, StabilityCheckLock, StabilityTimeout
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+
+class FileStability:
+
+    '''Decides whether the copy of a file is finished: size and mtime did not change for Window seconds and,
+    with CheckLock, the file can be opened (the copy keeps it locked on Windows).
+    A file is never ready at the first poll, the next poll (one poll interval later) must read the same size and mtime.
+    A file that was last modified more than Window seconds ago (e.g. in the backlog) is ready at this second poll.
+    '''
+
+    def __init__(self, RawfilePath: Union[str, Path], Window: float = StabilityWindow, CheckLock: bool = StabilityCheckLock) -> None:
+        '''Initialize the check, the file is looked at with Poll().
+        :param RawfilePath: Path to the raw file.
+        :type RawfilePath: Union[str, Path]
+        :param Window: Seconds without changes until the file is ready, defaults to StabilityWindow (processing: stability_window_seconds)
+        :type Window: float, optional
+        :param CheckLock: Also try to open the file, defaults to StabilityCheckLock (processing: stability_check_lock)
+        :type CheckLock: bool, optional
+        :return: None
+        :rtype: None
+        '''
+        self.RawfilePath = RawfilePath
+        self.Window = Window
+        self.CheckLock = CheckLock
+        self.FirstSeen: Optional[float] = None
+        self.LastChange: Optional[float] = None
+        self._state: Optional[Tuple[int, int]] = None
+
+    @property
+    def CopySeconds(self) -> float:
+        '''Seconds the file kept changing while it was observed, 0 if it was complete at the first poll.'''
+        if self.FirstSeen is None or self.LastChange is None:
+            return 0.0
+        return max(self.LastChange - self.FirstSeen, 0.0)
+
+    @property
+    def WaitedSeconds(self) -> float:
+        '''Seconds since the first poll.'''
+        return 0.0 if self.FirstSeen is None else time.monotonic() - self.FirstSeen
+
+    def _unlocked(self) -> bool:
+        try:
+            with open(self.RawfilePath, "rb") as f:
+                f.read(1)
+            return True
+        except PermissionError:
+            return False
+
+    def Poll(self) -> bool:
+        '''Look at the file once.
+        :return: True if the copy is finished.
+        :rtype: bool
+        :raises FileNotFoundError: If the file does not exist (anymore).
+        '''
+        Now = time.monotonic()
+        Stat = os.stat(self.RawfilePath)
+        State = (Stat.st_size, Stat.st_mtime_ns)
+        if self.FirstSeen is None:
+            self.FirstSeen = Now
+            # not modified for a while, e.g. a file of the backlog: no need to watch it for Window seconds
+            self.LastChange = Now - self.Window if time.time() - Stat.st_mtime >= self.Window else Now
+            self._state = State
+            # an old mtime alone does not show that the copy is finished (a copy can keep the mtime of the source)
+            return False
+        if State != self._state:
+            self.LastChange = Now
+        self._state = State
+
+        if Stat.st_size == 0 or Now - self.LastChange < self.Window:
+            return False
+        return not self.CheckLock or self._unlocked()
+
+
+def WaitUntilStable(RawfilePath: Union[str, Path], stop_event: Optional[threading.Event] = None, PollInterval: float = StabilityPoll,
+                    Timeout: float = StabilityTimeout) -> Optional[FileStability]:
+    '''Wait until the copy of the file is finished, for the scripts that check one file after the other.
+    :param RawfilePath: Path to the raw file.
+    :type RawfilePath: Union[str, Path]
+    :param stop_event: Optional threading event to allow interrupting the wait.
+    :type stop_event: Optional[threading.Event], optional
+    :param PollInterval: Seconds between two polls, defaults to StabilityPoll (processing: stability_poll_seconds)
+    :type PollInterval: float, optional
+    :param Timeout: Seconds until the file is given up, defaults to StabilityTimeout (processing: stability_timeout_minutes)
+    :type Timeout: float, optional
+    :return: The check with the copy duration, None if the file is gone, did not get stable or the stop event was set.
+    :rtype: Optional[FileStability]
+    '''
+    Check = FileStability(RawfilePath)
+    while True:
+        try:
+            if Check.Poll():
+                return Check
+        except FileNotFoundError:
+            logger.error(f"File not found: {RawfilePath}")
+            return None
+        if Check.WaitedSeconds >= Timeout:
+            logger.error(f"File {RawfilePath} did not get stable within {Timeout / 60:.0f} minutes")
+            return None
+
+        if stop_event is None:
+            time.sleep(PollInterval)
+        elif stop_event.wait(timeout=PollInterval):
+            logger.info("Stop event set while waiting for the copy of %s", RawfilePath)
+            return None
+
+
+def StableFiles(RawfilePaths: List[str], stop_event: Optional[threading.Event] = None, PollInterval: float = StabilityPoll,
+                Timeout: float = StabilityTimeout) -> List[str]:
+    '''Wait until the copies of several files are finished, e.g. the missing files of a directory in the backlog.
+    The files are polled together, so the second reading costs one poll interval for all of them instead of one per file.
+    :param RawfilePaths: Paths to the raw files.
+    :type RawfilePaths: List[str]
+    :param stop_event: Optional threading event to allow interrupting the wait.
+    :type stop_event: Optional[threading.Event], optional
+    :param PollInterval: Seconds between two polls, defaults to StabilityPoll (processing: stability_poll_seconds)
+    :type PollInterval: float, optional
+    :param Timeout: Seconds until a file is given up, defaults to StabilityTimeout (processing: stability_timeout_minutes)
+    :type Timeout: float, optional
+    :return: The files that are ready, in the given order, without the files that are gone or did not get stable.
+        If the stop event is set, the files that were ready until then.
+    :rtype: List[str]
+    '''
+    Checks = {RawfilePath: FileStability(RawfilePath) for RawfilePath in RawfilePaths}
+    Ready = set()
+    while Checks:
+        for RawfilePath, Check in list(Checks.items()):
+            try:
+                if Check.Poll():
+                    Ready.add(RawfilePath)
+                    del Checks[RawfilePath]
+                    continue
+            except FileNotFoundError:
+                logger.error(f"File not found: {RawfilePath}")
+                del Checks[RawfilePath]
+                continue
+            if Check.WaitedSeconds >= Timeout:
+                logger.error(f"File {RawfilePath} did not get stable within {Timeout / 60:.0f} minutes")
+                del Checks[RawfilePath]
+        if not Checks:
+            break
+
+        if stop_event is None:
+            time.sleep(PollInterval)
+        elif stop_event.wait(timeout=PollInterval):
+            logger.info("Stop event set while waiting for the copy of %d files", len(Checks))
+            break
+    return [RawfilePath for RawfilePath in RawfilePaths if RawfilePath in Ready]
+
+
+class StabilityMonitor:
+
+    '''Checks of the files that are waited for, for pollers like the ReadinessScheduler that look at many files at once.'''
+
+    def __init__(self, Window: float = StabilityWindow, Timeout: float = StabilityTimeout) -> None:
+        '''Initialize the monitor.
+        :param Window: Seconds without changes until a file is ready, defaults to StabilityWindow (processing: stability_window_seconds)
+        :type Window: float, optional
+        :param Timeout: Seconds until a file is given up, defaults to StabilityTimeout (processing: stability_timeout_minutes)
+        :type Timeout: float, optional
+        :return: None
+        :rtype: None
+        '''
+        self.Window = Window
+        self.Timeout = Timeout
+        self._lock = threading.Lock()
+        self._checks: Dict[str, FileStability] = {}
+
+    def Ready(self, RawfilePath: str) -> bool:
+        '''Poll the file once, the check is forgotten once the file is ready.
+        :param RawfilePath: Path to the raw file.
+        :type RawfilePath: str
+        :return: True if the copy is finished.
+        :rtype: bool
+        :raises FileNotFoundError: If the file does not exist (anymore).
+        :raises TimeoutError: If the file did not get stable within the timeout.
+        '''
+        with self._lock:
+            Check = self._checks.setdefault(RawfilePath, FileStability(RawfilePath, self.Window))
+        try:
+            Ready = Check.Poll()
+        except FileNotFoundError:
+            self.Forget(RawfilePath)
+            raise
+        if Ready:
+            self.Forget(RawfilePath)
+            logger.info(f"Copy of {RawfilePath} finished, it changed for {Check.CopySeconds:.1f} s after it was detected")
+            return True
+        if Check.WaitedSeconds >= self.Timeout:
+            self.Forget(RawfilePath)
+            raise TimeoutError(f"{RawfilePath} did not get stable within {self.Timeout / 60:.0f} minutes")
+        return False
+
+    def Forget(self, RawfilePath: str) -> None:
+        '''Stop watching the file.
+        :param RawfilePath: Path to the raw file.
+        :type RawfilePath: str
+        :return: None
+        :rtype: None
+        '''
+        with self._lock:
+            self._checks.pop(RawfilePath, None)
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from typing import Callable
+import numpy as np
+from raw2meta.config.configuration import SamplingMode, SamplingInitialScans, SamplingTolerance
+
+
+@dataclass
+class ScanSample:
+    ScanNumbers: np.ndarray
+    Values: np.ndarray
+
+    @property
+    def ScansUsed(self) -> int:
+        return len(self.ScanNumbers)
+
+
+def _converged(Previous: np.ndarray, Current: np.ndarray, Tolerance: float) -> bool:
+    """Checks whether mean and std changed less than the tolerance (relative) between two passes.
+    With several columns (one per field) every column has to converge.
+    :param Previous: Values of the previous pass.
+    :type Previous: np.ndarray
+    :param Current: Values of the current pass (contains the values of the previous pass).
+    :type Current: np.ndarray
+    :param Tolerance: Allowed relative change of mean and std.
+    :type Tolerance: float
+    :return: True if both estimates converged.
+    :rtype: bool
+    """
+    Mean_prev, Mean_cur = Previous.mean(axis=0), Current.mean(axis=0)
+    Std_prev, Std_cur = Previous.std(axis=0), Current.std(axis=0)
+    # the std is compared to the mean as well, otherwise a nearly constant trace (std close to 0) never converges
+    Scale_mean = np.maximum(np.abs(Mean_cur), np.finfo(np.float64).tiny)
+    Scale_std = np.maximum(np.maximum(Std_cur, Tolerance * np.abs(Mean_cur)), np.finfo(np.float64).tiny)
+    return bool(np.all(np.abs(Mean_cur - Mean_prev) <= Tolerance * Scale_mean) and np.all(np.abs(Std_cur - Std_prev) <= Tolerance * Scale_std))
+
+
+def SampleScans(ReadValues: Callable[[np.ndarray], np.ndarray], FirstScan: int, LastScan: int, MaxScans: int,
+                Mode: str = SamplingMode, InitialScans: int = SamplingInitialScans, Tolerance: float = SamplingTolerance) -> ScanSample:
+    """Samples scans evenly distributed over the run.
+
+    "fixed" reads MaxScans scans (the old behaviour).
+    "adaptive" starts with InitialScans scans and halves the distance between the scans in every pass,
+    only the new scans are read. It stops when mean and std changed less than the tolerance between two passes,
+    when MaxScans is reached or when every scan of the run was read.
+
+    :param ReadValues: Function that returns the values of the given scan numbers (one row per scan, optionally one column per field).
+    :type ReadValues: Callable[[np.ndarray], np.ndarray]
+    :param FirstScan: First scan of the run.
+    :type FirstScan: int
+    :param LastScan: Last scan of the run.
+    :type LastScan: int
+    :param MaxScans: Maximum number of scans to read.
+    :type MaxScans: int
+    :param Mode: "adaptive" or "fixed", defaults to SamplingMode
+    :type Mode: str, optional
+    :param InitialScans: Scans of the first pass in "adaptive" mode, defaults to SamplingInitialScans
+    :type InitialScans: int, optional
+    :param Tolerance: Allowed relative change of mean and std in "adaptive" mode, defaults to SamplingTolerance
+    :type Tolerance: float, optional
+    :return: Sampled scan numbers (sorted) and their values.
+    :rtype: ScanSample
+    :raises ValueError: If the mode is unknown.
+    """
+    if Mode == "fixed":
+        ScanNumbers = np.linspace(FirstScan, LastScan, MaxScans, dtype = int)
+        return ScanSample(ScanNumbers, np.asarray(ReadValues(ScanNumbers), dtype=np.float64))
+    if Mode != "adaptive":
+        raise ValueError(f"Unknown sampling mode: {Mode}")
+
+    AvailableScans = LastScan - FirstScan + 1
+    NumberOfScans = max(2, min(InitialScans, MaxScans, AvailableScans))
+    ScanNumbers = np.unique(np.linspace(FirstScan, LastScan, NumberOfScans, dtype = int))
+    Values = np.asarray(ReadValues(ScanNumbers), dtype=np.float64)
+
+    while len(ScanNumbers) < min(MaxScans, AvailableScans):
+        # doubling the intervals keeps the old scans on the new grid, so they do not need to be read again
+        NumberOfScans = min(2 * NumberOfScans - 1, MaxScans, AvailableScans)
+        NewScans = np.setdiff1d(np.linspace(FirstScan, LastScan, NumberOfScans, dtype = int), ScanNumbers)
+        if len(NewScans) == 0:
+            break
+        # the last pass can be cut by MaxScans, then only part of the new scans (evenly distributed) are read
+        Missing = min(MaxScans, AvailableScans) - len(ScanNumbers)
+        if len(NewScans) > Missing:
+            NewScans = NewScans[np.unique(np.linspace(0, len(NewScans) - 1, Missing, dtype = int))]
+
+        AllScans = np.concatenate([ScanNumbers, NewScans])
+        AllValues = np.concatenate([Values, np.asarray(ReadValues(NewScans), dtype=np.float64)])
+        Order = np.argsort(AllScans, kind="stable")
+        Previous = Values
+        ScanNumbers, Values = AllScans[Order], AllValues[Order]
+
+        if _converged(Previous, Values, Tolerance):
+            break
+
+    return ScanSample(ScanNumbers, Values)
@@ -1,14 +1,16 @@
 from datetime import date
 import  os
 import re
-from typing import Tuple, List, Union, Any, Optional, Type
+from typing import Tuple, List, Union, Any, Optional, Type, TYPE_CHECKING
 from pathlib import Path
 import dateutil.relativedelta
-import pandas as pd
-from raw2meta.RawFileReader.ImportRawFileReaderFunctions import RawFileReaderAdapter
+from raw2meta.reader.RawReader import RawReaderBackend, GetReaderBackend
 from raw2meta.config.logger import get_configured_logger
 from raw2meta.helper.Exceptions import HandlingCorruptFileError
 
+if TYPE_CHECKING:
+    from raw2meta.db.queries import ProjectMatch
+
 # create a module-level logger instance
 logger = get_configured_logger(__name__)
 
@@ -29,6 +31,20 @@ def SplitProjectName(Name: str) -> Tuple[str, str, str, str]:
     
     return ProjectID, ProjectID_regex, ProjectID_regex_sql, ProjectID_Date
 
+
+def PrefixRange(ProjectID_regex_sql: str) -> Tuple[str, str]:
+    '''Range of ProjectIDs that can match the LIKE pattern of SplitProjectName, e.g. "HFX_202501__BM%" gives ("HFX_202501", "HFX_202502").
+    The prefix ends before the wildcards for the day ("__") or the "%" at the end.
+    :param ProjectID_regex_sql: LIKE pattern of the ProjectID.
+    :type ProjectID_regex_sql: str
+    :return: Lower (inclusive) and upper (exclusive) bound of the ProjectID.
+    :rtype: Tuple[str, str]
+    '''
+    Prefix = re.split(r"__|%", ProjectID_regex_sql, maxsplit=1)[0]
+    if not Prefix:
+        return "", "\U0010ffff"
+    return Prefix, Prefix[:-1] + chr(ord(Prefix[-1]) + 1)
+
 class RawFileReaderManager:
     '''Context manager that opens a RawFileReader and guarantees it is disposed.
 
@@ -36,8 +52,9 @@ class RawFileReaderManager:
     vendor pythonnet wrappers into a consistent HandlingCorruptFileError so
     upstream code can handle problematic files without the whole process
     crashing.
+    The file is opened with the reader backend set in params.yaml (Thermo RawFileReader or synthetic reader).
     '''
-    def __init__(self, RawfilePath: Union[str, Path]) -> None:
+    def __init__(self, RawfilePath: Union[str, Path], Backend: Optional[RawReaderBackend] = None) -> None:
         """Context manager that opens a RawFileReader and guarantees it is disposed.
         This manager converts exceptions raised by the pythonnet wrappers into 
         a consistent HandlingCorruptFileError so upstream code can handle problematic 
@@ -45,10 +62,13 @@ class RawFileReaderManager:
 
         :param RawfilePath: Path to the raw file.
         :type RawfilePath: Union[str, Path]
+        :param Backend: Reader backend, defaults to the backend set in params.yaml.
+        :type Backend: Optional[RawReaderBackend]
         :return: None
         :rtype: None
         """
         self.RawfilePath = RawfilePath
+        self.Backend = Backend
         self.rawFile = None
 
     def __enter__(self) -> Any:
@@ -56,9 +76,14 @@ class RawFileReaderManager:
         :return: The opened raw file object.
         :rtype: Any
         """
+        if self.Backend is None:
+            self.Backend = GetReaderBackend()
         try:
-            self.rawFile = RawFileReaderAdapter.FileFactory(self.RawfilePath)
+            self.rawFile = self.Backend.Open(self.RawfilePath)
             return self.rawFile
+        except HandlingCorruptFileError:
+            logger.error(f"Failed to open raw file {self.RawfilePath}: file is corrupt")
+            raise
         except Exception as e:
             if self.rawFile is not None:
                 try:
@@ -79,6 +104,7 @@ class RawFileReaderManager:
         :param tb: The traceback object.
         :type tb: Optional[Any]
         :return: False to propagate exceptions, True to suppress.
+        :raises HandlingCorruptFileError, HandlingEmptyFileError: Translated from the exceptions of the backend.
         """
 
         if self.rawFile is not None:
@@ -89,6 +115,9 @@ class RawFileReaderManager:
                 # don't raise here, just log
         if exc_type:
             logger.error(f"Exception while processing {self.RawfilePath}: {exc_value}", exc_info=True)
+            Translated = self.Backend.TranslateException(exc_value)
+            if Translated is not None:
+                raise Translated from exc_value
             # return False so Python re-raises original error
         return False
    
@@ -107,19 +136,18 @@ def MakePathNice(PathToMakeNice: Union[str, Path]) -> Union[str, Path]:
 
     return PathToMakeNice
 
-def get_ProjectID_withClosestDate(Regex_Proj: pd.DataFrame, ProjectID_Date: str) -> str:
+def get_ProjectID_withClosestDate(Regex_Proj: List["ProjectMatch"], ProjectID_Date: str) -> str:
     '''Find the closest project date match.
-    :param Regex_Proj: DataFrame with project IDs and dates.
-    :type Regex_Proj: pd.DataFrame
+    :param Regex_Proj: Projects with IDs and dates.
+    :type Regex_Proj: List[ProjectMatch]
     :param ProjectID_Date: The project date to match.
     :type ProjectID_Date: str
     :return: The ProjectID with the closest date.
     :rtype: str
     '''
-    Dist = list(Regex_Proj["ProjectID_Date"])
-    Dist = [int(x)-int(ProjectID_Date)  for x in Dist]
+    Dist = [int(Project.ProjectID_Date)-int(ProjectID_Date)  for Project in Regex_Proj]
     nearestDate = Dist.index(min(Dist))
-    return Regex_Proj["ProjectID"][nearestDate]
+    return Regex_Proj[nearestDate].ProjectID
 
     
 
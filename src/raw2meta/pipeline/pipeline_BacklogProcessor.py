@@ -2,8 +2,13 @@ import os
 import sys
 from raw2meta.components.UserInput import get_UserInput
 from raw2meta.config.logger import get_configured_logger
-from raw2meta.db.FillDatabase_logic import FillDatabase_Fun, SampleReadyToProcess, FillDatabase_old
+from raw2meta.db.FillDatabase_logic import FillDatabase_Fun, SampleReadyToProcess, FillDatabase_old, FillDatabase_Parallel
+from raw2meta.config.configuration import BacklogWorkers
+from raw2meta.helper.FileStability import StableFiles
 from raw2meta.db.database_helper import MissingFilesFromDatabase
+from raw2meta.db.writer import StartWriter
+from raw2meta.db.known_samples import GetKnownSamples
+from raw2meta.db.snapshot import SnapshotExporter
 from raw2meta.config.paths import TempFolder
 from raw2meta.config.logger import get_configured_logger
 
@@ -15,32 +20,46 @@ logger.info("Starting Script")
 if __name__ == "__main__":
     
     Metadata_DB,  MassSpecDirectory_ToObserve =   get_UserInput()
+    GetKnownSamples(Metadata_DB).Warm()
+    # with export: enabled the Parquet snapshots are updated after every directory
+    Exporter = SnapshotExporter(Metadata_DB)
   
-    try:
-        for Directory in os.listdir(MassSpecDirectory_ToObserve):
-            if int(Directory) < 202501:
-                continue
-            Directory_joined = os.path.join(MassSpecDirectory_ToObserve, Directory)
+    # with writer: enabled the entries are committed in batches, the pending ones are written when the script ends or is interrupted
+    with StartWriter(Metadata_DB):
+        try:
+            for Directory in os.listdir(MassSpecDirectory_ToObserve):
+                if int(Directory) < 202501:
+                    continue
+                Directory_joined = os.path.join(MassSpecDirectory_ToObserve, Directory)
                  
-            ListMissingRawFiles = MissingFilesFromDatabase(Metadata_DB, Directory_joined)
+                ListMissingRawFiles = MissingFilesFromDatabase(Metadata_DB, Directory_joined)
             
-            if not ListMissingRawFiles:
+                if not ListMissingRawFiles:
+                    logger.info(f"Missing from Directory: {len(ListMissingRawFiles)} files")
+                    continue
+
                 logger.info(f"Missing from Directory: {len(ListMissingRawFiles)} files")
-                continue
 
-            logger.info(f"Missing from Directory: {len(ListMissingRawFiles)} files")
+                # the stability of the files of the directory is checked together, one poll interval for all of them
+                FilesToProcess = StableFiles([os.path.join(Directory_joined, rawFile) for rawFile in sorted(ListMissingRawFiles)
+                                              if SampleReadyToProcess(rawFile, Directory_joined, Metadata_DB, WaitForCopy=False)])
+
+                if BacklogWorkers > 1:
+                    # the files are read in parallel worker processes, this process writes them into the db
+                    FillDatabase_Parallel(FilesToProcess, Metadata_DB, Workers=BacklogWorkers)
+                    Exporter.AfterBatch()
+                    continue
 
-            for rawFile in ListMissingRawFiles:                                   
-                if SampleReadyToProcess(rawFile, Directory_joined, Metadata_DB):
-                    rawFile = os.path.join(Directory_joined, rawFile)
+                for rawFile in FilesToProcess:
                     FillDatabase_Fun(rawFile, Metadata_DB)
+                Exporter.AfterBatch()
 
       
-    except KeyboardInterrupt:
-        logger.info("Keyboard Interrupt triggered, now exiting script")
-        sys.exit(0)
-
-    for file in os.listdir(TempFolder):
-        logger.info(f'Processing temp file: {file}')
-        FillDatabase_old(file, Metadata_DB)
+        except KeyboardInterrupt:
+            logger.info("Keyboard Interrupt triggered, now exiting script")
+            sys.exit(0)
 
+        for file in os.listdir(TempFolder):
+            logger.info(f'Processing temp file: {file}')
+            FillDatabase_old(file, Metadata_DB)
+        Exporter.AfterBatch(Force=True)
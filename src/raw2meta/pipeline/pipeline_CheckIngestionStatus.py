@@ -3,15 +3,19 @@ import re
 from raw2meta.components.UserInput import get_UserInput
 from raw2meta.config.logger import  get_configured_logger
 from raw2meta.db.database_helper import MissingFilesFromDatabase, GetMonthsInDB
+from raw2meta.db.connection import CheckStorageProfile
 
 logger = get_configured_logger(__name__)
 
-logger.info("Starting Script")
-
-Metadata_DB,  MassSpecDirectory_ToObserve =   get_UserInput()
- 
 if __name__ == "__main__":
 
+    logger.info("Starting Script")
+
+    Metadata_DB,  MassSpecDirectory_ToObserve =   get_UserInput()
+
+    if not CheckStorageProfile(Metadata_DB):
+        logger.warning("The database does not use the storage profile of params.yaml (storage:)")
+
     ProjMonths_unique = GetMonthsInDB(Metadata_DB)
 
     logger.info(f"Months covered in DB: {ProjMonths_unique}")
@@ -0,0 +1,22 @@
+import os
+import sys
+from raw2meta.config.logger import get_configured_logger
+from raw2meta.config.paths import DEFAULT_METADATA_DB, SnapshotFolder
+from raw2meta.db.snapshot import ExportSnapshots
+
+logger = get_configured_logger(__name__)
+
+# no questions, so the export can run as a scheduled task next to the observer
+if __name__ == "__main__":
+
+    logger.info("Starting Script")
+
+    if not os.path.isfile(DEFAULT_METADATA_DB):
+        logger.error(f"Database {DEFAULT_METADATA_DB} does not exist")
+        sys.exit(1)
+
+    try:
+        ExportSnapshots(DEFAULT_METADATA_DB, SnapshotFolder)
+    except ImportError:
+        logger.error("The snapshot export needs pyarrow (pip install pyarrow)")
+        sys.exit(1)
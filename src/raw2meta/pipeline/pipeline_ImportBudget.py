@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+import raw2meta
+from raw2meta.config.configuration import ImportBudgets, ImportBudgetRepeats, LazyModules
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+ResultMarker = "IMPORT_BUDGET_RESULT "
+
+# runs in a fresh interpreter, so every measurement starts without cached modules
+MeasureCode = '''
+import importlib, json, sys, time
+Start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+Elapsed = time.perf_counter() - Start
+print("{Marker}" + json.dumps({{"import_seconds": Elapsed, "loaded": [Module for Module in sys.argv[2:] if Module in sys.modules]}}))
+'''.format(Marker=ResultMarker)
+
+
+def MeasureEntryPoint(Module: str, Repeats: int = ImportBudgetRepeats, Lazy: List[str] = LazyModules) -> Dict[str, Any]:
+    """Starts a new interpreter that imports the entry point and measures the start-up time.
+    :param Module: Module of the entry point, e.g. raw2meta.pipeline.pipeline_CheckIngestionStatus.
+    :type Module: str
+    :param Repeats: Number of starts, the fastest one is reported, defaults to ImportBudgetRepeats
+    :type Repeats: int, optional
+    :param Lazy: Modules that should not be imported by the entry point, defaults to LazyModules
+    :type Lazy: List[str], optional
+    :return: Fastest start-up (interpreter and imports) and import time in seconds, and the lazy modules that were imported.
+    :rtype: Dict[str, Any]
+    """
+    Env = dict(os.environ)
+    PackageParent = str(Path(raw2meta.__file__).resolve().parents[1])
+    Env["PYTHONPATH"] = os.pathsep.join(filter(None, [PackageParent, Env.get("PYTHONPATH")]))
+
+    Best = None
+    for _ in range(max(Repeats, 1)):
+        Start = time.perf_counter()
+        Process = subprocess.run([sys.executable, "-c", MeasureCode, Module, *Lazy], capture_output=True, text=True, env=Env)
+        Total = time.perf_counter() - Start
+        if Process.returncode != 0:
+            raise RuntimeError(f"Importing {Module} failed: {Process.stderr.strip()}")
+
+        Line = next(Line for Line in Process.stdout.splitlines() if Line.startswith(ResultMarker))
+        Result = json.loads(Line[len(ResultMarker):])
+        Result["total_seconds"] = Total
+        if Best is None or Total < Best["total_seconds"]:
+            Best = Result
+    return Best
+
+
+def CheckImportBudgets(Budgets: Dict[str, float] = ImportBudgets) -> bool:
+    """Measures every entry point and compares it with its budget.
+    :param Budgets: Start-up budget in seconds per entry point, defaults to ImportBudgets (import_budget: in params.yaml)
+    :type Budgets: Dict[str, float], optional
+    :return: True if all entry points are within their budget and do not import lazy modules.
+    :rtype: bool
+    """
+    WithinBudget = True
+    for Module, Budget in Budgets.items():
+        Result = MeasureEntryPoint(Module)
+        Ok = Result["total_seconds"] <= Budget and not Result["loaded"]
+        WithinBudget = WithinBudget and Ok
+        logger.info(f"{'OK  ' if Ok else 'FAIL'} {Module}: start-up {Result['total_seconds']:.3f} s "
+                    f"(imports {Result['import_seconds']:.3f} s, budget {Budget:.3f} s)"
+                    + (f", imported lazy modules: {Result['loaded']}" if Result["loaded"] else ""))
+    return WithinBudget
+
+
+if __name__ == "__main__":
+
+    sys.exit(0 if CheckImportBudgets() else 1)
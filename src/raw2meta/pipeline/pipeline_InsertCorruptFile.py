@@ -6,11 +6,11 @@ from raw2meta.config.logger import  get_configured_logger
 
 logger = get_configured_logger(__name__)
 
-logger.info("Starting Script")
+if __name__ == "__main__":
 
-Metadata_DB,  MassSpecDirectory_ToObserve =   get_UserInput()
+    logger.info("Starting Script")
 
-if __name__ == "__main__":
+    Metadata_DB,  MassSpecDirectory_ToObserve =   get_UserInput()
         
     InsertAnotherFile = ''
 
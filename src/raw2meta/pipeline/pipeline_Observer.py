@@ -1,20 +1,178 @@
 from pathlib import Path
 import sys
 from raw2meta.components.UserInput import get_UserInput
-from raw2meta.components.Observer import  ObservingFolders, q
+from raw2meta.components.Observer import  ObservingFolders, q, StopSignal, WakeOnStop
 from raw2meta.config.logger import get_configured_logger
-from raw2meta.config.configuration import FileWaitTime
-from raw2meta.db.FillDatabase_logic import FillDatabase_Fun, SampleReadyToProcess
+from raw2meta.config.configuration import StabilityWindow, ConsumerWake, ConsumerReport
+from raw2meta.components.Scheduler import ReadinessScheduler
+from raw2meta.helper.FileStability import StabilityMonitor
+from raw2meta.db.FillDatabase_logic import ExtractMetadata, ExtractionResult, WriteExtractionResult, SampleReadyToProcess
+from raw2meta.db.FillDatabase_Fun import Execute_CreateSQLdbCode
+from raw2meta.db.writer import StartWriter
+from raw2meta.db.known_samples import GetKnownSamples
+from raw2meta.db.snapshot import SnapshotExporter
 import threading
 import time
-from queue import Empty
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from queue import Empty, Queue
+from typing import Any, Optional, Union
 
 logger = get_configured_logger(__name__)
 
 logger.info("Starting Script")
 
+def ScheduleObservedFile(file: str, Scheduler: ReadinessScheduler) -> None:
+    """Schedules a new raw file, the scheduler polls it until the copy is finished and then reads it.
+    Files that are already scheduled are skipped.
+    :param file: Path of the file from the observer queue.
+    :type file: str
+    :param Scheduler: Scheduler that processes the file when it is ready.
+    :type Scheduler: ReadinessScheduler
+    :return: None
+    :rtype: None
+    """
+    file = Path(file).as_posix()
+
+    if Path(file).suffix == ".raw" and Scheduler.Schedule(file, 0):
+        logger.info(f"New file {file} detected by Observer, reading it when it did not change for {StabilityWindow} s.")
+
+
+class ObservedFileProcessor:
+
+    '''Inserts the fully copied files of the ReadinessScheduler into the database.
+    The files are read at the same time in the workers of the scheduler, the database work (the check whether the sample
+    is known, the project matching and the writes) runs on one thread in the order the files reach it,
+    like the database thread of the IngestionDaemon, so the project index and the connection belong to this thread.
+    '''
+
+    def __init__(self, Metadata_DB: Union[str, Path], MassSpecDirectory_ToObserve: Union[str, Path],
+                 stop_event: threading.Event, Exporter: Optional[SnapshotExporter] = None) -> None:
+        '''Initialize the processor, it is called with the path of a file.
+        :param Metadata_DB: Path to the metadata database.
+        :type Metadata_DB: Union[str, Path]
+        :param MassSpecDirectory_ToObserve: The observed directory.
+        :type MassSpecDirectory_ToObserve: Union[str, Path]
+        :param stop_event: Event to signal stopping.
+        :type stop_event: threading.Event
+        :param Exporter: Optional exporter of the snapshots, called after a file is written.
+        :type Exporter: Optional[SnapshotExporter], optional
+        :return: None
+        :rtype: None
+        '''
+        self.Metadata_DB = Metadata_DB
+        self.MassSpecDirectory_ToObserve = MassSpecDirectory_ToObserve
+        self.stop_event = stop_event
+        self.Exporter = Exporter
+        # sqlite connections belong to their thread, all database work runs on this one
+        self._database = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ObserverDatabase")
+
+    def __call__(self, file: str) -> None:
+        '''Inserts a fully copied file into the database, runs in the workers of the ReadinessScheduler.
+        :param file: Path of the file.
+        :type file: str
+        :return: None
+        :rtype: None
+        '''
+        # the scheduler only hands over files that are stable
+        if not self._database.submit(SampleReadyToProcess, file, self.MassSpecDirectory_ToObserve, self.Metadata_DB,
+                                     stop_event=self.stop_event, WaitForCopy=False).result():
+            return
+
+        Result = ExtractMetadata(file)
+        # waits for the write, so an error is logged by the scheduler with the file
+        self._database.submit(self._write, Result).result()
+
+    def _write(self, Result: ExtractionResult) -> None:
+        WriteExtractionResult(Result, Execute_CreateSQLdbCode(self.Metadata_DB))
+        logger.info(f"File {Result.File} processed and database updated, continue observing.")
+        if self.Exporter is not None:
+            self.Exporter.AfterBatch()
+
+    def stop(self) -> None:
+        '''Finish the queued database work and stop the thread.
+        :return: None
+        :rtype: None
+        '''
+        self._database.shutdown(wait=True)
+
+    def __enter__(self) -> "ObservedFileProcessor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+@dataclass
+class ConsumerStats:
+    '''Idle and busy time of the thread that takes the new files from the observer queue.'''
+    Files: int = 0
+    IdleSeconds: float = 0.0
+    BusySeconds: float = 0.0
+
+    def Report(self, Pending: int) -> None:
+        '''Log the times.
+        :param Pending: Files that wait in the scheduler.
+        :type Pending: int
+        :return: None
+        :rtype: None
+        '''
+        Total = self.IdleSeconds + self.BusySeconds
+        IdleShare = 100 * self.IdleSeconds / Total if Total else 100.0
+        logger.info(f"Observer queue: {self.Files} files, idle {self.IdleSeconds:.1f} s ({IdleShare:.1f} %), "
+                    f"busy {self.BusySeconds:.3f} s, {Pending} files wait for the copy")
+
+
+def ConsumeObservedFiles(q: Queue, Scheduler: ReadinessScheduler, stop_event: threading.Event,
+                         WakeSeconds: float = ConsumerWake, ReportMinutes: float = ConsumerReport) -> ConsumerStats:
+    """Takes the new files from the observer queue and schedules them, until the stop_event is set.
+    The thread sleeps in the queue until a file arrives, StopSignal wakes it up when the stop_event is set.
+    :param q: Queue of the observers.
+    :type q: Queue
+    :param Scheduler: Scheduler that processes the files when they are ready.
+    :type Scheduler: ReadinessScheduler
+    :param stop_event: Event to signal stopping.
+    :type stop_event: threading.Event
+    :param WakeSeconds: Longest wait without files, defaults to ConsumerWake (processing: consumer_wake_seconds)
+    :type WakeSeconds: float, optional
+    :param ReportMinutes: Minutes between two logs of the idle and busy time, defaults to ConsumerReport (processing: consumer_report_minutes)
+    :type ReportMinutes: float, optional
+    :return: The idle and busy time.
+    :rtype: ConsumerStats
+    """
+    Stats = ConsumerStats()
+    WakeOnStop(stop_event, q)
+    LastReport = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            Waiting = time.monotonic()
+            try:
+                # Windows cannot interrupt a blocking wait with Ctrl+C, so it ends after WakeSeconds
+                file = q.get(timeout=WakeSeconds)
+            except Empty:
+                file = None
+            Now = time.monotonic()
+            Stats.IdleSeconds += Now - Waiting
+
+            if file is StopSignal:
+                break
+            if file is not None:
+                ScheduleObservedFile(file, Scheduler)
+                Stats.Files += 1
+                Stats.BusySeconds += time.monotonic() - Now
+
+            if Now - LastReport >= 60 * ReportMinutes:
+                Stats.Report(Scheduler.Pending())
+                LastReport = Now
+    finally:
+        Stats.Report(Scheduler.Pending())
+    return Stats
+
+
 def main():
     Metadata_DB, MassSpecDirectory_ToObserve = get_UserInput()
+    GetKnownSamples(Metadata_DB).Warm()
+    # with export: enabled the Parquet snapshots are updated after a processed file, at most every interval_minutes
+    Exporter = SnapshotExporter(Metadata_DB)
 
     stop_event = threading.Event()
     observer = ObservingFolders(MassSpecDirectory_ToObserve, Metadata_DB)
@@ -23,38 +181,23 @@ def main():
     observer_thread.start()
     logger.info("Started Observing Folders")
 
-    NoStopSignal = True   
-   
-    while not stop_event.is_set() and NoStopSignal:
-        try:
-            file = q.get(block=False, timeout=1)
-            file = Path(file).as_posix()
-
-            if Path(file).suffix == ".raw":
-                logger.info(f"New file {file} detected by Observer, waiting for {FileWaitTime} minutes.")
-
-                if stop_event.wait(timeout=60 * FileWaitTime):
-                    # stop_event set during wait — break main loop to start shutdown
-                    break  # I am waiting 5 minutes hoping that then the file will be fully copied, because some files escape the copy check
+    Processor = ObservedFileProcessor(Metadata_DB, MassSpecDirectory_ToObserve, stop_event, Exporter)
+    # new files wait in the scheduler and are polled until size and modification time are stable
+    Scheduler = ReadinessScheduler(Processor, stop_event=stop_event, Ready=StabilityMonitor().Ready)
 
-                if SampleReadyToProcess(file, MassSpecDirectory_ToObserve, Metadata_DB, stop_event=stop_event):
-
-                    FillDatabase_Fun(file, Metadata_DB, stop_event=stop_event)
-
-                    logger.info(f"File {file} processed and database updated, continue observing.")
+    # the scheduler stops first, then the database thread writes the files that were read, then the writer commits them
+    with StartWriter(Metadata_DB, stop_event=stop_event), Processor, Scheduler:
+        try:
+            ConsumeObservedFiles(q, Scheduler, stop_event)
 
         except KeyboardInterrupt:
             logger.info("\n Stopping threads...")
-            NoStopSignal = False
             stop_event.set()
             observer.ClosingObservations()
             logger.info("closed Observers")
             observer_thread.join()
             logger.info("Main thread exiting cleanly.")
             sys.exit(0)
-                        
-        except Empty:
-            continue
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,29 @@
+import asyncio
+from raw2meta.components.UserInput import get_UserInput
+from raw2meta.components.IngestionDaemon import IngestionDaemon
+from raw2meta.config.logger import get_configured_logger
+from raw2meta.db.writer import StartWriter
+from raw2meta.db.known_samples import GetKnownSamples
+from raw2meta.db.snapshot import SnapshotExporter
+
+logger = get_configured_logger(__name__)
+
+logger.info("Starting Script")
+
+
+def main():
+    Metadata_DB, MassSpecDirectory_ToObserve = get_UserInput()
+    GetKnownSamples(Metadata_DB).Warm()
+    # with export: enabled the Parquet snapshots are updated after a processed file, at most every interval_minutes
+    Daemon = IngestionDaemon(Metadata_DB, MassSpecDirectory_ToObserve, Exporter=SnapshotExporter(Metadata_DB))
+
+    with StartWriter(Metadata_DB, stop_event=Daemon.stop_event):
+        try:
+            asyncio.run(Daemon.run())
+        except KeyboardInterrupt:
+            # asyncio.run cancels the daemon on Ctrl+C, it has written the files that were read already
+            logger.info("Main thread exiting cleanly.")
+
+
+if __name__ == "__main__":
+    main()
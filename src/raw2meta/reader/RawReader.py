@@ -0,0 +1,147 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Protocol, Tuple, Union, TYPE_CHECKING
+from raw2meta.config.configuration import ReaderBackend
+from raw2meta.config.logger import get_configured_logger
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = get_configured_logger(__name__)
+
+
+@dataclass
+class RunHeader:
+    FirstScan: int
+    LastScan: int
+    StartTime: float
+    EndTime: float
+
+@dataclass
+class SampleInformation:
+    Vial: str
+    InjectionVolume: float
+    InstrumentMethodFile: str
+
+@dataclass
+class InstrumentData:
+    Model: str
+    SoftwareVersion: str
+
+
+class RawReader(Protocol):
+    '''One opened raw file.
+
+    Everything MetadataLists needs from a raw file goes through these methods, so the
+    extraction does not depend on the vendor library. Implementations raise
+    HandlingCorruptFileError, HandlingEmptyFileError or TraceNotAvailableError, or leave
+    the translation of their own exceptions to RawReaderBackend.TranslateException.
+    '''
+
+    def InstrumentFriendlyNames(self) -> Optional[List[str]]:
+        '''Names of the devices in the instrument method, None if they cannot be read on this platform.'''
+        ...
+
+    def RunHeader(self) -> RunHeader:
+        '''Scan range and time range of the MS device.'''
+        ...
+
+    def CreationDate(self) -> datetime:
+        '''Creation date of the raw file.'''
+        ...
+
+    def SampleInformation(self) -> SampleInformation:
+        '''Vial, injection volume and instrument method of the sample.'''
+        ...
+
+    def InstrumentData(self) -> InstrumentData:
+        '''Model and software version of the MS instrument.'''
+        ...
+
+    def TrailerLabels(self) -> List[str]:
+        '''Labels of the trailer extra fields of the MS device.'''
+        ...
+
+    def TrailerFieldCount(self) -> int:
+        '''Number of trailer extra fields of the MS device.'''
+        ...
+
+    def TrailerLabel(self, FieldNum: int) -> str:
+        '''Label of one trailer extra field.'''
+        ...
+
+    def TrailerValue(self, ScanNumber: int, FieldNum: int) -> Any:
+        '''Value of one trailer extra field in one scan.'''
+        ...
+
+    def TrailerValues(self, FieldNum: int, ScanNumbers: "np.ndarray") -> "np.ndarray":
+        '''Values of one numeric trailer extra field for many scans as float64.'''
+        ...
+
+    def TrailerTable(self, FieldNums: List[int], ScanNumbers: "np.ndarray") -> "np.ndarray":
+        '''Values of several numeric trailer extra fields for many scans as float64 (one row per scan, one column per field).'''
+        ...
+
+    def AnalogScanRange(self, DeviceIndex: int) -> Tuple[int, int]:
+        '''First and last scan of an analog device (A/D card).'''
+        ...
+
+    def AnalogTrace(self, DeviceIndex: int, Channel: int, FirstScan: int, LastScan: int) -> "np.ndarray":
+        '''Trace of an analog channel over a scan range.'''
+        ...
+
+    def AnalogTraces(self, DeviceIndex: int, Channels: List[int], FirstScan: int, LastScan: int) -> List["np.ndarray"]:
+        '''Traces of several channels of one analog device over a scan range.'''
+        ...
+
+    def AnalogValues(self, DeviceIndex: int, Channel: int, ScanNumbers: "np.ndarray") -> "np.ndarray":
+        '''Values of an analog channel at single scans.'''
+        ...
+
+    def Dispose(self) -> None:
+        '''Releases the file.'''
+        ...
+
+
+class RawReaderBackend(Protocol):
+    '''Opens raw files, e.g. with the Thermo RawFileReader or synthetic data for testing.'''
+
+    Name: str
+
+    def Open(self, RawfilePath: Union[str, Path]) -> RawReader:
+        '''Open a raw file.'''
+        ...
+
+    def TranslateException(self, Error: BaseException) -> Optional[Exception]:
+        '''Translate an exception of the backend into one of the exceptions of raw2meta, None if it should be kept.'''
+        ...
+
+
+_Backends = {}
+# the observer reads files in several threads, the backend (and the .NET runtime) is loaded only once
+_BackendsLock = threading.Lock()
+
+def GetReaderBackend(Name: Optional[str] = None) -> RawReaderBackend:
+    '''Get the reader backend, the backend is only imported when it is used the first time.
+    :param Name: "thermo" or "synthetic", defaults to ReaderBackend from params.yaml (or RAW2META_READER).
+    :type Name: Optional[str]
+    :return: The reader backend.
+    :rtype: RawReaderBackend
+    '''
+    Name = Name or ReaderBackend
+
+    with _BackendsLock:
+        if Name not in _Backends:
+            if Name == "thermo":
+                from raw2meta.reader.ThermoReader import ThermoBackend
+                _Backends[Name] = ThermoBackend()
+            elif Name == "synthetic":
+                from raw2meta.reader.SyntheticReader import SyntheticBackend
+                _Backends[Name] = SyntheticBackend()
+            else:
+                raise ValueError(f"Unknown raw file reader backend: {Name}")
+            logger.info(f"Using raw file reader backend: {Name}")
+
+        return _Backends[Name]
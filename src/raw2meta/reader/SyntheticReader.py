@@ -0,0 +1,185 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from raw2meta.config.configuration import MachinesDict, HPLCDict, SyntheticReaderParams
+from raw2meta.helper.Exceptions import HandlingCorruptFileError, TraceNotAvailableError
+from raw2meta.reader.RawReader import RunHeader, SampleInformation, InstrumentData
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+SoftwareVersions = ["3.1.2412.17", "4.0.30.1", "4.2.28.14"]
+
+TrailerLabels_Base = ["Multiple Injection:", "Multi Inject Info:", "Micro Scan Count:", "Scan Segment:", "Scan Event:",
+                      "Master Index:", "Charge State:", "Monoisotopic M/Z:", "Ion Injection Time (ms):",
+                      "Max. Ion Time (ms):", "AGC Target:", "Analyzer Temperature:", "Elapsed Scan Time (sec):"]
+
+
+def _noise(ScanNumbers: np.ndarray, Salt: float) -> np.ndarray:
+    """Deterministic noise between -0.5 and 0.5 for every scan, so repeated reads of a scan give the same value.
+    :param ScanNumbers: Scan numbers.
+    :type ScanNumbers: np.ndarray
+    :param Salt: Value to decorrelate different traces.
+    :type Salt: float
+    :return: Noise for every scan.
+    :rtype: np.ndarray
+    """
+    Values = np.sin(np.asarray(ScanNumbers, dtype=np.float64) * 12.9898 + Salt) * 43758.5453
+    return Values - np.floor(Values) - 0.5
+
+
+class SyntheticReader:
+    '''Raw file with generated metadata, used to profile and load test the pipeline without instruments or the vendor library.
+
+    Everything is derived from the seed and the file name, so the same file always gives the same values.
+    The instrument is taken from the first part of the file name when it is in the MachinesDict.
+    A small fraction of the files behave like corrupt files, empty files or files without pump pressure (set in params.yaml).
+    '''
+
+    def __init__(self, RawfilePath: Union[str, Path], Params: Dict[str, Any]) -> None:
+        """Generates the metadata of the file.
+        :param RawfilePath: Path to the raw file, the file does not need to exist.
+        :type RawfilePath: Union[str, Path]
+        :param Params: Parameters of the synthetic reader (reader: synthetic: in params.yaml).
+        :type Params: Dict[str, Any]
+        :return: None
+        :rtype: None
+        :raises HandlingCorruptFileError: If the file is generated as corrupt.
+        """
+        self.RawfilePath = RawfilePath
+        Name = os.path.splitext(os.path.basename(str(RawfilePath)))[0]
+        NameHash = int.from_bytes(hashlib.sha256(Name.encode()).digest()[:8], "little")
+        rng = np.random.default_rng([int(Params.get("seed", 42)), NameHash])
+        self._salt = float(NameHash % 100000)
+
+        if Params.get("open_delay_seconds", 0.0) > 0:
+            time.sleep(Params["open_delay_seconds"])
+
+        Fate = rng.random()
+        CorruptFraction = Params.get("corrupt_fraction", 0.0)
+        EmptyFraction = Params.get("empty_fraction", 0.0)
+        NoPressureFraction = Params.get("no_pressure_fraction", 0.0)
+        if Fate < CorruptFraction:
+            raise HandlingCorruptFileError()
+        self._empty = Fate < CorruptFraction + EmptyFraction
+        self._pressure = not (Fate >= 1 - NoPressureFraction)
+
+        NameParts = Name.split("_")
+        MSNames = {Short: Friendly for Friendly, Short in MachinesDict.items()}
+        self._ms = MSNames.get(NameParts[0], next(iter(MachinesDict), "Orbitrap Exploris 480"))
+        HPLCNames = list(HPLCDict) or ["Thermo Scientific SII for Xcalibur"]
+        self._hplc = HPLCNames[rng.integers(len(HPLCNames))]
+        self._software = SoftwareVersions[rng.integers(len(SoftwareVersions))]
+
+        self._lastScan = 0 if self._empty else int(rng.integers(20000, 120000))
+        self._endTime = float(rng.choice([30.0, 44.0, 60.0, 90.0, 120.0]))
+        self._analogScans = int(rng.integers(5000, 20000))
+        self._temperature = 26.0 + rng.random()
+        self._pressure_base = 200.0 + 200.0 * rng.random()
+        self._faims = bool(rng.random() < 0.5)
+
+        # the position of the fields depends on the instrument and software version, like in real files
+        Layout = int.from_bytes(hashlib.sha256((self._ms + self._software).encode()).digest()[:2], "little")
+        self._labels = TrailerLabels_Base[:2 + Layout % 3] + [f"Extra Field {i}:" for i in range(Layout % 4)] + TrailerLabels_Base[2 + Layout % 3:]
+        if self._faims:
+            self._labels.append("FAIMS Attached:")
+
+        try:
+            self._created = datetime.strptime(NameParts[1], "%Y%m%d") + timedelta(hours=float(rng.uniform(8, 20)))
+        except (IndexError, ValueError):
+            self._created = datetime(2025, 1, 1) + timedelta(hours=float(rng.uniform(0, 24 * 365)))
+
+        self._sample = SampleInformation(f"S{rng.integers(1, 5)}:{chr(65 + int(rng.integers(0, 8)))}{rng.integers(1, 13)}",
+                                         float(rng.choice([1.0, 2.0, 5.0])),
+                                         f"C:\\Xcalibur\\methods\\{NameParts[0]}_{int(self._endTime)}min.meth")
+
+    def InstrumentFriendlyNames(self) -> Optional[List[str]]:
+        if HPLCDict.get(self._hplc) == "EvoSep":
+            return [self._ms]
+        return [self._ms, self._hplc]
+
+    def RunHeader(self) -> RunHeader:
+        return RunHeader(1 if self._lastScan else 0, self._lastScan, 0.0, self._endTime)
+
+    def CreationDate(self) -> datetime:
+        return self._created
+
+    def SampleInformation(self) -> SampleInformation:
+        return self._sample
+
+    def InstrumentData(self) -> InstrumentData:
+        return InstrumentData(self._ms, self._software)
+
+    def TrailerLabels(self) -> List[str]:
+        return list(self._labels)
+
+    def TrailerFieldCount(self) -> int:
+        return len(self._labels)
+
+    def TrailerLabel(self, FieldNum: int) -> str:
+        return self._labels[FieldNum]
+
+    def TrailerValue(self, ScanNumber: int, FieldNum: int) -> Any:
+        if self._labels[FieldNum] == "FAIMS Attached:":
+            return str(self._faims)
+        return self.TrailerValues(FieldNum, np.array([ScanNumber]))[0].item()
+
+    def TrailerValues(self, FieldNum: int, ScanNumbers: np.ndarray) -> np.ndarray:
+        ScanNumbers = np.asarray(ScanNumbers, dtype=np.float64)
+        if self._labels[FieldNum] == "Analyzer Temperature:":
+            Drift = 0.3 * np.sin(2 * np.pi * ScanNumbers / max(self._lastScan, 1))
+            return self._temperature + Drift + 0.05 * _noise(ScanNumbers, self._salt)
+        return np.abs(_noise(ScanNumbers, self._salt + FieldNum)) * 100
+
+    def TrailerTable(self, FieldNums: List[int], ScanNumbers: np.ndarray) -> np.ndarray:
+        return np.column_stack([self.TrailerValues(FieldNum, ScanNumbers) for FieldNum in FieldNums])
+
+    def AnalogScanRange(self, DeviceIndex: int) -> Tuple[int, int]:
+        if not self._pressure or HPLCDict.get(self._hplc) != "Neo":
+            raise TraceNotAvailableError()
+        return 1, self._analogScans
+
+    def AnalogTrace(self, DeviceIndex: int, Channel: int, FirstScan: int, LastScan: int) -> np.ndarray:
+        return self.AnalogValues(DeviceIndex, Channel, np.arange(FirstScan, LastScan + 1))
+
+    def AnalogTraces(self, DeviceIndex: int, Channels: List[int], FirstScan: int, LastScan: int) -> List[np.ndarray]:
+        return [self.AnalogTrace(DeviceIndex, Channel, FirstScan, LastScan) for Channel in Channels]
+
+    def AnalogValues(self, DeviceIndex: int, Channel: int, ScanNumbers: np.ndarray) -> np.ndarray:
+        self.AnalogScanRange(DeviceIndex)
+        Gradient = np.asarray(ScanNumbers, dtype=np.float64) / self._analogScans
+        return self._pressure_base + 150.0 * Gradient * (1 - Gradient) + 2.0 * _noise(ScanNumbers, self._salt + DeviceIndex * 10 + Channel)
+
+    def Dispose(self) -> None:
+        pass
+
+
+class SyntheticBackend:
+    '''Reader backend that generates raw file metadata from a seed.'''
+
+    Name = "synthetic"
+
+    def __init__(self, Params: Optional[Dict[str, Any]] = None) -> None:
+        """Initialize with the parameters of the synthetic reader.
+        :param Params: Parameters, defaults to reader: synthetic: in params.yaml.
+        :type Params: Optional[Dict[str, Any]]
+        :return: None
+        :rtype: None
+        """
+        self.Params = SyntheticReaderParams if Params is None else Params
+
+    def Open(self, RawfilePath: Union[str, Path]) -> SyntheticReader:
+        """Generate the raw file.
+        :param RawfilePath: Path to the raw file.
+        :type RawfilePath: Union[str, Path]
+        :return: The generated raw file.
+        :rtype: SyntheticReader
+        """
+        return SyntheticReader(RawfilePath, self.Params)
+
+    def TranslateException(self, Error: BaseException) -> Optional[Exception]:
+        return None
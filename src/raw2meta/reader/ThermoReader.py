@@ -0,0 +1,356 @@
+import ctypes
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
+import numpy as np
+from raw2meta.RawFileReader.ImportRawFileReaderFunctions import (RawFileReaderAdapter, Environment, ChromatogramSignal, Device,
+                                                                  ChromatogramTraceSettings, TraceType)
+from System import ArgumentOutOfRangeException, IndexOutOfRangeException, NullReferenceException, Double
+from System.Runtime.InteropServices import GCHandle, GCHandleType
+from raw2meta.config.configuration import PumpPressureChunkScans
+from raw2meta.helper.Exceptions import HandlingCorruptFileError, HandlingEmptyFileError, TraceNotAvailableError
+from raw2meta.reader.RawReader import RunHeader, SampleInformation, InstrumentData
+from raw2meta.config.logger import get_configured_logger
+
+logger = get_configured_logger(__name__)
+
+
+def NetArrayToNumpy(NetArray: Any) -> np.ndarray:
+    """Copies a .NET double[] into a NumPy array with a single memory copy instead of converting every element through pythonnet.
+    :param NetArray: The .NET array (e.g. Intensities of a ChromatogramSignal).
+    :type NetArray: Any
+    :return: Array with the values as float64.
+    :rtype: np.ndarray
+    """
+    Length = NetArray.Length
+    if Length == 0:
+        return np.empty(0, dtype=np.float64)
+
+    if NetArray.GetType().GetElementType() != Double:
+        return np.fromiter(NetArray, dtype=np.float64, count=Length)
+
+    Handle = GCHandle.Alloc(NetArray, GCHandleType.Pinned)
+    try:
+        Pointer = Handle.AddrOfPinnedObject().ToInt64()
+        Buffer = (ctypes.c_double * Length).from_address(Pointer)
+        return np.frombuffer(Buffer, dtype=np.float64).copy()
+    finally:
+        Handle.Free()
+
+
+class ThermoReader:
+    '''Opened raw file read with the Thermo RawFileReader (pythonnet).
+
+    The RawFileReader works with a selected device, every method selects the device it needs
+    and remembers the selection, so switching between MS and analog device only happens when necessary.
+    '''
+
+    def __init__(self, RawfilePath: Union[str, Path]) -> None:
+        """Opens the raw file and selects the MS device.
+        :param RawfilePath: Path to the raw file.
+        :type RawfilePath: Union[str, Path]
+        :return: None
+        :rtype: None
+        :raises HandlingCorruptFileError: If the MS device cannot be selected.
+        """
+        self.RawfilePath = RawfilePath
+        self.rawFile = RawFileReaderAdapter.FileFactory(str(RawfilePath))
+        self._selected = None
+        self._trailerHeader = None
+        try:
+            self._select(Device.MS, 1)
+        except NullReferenceException:
+            self.Dispose()
+            raise HandlingCorruptFileError
+
+    def _select(self, DeviceType: Any, DeviceIndex: int) -> None:
+        """Selects a device if it is not selected yet.
+        :param DeviceType: Device type of the RawFileReader (e.g. Device.MS).
+        :type DeviceType: Any
+        :param DeviceIndex: Index of the device.
+        :type DeviceIndex: int
+        :return: None
+        :rtype: None
+        """
+        if self._selected != (DeviceType, DeviceIndex):
+            self.rawFile.SelectInstrument(DeviceType, DeviceIndex)
+            self._selected = (DeviceType, DeviceIndex)
+
+    def _select_analog(self, DeviceIndex: int) -> None:
+        """Selects an analog device, raises TraceNotAvailableError if the file does not contain it.
+        :param DeviceIndex: Index of the A/D card.
+        :type DeviceIndex: int
+        :return: None
+        :rtype: None
+        """
+        try:
+            self._select(Device.Analog, DeviceIndex)
+        except ArgumentOutOfRangeException as e:
+            raise TraceNotAvailableError() from e
+
+    def InstrumentFriendlyNames(self) -> Optional[List[str]]:
+        """ Note from RawFileReader Package:
+             Read the first instrument method (most likely for the MS portion of
+             the instrument).  NOTE: This method reads the instrument methods
+             from the RAW file but the underlying code uses some Microsoft code
+             that hasn't been ported to Linux or MacOS.  Therefore this method
+             won't work on those platforms therefore the check for Windows.
+        :return: Names of the devices or None when not on Windows.
+        :rtype: Optional[List[str]]
+        """
+        if 'Windows' not in str(Environment.OSVersion):
+            return None
+        try:
+            DevNames = self.rawFile.GetAllInstrumentFriendlyNamesFromInstrumentMethod()
+        except NullReferenceException:
+            raise HandlingCorruptFileError
+        return [str(Dev) for Dev in DevNames]
+
+    def RunHeader(self) -> RunHeader:
+        """Scan and time range of the MS device.
+        :return: RunHeader dataclass.
+        :rtype: RunHeader
+        """
+        self._select(Device.MS, 1)
+        Header = self.rawFile.RunHeaderEx
+        return RunHeader(Header.FirstSpectrum, Header.LastSpectrum, Header.StartTime, Header.EndTime)
+
+    def CreationDate(self) -> datetime:
+        """Creation date from the file header.
+        :return: Creation date.
+        :rtype: datetime
+        """
+        CreationDate = self.rawFile.FileHeader.CreationDate
+        return datetime(
+                CreationDate.Year,
+                CreationDate.Month,
+                CreationDate.Day,
+                CreationDate.Hour,
+                CreationDate.Minute,
+                CreationDate.Second,
+                CreationDate.Millisecond,
+            )
+
+    def SampleInformation(self) -> SampleInformation:
+        """Vial, injection volume and instrument method file.
+        :return: SampleInformation dataclass.
+        :rtype: SampleInformation
+        """
+        Info = self.rawFile.SampleInformation
+        return SampleInformation(Info.Vial, Info.InjectionVolume, Info.InstrumentMethodFile)
+
+    def InstrumentData(self) -> InstrumentData:
+        """Model and software version of the MS instrument.
+        :return: InstrumentData dataclass.
+        :rtype: InstrumentData
+        """
+        self._select(Device.MS, 1)
+        Data = self.rawFile.GetInstrumentData()
+        return InstrumentData(Data.Model, Data.SoftwareVersion)
+
+    def _trailer_header(self) -> Any:
+        """Header information of the trailer extra fields, only read once per file.
+        :return: Array of the header items.
+        :rtype: Any
+        """
+        if self._trailerHeader is None:
+            self._select(Device.MS, 1)
+            self._trailerHeader = self.rawFile.GetTrailerExtraHeaderInformation()
+        return self._trailerHeader
+
+    def TrailerLabels(self) -> List[str]:
+        """Labels of the trailer extra fields.
+        :return: List of labels.
+        :rtype: List[str]
+        """
+        return [field.Label for field in self._trailer_header()]
+
+    def TrailerFieldCount(self) -> int:
+        """Number of trailer extra fields.
+        :return: Number of fields.
+        :rtype: int
+        """
+        return self._trailer_header().Length
+
+    def TrailerLabel(self, FieldNum: int) -> str:
+        """Label of one trailer extra field.
+        :param FieldNum: Index of the trailer extra field.
+        :type FieldNum: int
+        :return: The label.
+        :rtype: str
+        """
+        return self._trailer_header()[FieldNum].Label
+
+    def TrailerValue(self, ScanNumber: int, FieldNum: int) -> Any:
+        """Value of one trailer extra field in one scan.
+        :param ScanNumber: Scan number.
+        :type ScanNumber: int
+        :param FieldNum: Index of the trailer extra field.
+        :type FieldNum: int
+        :return: The value.
+        :rtype: Any
+        """
+        self._select(Device.MS, 1)
+        return self.rawFile.GetTrailerExtraValue(int(ScanNumber), FieldNum)
+
+    def TrailerValues(self, FieldNum: int, ScanNumbers: np.ndarray) -> np.ndarray:
+        """Reads one trailer extra field for a set of scans into a float64 array.
+        The RawFileReader returns one value per GetTrailerExtraValue call, the values are written
+        directly into the array, without building a Python list first.
+        :param FieldNum: Index of the trailer extra field.
+        :type FieldNum: int
+        :param ScanNumbers: Scans to read.
+        :type ScanNumbers: np.ndarray
+        :return: Values of the field as float64.
+        :rtype: np.ndarray
+        """
+        self._select(Device.MS, 1)
+        ScanNumbers = np.asarray(ScanNumbers, dtype=np.int64)
+
+        GetValue = self.rawFile.GetTrailerExtraValue
+        return np.fromiter((GetValue(ScanNum, FieldNum) for ScanNum in ScanNumbers.tolist()),
+                           dtype=np.float64, count=len(ScanNumbers))
+
+    def TrailerTable(self, FieldNums: List[int], ScanNumbers: np.ndarray) -> np.ndarray:
+        """Reads several trailer extra fields for a set of scans into a float64 array (one row per scan).
+        All values of a scan are read with one GetTrailerExtraValues call, so reading more fields does not need more calls.
+        :param FieldNums: Indices of the trailer extra fields.
+        :type FieldNums: List[int]
+        :param ScanNumbers: Scans to read.
+        :type ScanNumbers: np.ndarray
+        :return: Values of the fields as float64, one column per field.
+        :rtype: np.ndarray
+        """
+        if len(FieldNums) == 1:
+            return self.TrailerValues(FieldNums[0], ScanNumbers)[:, np.newaxis]
+
+        self._select(Device.MS, 1)
+        GetValues = self.rawFile.GetTrailerExtraValues
+        Values = np.empty((len(ScanNumbers), len(FieldNums)), dtype=np.float64)
+        for Row, ScanNum in enumerate(np.asarray(ScanNumbers).tolist()):
+            ScanValues = GetValues(ScanNum, False)
+            Values[Row] = [float(ScanValues[FieldNum]) for FieldNum in FieldNums]
+        return Values
+
+    def AnalogScanRange(self, DeviceIndex: int) -> Tuple[int, int]:
+        """First and last scan of an analog device.
+        :param DeviceIndex: Index of the A/D card, 2 = pump pressure, 1 = sampler pressure.
+        :type DeviceIndex: int
+        :return: First and last scan.
+        :rtype: Tuple[int, int]
+        """
+        self._select_analog(DeviceIndex)
+        return self.rawFile.RunHeaderEx.FirstSpectrum, self.rawFile.RunHeaderEx.LastSpectrum
+
+    def AnalogTrace(self, DeviceIndex: int, Channel: int, FirstScan: int, LastScan: int,
+                    ChunkScans: int = PumpPressureChunkScans) -> np.ndarray:
+        """Reads one chromatogram trace over the scan range with as few calls as possible.
+        :param DeviceIndex: Index of the A/D card.
+        :type DeviceIndex: int
+        :param Channel: Channel of the A/D card (TraceType A2DChannel<Channel>).
+        :type Channel: int
+        :param FirstScan: First scan of the range.
+        :type FirstScan: int
+        :param LastScan: Last scan of the range.
+        :type LastScan: int
+        :param ChunkScans: Number of scans per call, 0 reads the whole range at once, defaults to PumpPressureChunkScans
+        :type ChunkScans: int, optional
+        :return: Intensities of the trace.
+        :rtype: np.ndarray
+        """
+        return self.AnalogTraces(DeviceIndex, [Channel], FirstScan, LastScan, ChunkScans)[0]
+
+    def AnalogTraces(self, DeviceIndex: int, Channels: List[int], FirstScan: int, LastScan: int,
+                     ChunkScans: int = PumpPressureChunkScans) -> List[np.ndarray]:
+        """Reads several channels of one analog device over the scan range, all channels are read with the same calls.
+        :param DeviceIndex: Index of the A/D card.
+        :type DeviceIndex: int
+        :param Channels: Channels of the A/D card (TraceType A2DChannel<Channel>).
+        :type Channels: List[int]
+        :param FirstScan: First scan of the range.
+        :type FirstScan: int
+        :param LastScan: Last scan of the range.
+        :type LastScan: int
+        :param ChunkScans: Number of scans per call, 0 reads the whole range at once, defaults to PumpPressureChunkScans
+        :type ChunkScans: int, optional
+        :return: Intensities of every trace, in the order of the channels.
+        :rtype: List[np.ndarray]
+        """
+        self._select_analog(DeviceIndex)
+        settings = [ChromatogramTraceSettings(getattr(TraceType, f"A2DChannel{Channel}")) for Channel in Channels]
+
+        if ChunkScans <= 0:
+            ChunkScans = LastScan - FirstScan + 1
+
+        chunks = [[] for _ in Channels]
+        try:
+            for ChunkStart in range(FirstScan, LastScan + 1, ChunkScans):
+                ChunkEnd = min(ChunkStart + ChunkScans - 1, LastScan)
+                data = self.rawFile.GetChromatogramData(settings, ChunkStart, ChunkEnd)
+                trace = ChromatogramSignal.FromChromatogramData(data)
+                for i in range(len(Channels)):
+                    chunks[i].append(NetArrayToNumpy(trace[i].Intensities))
+        except ArgumentOutOfRangeException as e:
+            raise TraceNotAvailableError() from e
+
+        return [np.empty(0, dtype=np.float64) if not Chunk else Chunk[0] if len(Chunk) == 1 else np.concatenate(Chunk)
+                for Chunk in chunks]
+
+    def AnalogValues(self, DeviceIndex: int, Channel: int, ScanNumbers: np.ndarray) -> np.ndarray:
+        """Reads an analog channel with one call per scan.
+        :param DeviceIndex: Index of the A/D card.
+        :type DeviceIndex: int
+        :param Channel: Channel of the A/D card (TraceType A2DChannel<Channel>).
+        :type Channel: int
+        :param ScanNumbers: Scans to read.
+        :type ScanNumbers: np.ndarray
+        :return: Value of the trace at every scan.
+        :rtype: np.ndarray
+        """
+        self._select_analog(DeviceIndex)
+        settings = ChromatogramTraceSettings(getattr(TraceType, f"A2DChannel{Channel}"))
+
+        values = np.empty(len(ScanNumbers), dtype=np.float64)
+        try:
+            for indx, ScanNum in enumerate(np.asarray(ScanNumbers).tolist()):
+                data= self.rawFile.GetChromatogramData([settings], ScanNum, ScanNum)
+                trace = ChromatogramSignal.FromChromatogramData(data)
+                values[indx] = trace[0].Intensities[0]
+        except ArgumentOutOfRangeException as e:
+            raise TraceNotAvailableError() from e
+        return values
+
+    def Dispose(self) -> None:
+        """Releases the raw file.
+        :return: None
+        :rtype: None
+        """
+        self.rawFile.Dispose()
+
+
+class ThermoBackend:
+    '''Reader backend for the Thermo RawFileReader.'''
+
+    Name = "thermo"
+
+    def Open(self, RawfilePath: Union[str, Path]) -> ThermoReader:
+        """Open a raw file with the RawFileReader.
+        :param RawfilePath: Path to the raw file.
+        :type RawfilePath: Union[str, Path]
+        :return: The opened raw file.
+        :rtype: ThermoReader
+        """
+        return ThermoReader(RawfilePath)
+
+    def TranslateException(self, Error: BaseException) -> Optional[Exception]:
+        """ArgumentOutOfRangeException means the file is corrupt, IndexOutOfRangeException that it does not contain scans.
+        :param Error: The raised exception.
+        :type Error: BaseException
+        :return: The exception to raise instead, None to keep the original one.
+        :rtype: Optional[Exception]
+        """
+        if isinstance(Error, ArgumentOutOfRangeException):
+            return HandlingCorruptFileError()
+        if isinstance(Error, IndexOutOfRangeException):
+            return HandlingEmptyFileError()
+        return None
@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# the package is used from src/ like in the .bat files, runtime files (Logs, Cache, TEMP) of the tests go to a temporary folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("RAW2META_RUNTIME_DIR", str(Path(__file__).resolve().parent / ".runtime"))
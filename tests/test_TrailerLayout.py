@@ -0,0 +1,40 @@
+from typing import List
+from raw2meta.components.TrailerLayout import TrailerLayoutCache
+from raw2meta.reader.RawReader import InstrumentData
+
+Labels = ["Multiple Injection:", "Micro Scan Count:", "Analyzer Temperature:", "Elapsed Scan Time (sec):"]
+Patterns = ["Analyzer Temperature", "FAIMS Attached"]
+
+
+class LayoutReader:
+    '''Reader with only the instrument data and the trailer labels, all files of the same model and software version.'''
+
+    def __init__(self, FAIMS: bool) -> None:
+        self._labels = Labels + (["FAIMS Attached:"] if FAIMS else [])
+
+    def InstrumentData(self) -> InstrumentData:
+        return InstrumentData("Orbitrap Exploris 480", "4.2.28.14")
+
+    def TrailerLabels(self) -> List[str]:
+        return list(self._labels)
+
+    def TrailerFieldCount(self) -> int:
+        return len(self._labels)
+
+    def TrailerLabel(self, FieldNum: int) -> str:
+        return self._labels[FieldNum]
+
+
+def test_alternating_FAIMS_files(tmp_path):
+    Cache = TrailerLayoutCache(tmp_path / "TrailerLayout.json")
+    for i in range(6):
+        FAIMS = i % 2 == 1
+        Fields = Cache.GetFields(LayoutReader(FAIMS), Patterns)
+        assert Fields["Analyzer Temperature"] == (2, "Analyzer Temperature:")
+        assert Fields["FAIMS Attached"] == ((4, "FAIMS Attached:") if FAIMS else (None, None))
+
+
+def test_cache_is_kept_between_runs(tmp_path):
+    TrailerLayoutCache(tmp_path / "TrailerLayout.json").GetFields(LayoutReader(False), Patterns)
+    Fields = TrailerLayoutCache(tmp_path / "TrailerLayout.json").GetFields(LayoutReader(True), Patterns)
+    assert Fields["FAIMS Attached"] == (4, "FAIMS Attached:")
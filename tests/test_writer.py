@@ -0,0 +1,29 @@
+import sqlite3
+from raw2meta.db.CreateDatabase import Database_CreateTables
+from raw2meta.db.writer import BatchWriter, GetWriter, FetchAll
+
+InsertSample = "INSERT INTO Metadata_Sample (SampleName_ID,ProjectID,Error) VALUES (?,?,?)"
+
+
+def test_writer_stops_when_sqlite_rolled_back_the_batch(tmp_path):
+    Metadata_DB = (tmp_path / "Metadata.sqlite").as_posix()
+    Database_CreateTables(Metadata_DB)
+    Writer = BatchWriter(Metadata_DB, MaxDelay=10).start()
+
+    def RolledBack(con: sqlite3.Connection) -> None:
+        # like SQLite after an I/O error: the transaction is gone when the job fails
+        con.rollback()
+        raise sqlite3.OperationalError("disk I/O error")
+
+    Queued = Writer.submit(InsertSample, ("HFX_20250115_BM_001.raw", "HFX_20250115_BM", None))
+    Failed = Writer.call(RolledBack)
+    assert Queued.exception(timeout=5) is not None
+    assert Failed.exception(timeout=5) is not None
+
+    Writer._thread.join(timeout=5)
+    assert not Writer._thread.is_alive()
+    assert GetWriter(Metadata_DB) is None
+    assert Writer.submit(InsertSample, ("HFX_20250115_BM_002.raw", "HFX_20250115_BM", None)).exception(timeout=1) is not None
+    # the process writes and reads directly again
+    assert FetchAll(Metadata_DB, "SELECT COUNT(*) FROM Metadata_Sample") == [(0,)]
+    Writer.stop()